@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#================================================================================
+#Copyright of Davide Sbreviglieri 2024
+#THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE
+#================================================================================
+#CAPTURE NIOS4
+#================================================================================
+from __future__ import annotations
+
+import hashlib
+from typing import TYPE_CHECKING, Dict, List, Optional, Set
+
+if TYPE_CHECKING:
+    from database_nios4 import database_nios4
+
+#change log: one row per changed row, with its latest tid
+CHANGELOG_TABLE = "lo_changelog"
+CHANGELOG_DDL = ("CREATE TABLE " + CHANGELOG_TABLE + "(tablename VARCHAR(255) NOT NULL DEFAULT '', gguid VARCHAR(40) NOT NULL DEFAULT '', "
+                 "tid DOUBLE NOT NULL DEFAULT 0, PRIMARY KEY (tablename,gguid), KEY ix_n4_tid (tid))")
+#prefix of the triggers managed here
+TRIGGER_PREFIX = "n4cc_"
+#================================================================================
+class capture_nios4:
+    """
+    Trigger-based change capture for the synced tables.
+
+    ``AFTER INSERT``/``AFTER UPDATE`` triggers on every table listed in
+    ``so_tables`` record ``(tablename, gguid, tid)`` into ``lo_changelog``
+    (one row per changed row, upserted), so the rows to upload are found
+    by reading the log instead of scanning every table by ``tid``.
+    Deletions keep going through ``lo_cleanbox``.
+    """
+    def __init__(self, db: "database_nios4", dbname: str) -> None:
+        """
+        Initialize the manager.
+
+        Parameters
+        ----------
+        db : database_nios4
+            Database helper used to run queries and DDL.
+        dbname : str
+            Schema name.
+        """
+        self.__db = db
+        self.__dbname = dbname
+    #--------------------------------------------------------------------------------------
+    def enabled(self) -> bool:
+        """
+        Whether change capture is installed.
+
+        Returns
+        -------
+        bool
+            ``True`` if the change log table exists.
+        """
+        return self.__db.exists_table(CHANGELOG_TABLE)
+    #--------------------------------------------------------------------------------------
+    def triggername(self, tablename: str, event: str) -> str:
+        """
+        Name of the capture trigger of a table.
+
+        Parameters
+        ----------
+        tablename : str
+            Table name.
+        event : str
+            ``"ai"`` (after insert) or ``"au"`` (after update).
+
+        Returns
+        -------
+        str
+            Trigger name (hashed when the table name is too long for the
+            64-character identifier limit).
+        """
+        name = tablename.lower()
+        if len(TRIGGER_PREFIX) + len(name) + 3 > 64:
+            name = hashlib.md5(name.encode("utf-8")).hexdigest()
+        return TRIGGER_PREFIX + name + "_" + event
+    #--------------------------------------------------------------------------------------
+    def tables(self) -> Optional[List[str]]:
+        """
+        Tables whose changes are captured.
+
+        Returns
+        -------
+        list of str or None
+            Existing tables listed in ``so_tables``, or ``None`` on error.
+        """
+        records = self.__db.getsql("SELECT tablename FROM so_tables")
+        if records == None:
+            return None
+        names: List[str] = []
+        for r in records:
+            name = str(r[0]).lower()
+            if name != "" and name not in names and self.__db.exists_table(name):
+                names.append(name)
+        return names
+    #--------------------------------------------------------------------------------------
+    def triggers(self) -> Optional[Set[str]]:
+        """
+        Capture triggers present in the schema.
+
+        Returns
+        -------
+        set of str or None
+            Trigger names, or ``None`` on error.
+        """
+        records = self.__db.getsql_params("SELECT TRIGGER_NAME FROM INFORMATION_SCHEMA.TRIGGERS WHERE TRIGGER_SCHEMA=%s AND TRIGGER_NAME LIKE %s",
+                                          (self.__dbname, TRIGGER_PREFIX.replace("_", "\\_") + "%"))
+        if records == None:
+            return None
+        return {str(r[0]).lower() for r in records}
+    #--------------------------------------------------------------------------------------
+    def install(self, fromtid: float = 0) -> bool:
+        """
+        Create the change log and the triggers of every synced table.
+
+        Parameters
+        ----------
+        fromtid : float
+            Rows with ``tid >= fromtid`` already in the tables are copied
+            into the log, so changes made before the installation are not
+            lost (pass the last synchronized tid).
+
+        Returns
+        -------
+        bool
+            ``True`` on success, ``False`` otherwise (see ``db.err``).
+        """
+        if not self.enabled():
+            if self.__db.setsql(CHANGELOG_DDL) == False:
+                return False
+        tables = self.tables()
+        present = self.triggers()
+        if tables == None or present == None:
+            return False
+        for t in tables:
+            if self.install_table(t, present, fromtid) == False:
+                return False
+        return True
+    #--------------------------------------------------------------------------------------
+    def install_table(self, tablename: str, present: Optional[Set[str]] = None, fromtid: Optional[float] = None) -> bool:
+        """
+        Create the capture triggers of one table (missing ones only).
+
+        Parameters
+        ----------
+        tablename : str
+            Table name.
+        present : set of str, optional
+            Triggers already in the schema (read if omitted).
+        fromtid : float, optional
+            If given and a trigger was missing, rows with ``tid >= fromtid``
+            are copied into the log after the triggers are created.
+
+        Returns
+        -------
+        bool
+            ``True`` on success, ``False`` otherwise (see ``db.err``).
+        """
+        if present is None:
+            present = self.triggers()
+            if present is None:
+                return False
+        t = tablename.lower()
+        body = ("FOR EACH ROW INSERT INTO " + CHANGELOG_TABLE + " (tablename,gguid,tid) VALUES ('" + t.replace("'", "''") + "',NEW.gguid,NEW.tid) "
+                "ON DUPLICATE KEY UPDATE tid=NEW.tid")
+        created = False
+        for event, when in (("ai", "AFTER INSERT"), ("au", "AFTER UPDATE")):
+            name = self.triggername(t, event)
+            if name in present:
+                continue
+            if self.__db.setsql("CREATE TRIGGER " + name + " " + when + " ON " + t + " " + body) == False:
+                self.__db.err.errorcode = "E022"
+                self.__db.err.errormessage = "Change capture on " + t + " failed: " + self.__db.err.errormessage
+                return False
+            present.add(name)
+            created = True
+
+        #rows changed before the triggers existed
+        if created and fromtid is not None:
+            sqlstring = "INSERT INTO " + CHANGELOG_TABLE + " (tablename,gguid,tid) SELECT %s,gguid,tid FROM " + t + " WHERE tid >= %s ON DUPLICATE KEY UPDATE tid=VALUES(tid)"
+            if self.__db.setsql_params(sqlstring, (t, fromtid)) == False:
+                return False
+        return True
+    #--------------------------------------------------------------------------------------
+    def ensure(self) -> bool:
+        """
+        Add the triggers missing from synced tables (e.g. created later).
+
+        Rows of those tables changed since the last synchronization
+        (``lo_setting.tidsync``) are copied into the log.
+
+        Returns
+        -------
+        bool
+            ``True`` on success or if capture is not installed.
+        """
+        if not self.enabled():
+            return True
+        tables = self.tables()
+        present = self.triggers()
+        records = self.__db.getsql("SELECT tidsync FROM lo_setting WHERE gguid='0'")
+        if tables == None or present == None or records == None:
+            return False
+        fromtid = records[0][0] if len(records) > 0 else 0
+        for t in tables:
+            if self.install_table(t, present, fromtid) == False:
+                return False
+        return True
+    #--------------------------------------------------------------------------------------
+    def uninstall(self) -> bool:
+        """
+        Drop every capture trigger and the change log.
+
+        Returns
+        -------
+        bool
+            ``True`` on success, ``False`` otherwise (see ``db.err``).
+        """
+        present = self.triggers()
+        if present == None:
+            return False
+        for name in sorted(present):
+            if self.__db.setsql("DROP TRIGGER IF EXISTS " + name) == False:
+                return False
+        if self.enabled():
+            if self.__db.setsql("DROP TABLE " + CHANGELOG_TABLE) == False:
+                return False
+        return True
+    #--------------------------------------------------------------------------------------
+    def changes(self, TID: float) -> Optional[Dict[str, Set[str]]]:
+        """
+        Rows changed since a tid, read from the log.
+
+        Parameters
+        ----------
+        TID : float
+            Lower bound (inclusive) on the recorded ``tid``.
+
+        Returns
+        -------
+        dict or None
+            ``{tablename: {gguid, ...}}``, or ``None`` on error.
+        """
+        records = self.__db.getsql_params("SELECT tablename,gguid FROM " + CHANGELOG_TABLE + " WHERE tid >= %s", (TID,))
+        if records == None:
+            return None
+        result: Dict[str, Set[str]] = {}
+        for r in records:
+            result.setdefault(str(r[0]), set()).add(r[1])
+        return result
+    #--------------------------------------------------------------------------------------
+    def purge(self, TID: float) -> bool:
+        """
+        Remove log entries older than a tid (already synchronized).
+
+        Parameters
+        ----------
+        TID : float
+            Entries with ``tid < TID`` are deleted.
+
+        Returns
+        -------
+        bool
+            ``True`` on success, ``False`` otherwise.
+        """
+        return self.__db.setsql_params("DELETE FROM " + CHANGELOG_TABLE + " WHERE tid < %s", (TID,))
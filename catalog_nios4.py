@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#================================================================================
+#Copyright of Davide Sbreviglieri 2024
+#THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE
+#================================================================================
+#CATALOG NIOS4
+#================================================================================
+from __future__ import annotations
+
+import re
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+#statements that change the schema and must invalidate the catalog
+_DDL = re.compile(r"^\s*(CREATE|ALTER|DROP|RENAME)\b", re.IGNORECASE)
+
+#column description: (name, data_type, is_nullable, column_default, column_key)
+Column = Tuple[str, str, str, Any, str]
+
+#one catalog per (host, schema), shared by every database_nios4 of the process
+_catalogs: Dict[Tuple[str, str], "catalog_nios4"] = {}
+_catalogs_lock = threading.Lock()
+#================================================================================
+def is_ddl(sql: str) -> bool:
+    """
+    Tell whether a statement changes the schema.
+
+    Parameters
+    ----------
+    sql : str
+        SQL statement.
+
+    Returns
+    -------
+    bool
+        ``True`` for ``CREATE``/``ALTER``/``DROP``/``RENAME`` statements.
+    """
+    return _DDL.match(sql) is not None
+#================================================================================
+def get_catalog(host: str, dbname: str, loader: Callable[[], Optional[List[Tuple[Any, ...]]]]) -> "catalog_nios4":
+    """
+    Return the process-wide catalog of a schema, creating it if needed.
+
+    Parameters
+    ----------
+    host : str
+        MySQL host.
+    dbname : str
+        Schema name.
+    loader : callable
+        Used only when the catalog is created, see :class:`catalog_nios4`.
+
+    Returns
+    -------
+    catalog_nios4
+        Shared catalog instance.
+    """
+    with _catalogs_lock:
+        catalog = _catalogs.get((host, dbname))
+        if catalog is None:
+            catalog = catalog_nios4(loader)
+            _catalogs[(host, dbname)] = catalog
+        return catalog
+#================================================================================
+class catalog_nios4:
+    """
+    In-memory cache of the tables and columns of one schema.
+
+    The whole schema is read with a single ``INFORMATION_SCHEMA.COLUMNS``
+    query on first use and served from memory until :meth:`invalidate`
+    is called (automatically after DDL run through :class:`database_nios4`).
+    """
+    def __init__(self, loader: Callable[[], Optional[List[Tuple[Any, ...]]]]) -> None:
+        """
+        Initialize an empty catalog.
+
+        Parameters
+        ----------
+        loader : callable
+            Returns rows ``(table_name, column_name, data_type, is_nullable,
+            column_default, column_key)`` ordered by table and ordinal
+            position, or ``None`` on error.
+        """
+        self.__loader = loader
+        self.__lock = threading.Lock()
+        self.__tables: Optional[Dict[str, List[Column]]] = None
+        self.__lower: Dict[str, str] = {}
+        self.loads = 0
+    #--------------------------------------------------------------------------------------
+    def invalidate(self) -> None:
+        """Forget the cached schema; the next lookup reloads it."""
+        with self.__lock:
+            self.__tables = None
+            self.__lower = {}
+    #--------------------------------------------------------------------------------------
+    def __snapshot(self) -> Optional[Dict[str, List[Column]]]:
+        """Loaded tables map, reading the schema if needed."""
+        with self.__lock:
+            if self.__tables is not None:
+                return self.__tables
+            records = self.__loader()
+            if records is None:
+                return None
+            tables: Dict[str, List[Column]] = {}
+            for r in records:
+                tables.setdefault(str(r[0]), []).append((str(r[1]), str(r[2]), str(r[3]), r[4], str(r[5])))
+            self.__tables = tables
+            self.__lower = {t.lower(): t for t in tables}
+            self.loads += 1
+            return tables
+    #--------------------------------------------------------------------------------------
+    def __table(self, tablename: str) -> Optional[List[Column]]:
+        """Columns of a table (exact name first, then case-insensitive)."""
+        tables = self.__snapshot()
+        if tables is None:
+            raise RuntimeError("Cannot read INFORMATION_SCHEMA")
+        columns = tables.get(tablename)
+        if columns is None:
+            name = self.__lower.get(tablename.lower())
+            if name is not None:
+                columns = tables.get(name)
+        return columns
+    #--------------------------------------------------------------------------------------
+    def tables(self) -> List[str]:
+        """
+        Names of all tables in the schema.
+
+        Returns
+        -------
+        list of str
+            Table names.
+        """
+        tables = self.__snapshot()
+        if tables is None:
+            raise RuntimeError("Cannot read INFORMATION_SCHEMA")
+        return list(tables.keys())
+    #--------------------------------------------------------------------------------------
+    def has_table(self, tablename: str) -> bool:
+        """
+        Whether a table exists.
+
+        Parameters
+        ----------
+        tablename : str
+            Table name.
+
+        Returns
+        -------
+        bool
+            ``True`` if the table is in the schema.
+        """
+        return self.__table(tablename) is not None
+    #--------------------------------------------------------------------------------------
+    def columns(self, tablename: str) -> Optional[List[Column]]:
+        """
+        Column descriptions of a table, in ordinal order.
+
+        Parameters
+        ----------
+        tablename : str
+            Table name.
+
+        Returns
+        -------
+        list of tuple or None
+            ``(name, data_type, is_nullable, column_default, column_key)``
+            per column, or ``None`` if the table does not exist.
+        """
+        columns = self.__table(tablename)
+        if columns is None:
+            return None
+        return list(columns)
+    #--------------------------------------------------------------------------------------
+    def column(self, tablename: str, fieldname: str) -> Optional[Column]:
+        """
+        Description of one column (names compared case-insensitively).
+
+        Parameters
+        ----------
+        tablename : str
+            Table name.
+        fieldname : str
+            Column name.
+
+        Returns
+        -------
+        tuple or None
+            Column description, or ``None`` if missing.
+        """
+        columns = self.__table(tablename)
+        if columns is None:
+            return None
+        fieldname = fieldname.lower()
+        for c in columns:
+            if c[0].lower() == fieldname:
+                return c
+        return None
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#================================================================================
+#Copyright of Davide Sbreviglieri 2024
+#THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE
+#================================================================================
+#CODEC NIOS4
+#================================================================================
+from __future__ import annotations
+
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+#header columns copied as strings
+HEADER_TEXT = ("gguid", "ut", "uta", "exp", "gguidp", "tap", "dsp", "dsc", "utc")
+#header columns copied as numbers
+HEADER_NUMBER = ("eli", "arc", "ind", "dsq1", "dsq2", "tidc")
+#fieldtypes stored as text
+TEXT_TYPES = frozenset((0, 1, 2, 30, 14, 12, 11, 15, 20, 21, 22, 24, 25, 26, 27, 28, 29, 31, 32, 34))
+#fieldtypes stored as numbers
+NUMBER_TYPES = frozenset((3, 5, 10, 9, 17, 6, 4))
+#fieldtype of dates (sent as YYYYMMDDHHMMSS numbers)
+DATE_TYPE = 18
+
+#returned by a converter when the value must not be written
+_SKIP = object()
+#================================================================================
+@lru_cache(maxsize=8192)
+def _date14(value: str) -> Optional[str]:
+    """``YYYYMMDDHHMMSS`` to ``YYYY-MM-DD HH:MM:SS`` (``None`` if invalid)."""
+    try:
+        return datetime.strptime(value, '%Y%m%d%H%M%S').strftime('%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        return None
+#--------------------------------------------------------------------------------
+def _as_text(value: Any) -> Any:
+    return str(value)
+#--------------------------------------------------------------------------------
+def _as_number(value: Any) -> Any:
+    return str(value).replace(",",".")
+#--------------------------------------------------------------------------------
+def _as_field_text(value: Any) -> Any:
+    return str(value).replace("'","`")
+#--------------------------------------------------------------------------------
+def _as_date(value: Any) -> Any:
+    if value == "null":
+        return _SKIP
+    if type(value) == str:
+        value = float(value)
+    if value == 0:
+        return _SKIP
+    converted = _date14(str(round(value)))
+    if converted is None:
+        print("errore formato data")
+        return _SKIP
+    return converted
+#================================================================================
+class codec_nios4:
+    """
+    Converter of received ``cvalues`` into the columns of one table.
+
+    Compiled once from the field map of the table: every incoming field name
+    is mapped straight to its local column and converter, so applying a row
+    is a dictionary lookup and one call per value. Date conversion results
+    are cached, received dates repeating across rows are parsed once.
+    """
+    def __init__(self, tablename: str, fields: Dict[str, Any], fieldforbidden: Dict[str, str],
+                 tid: Callable[[Any], str]) -> None:
+        """
+        Compile the codec.
+
+        Parameters
+        ----------
+        tablename : str
+            Table name.
+        fields : dict
+            ``{ 'table|field': (tid, fieldtype) }`` map (see
+            :meth:`database_nios4.get_fieldsname`).
+        fieldforbidden : dict
+            Remote-to-local renames of reserved field names.
+        tid : callable
+            Converts the received ``tid`` into the stored value.
+        """
+        self.tablename = tablename
+        prefix = tablename.lower() + "|"
+        self.columns: List[str] = []
+        #remote field name -> (position in columns, converter)
+        self.__converters: Dict[str, Tuple[int, Callable[[Any], Any]]] = {}
+        self.__indslot = -1
+
+        for key in fields:
+            if not key.startswith(prefix):
+                continue
+            name = key[len(prefix):]
+            if name == "gguid":
+                continue
+            fieldtype = fields[key][1]
+            if fieldtype == 11:
+                continue
+            column = fieldforbidden.get(name, name)
+
+            if column in HEADER_TEXT:
+                converter = _as_text
+            elif column in HEADER_NUMBER:
+                converter = _as_number
+            elif column == "tid":
+                converter = tid
+            elif fieldtype in TEXT_TYPES:
+                converter = _as_field_text
+            elif fieldtype in NUMBER_TYPES:
+                converter = _as_number
+            elif fieldtype == DATE_TYPE:
+                converter = _as_date
+            else:
+                continue
+
+            if column in self.columns:
+                slot = self.columns.index(column)
+            else:
+                slot = len(self.columns)
+                self.columns.append(column)
+            if column == "ind":
+                self.__indslot = slot
+            self.__converters[name] = (slot, converter)
+    #--------------------------------------------------------------------------------------
+    def encode(self, cvalues: Dict[str, Any], maxind: Optional[Dict[str, int]] = None) -> Tuple[Tuple[str, ...], Tuple[Any, ...]]:
+        """
+        Convert the values of one received row.
+
+        Parameters
+        ----------
+        cvalues : dict
+            Decoded ``cvalues`` of a ``sync_box`` row.
+        maxind : dict, optional
+            ``{tablename: highest ind}``, updated with the row ``ind``.
+
+        Returns
+        -------
+        tuple
+            ``(columns, params)`` in the codec column order, ready to be
+            bound to an ``INSERT``/``UPDATE``. Null, unknown and invalid
+            values are left out.
+        """
+        slots: List[Any] = [_SKIP] * len(self.columns)
+        converters = self.__converters
+        for key, value in cvalues.items():
+            if value is None:
+                continue
+            c = converters.get(key) or converters.get(key.lower())
+            if c is None:
+                continue
+            slots[c[0]] = c[1](value)
+
+        if maxind is not None and self.__indslot >= 0 and slots[self.__indslot] is not _SKIP:
+            try:
+                ind = int(float(slots[self.__indslot]))
+                if ind > maxind.get(self.tablename, 0):
+                    maxind[self.tablename] = ind
+            except ValueError:
+                pass
+
+        columns = self.columns
+        names = tuple(columns[i] for i in range(len(slots)) if slots[i] is not _SKIP)
+        params = tuple(v for v in slots if v is not _SKIP)
+        return names, params
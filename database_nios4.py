@@ -6,16 +6,45 @@
 #standard class
 from __future__ import annotations
 
-import mysql.connector
-from mysql.connector import Error
-from mysql.connector.connection import MySQLConnection  # precise connection type
-from typing import Any, Dict, List, Optional, Tuple
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 import datetime
+import threading
+import time
 import uuid
+import weakref
+
+if TYPE_CHECKING:
+    #mysql.connector is imported on first connection (faster startup)
+    from mysql.connector.connection import MySQLConnection  # precise connection type
 #================================================================================
 #nios4 class
 from utility_nios4 import utility_n4
 from utility_nios4 import error_n4
+from pool_nios4 import pool_nios4
+from catalog_nios4 import catalog_nios4, get_catalog, is_ddl
+from capture_nios4 import capture_nios4
+from index_nios4 import index_nios4, QUEUE_KEYS_DDL
+from sequence_nios4 import sequence_nios4, SEQUENCES_DDL
+#================================================================================
+#version of the core structure created by initializedb: bump it whenever
+#initializedb changes, so existing databases run the checks once more
+SCHEMA_VERSION = 1
+#MySQL error of a connection to a database that does not exist
+ER_BAD_DB_ERROR = 1049
+#MySQL errors of an ALTER TABLE algorithm the server cannot use (unknown, not supported)
+ER_ALGORITHM_ERRORS = (1800, 1845, 1846)
+#MySQL syntax error, raised for ALGORITHM=INSTANT by some older servers
+ER_PARSE_ERROR = 1064
+#================================================================================
+def _padded(part: List[str], chunk: int) -> List[str]:
+    """GUIDs padded (repeating the last) to a power of two, at most ``chunk``: few statement texts, reused."""
+    size = 1
+    while size < len(part):
+        size *= 2
+    size = min(size, chunk)
+    return part + [part[-1]] * (size - len(part))
 #================================================================================
 class database_nios4:
     """
@@ -25,7 +54,8 @@ class database_nios4:
     exposes a collection of convenience methods to introspect schema and run
     basic SQL operations used by Nios4.
     """
-    def __init__(self,username:str,password:str,dbname:str,hostdb:str,usernamedb:str,passworddb:str) -> None:
+    def __init__(self,username:str,password:str,dbname:str,hostdb:str,usernamedb:str,passworddb:str,
+                 poolsize:int = 5,poolmaxidle:float = 300.0) -> None:
         """
         Initialize the helper and ensure the database exists.
 
@@ -43,12 +73,23 @@ class database_nios4:
             MySQL user.
         passworddb : str
             MySQL password.
+        poolsize : int
+            Maximum number of pooled connections (see :class:`pool_nios4`).
+        poolmaxidle : float
+            Seconds after which an idle pooled connection is closed.
 
         Notes
         -----
-        - Connects to the MySQL server (without selecting a DB),
-          creates `dbname` if missing, then calls :meth:`initializedb`.
-        - Any connection errors are printed and stored in `self.err`.
+        - Opens the first pooled connection; only if that fails because
+          `dbname` does not exist (``ER_BAD_DB_ERROR``) connects to the
+          MySQL server (without selecting a DB) and creates it. Then calls
+          :meth:`initializedb`.
+        - Any other connection error (credentials, host, too many
+          connections) is printed and stored in `self.err`; the database is
+          then neither created nor initialized.
+        - Startup durations are stored in :attr:`timing`.
+        - All helpers share one connection pool instead of opening a
+          connection per statement.
         """
         self.__host = hostdb
         self.__usernamedb = usernamedb
@@ -57,34 +98,80 @@ class database_nios4:
         self.__password = password
         self.__dbname = dbname
         self.viewmessage = True
+        self.err = error_n4("","")
+        #MySQL errno of the last failed connectdb
+        self.__connecterrno: Optional[int] = None
+        self.__pool = pool_nios4(self.connectdb,poolsize=poolsize,maxidle=poolmaxidle)
+        #per-thread stack of open transactions (one failure flag per level)
+        self.__local = threading.local()
+        #prepared statements per connection, keyed by SQL text (LRU)
+        self.stmtcachesize = 64
+        self.__stmtcache: "weakref.WeakKeyDictionary[Any, OrderedDict[str, Any]]" = weakref.WeakKeyDictionary()
+        self.__stmtlock = threading.Lock()
+        #rows sent per round-trip by executemany
+        self.executemany_chunk = 1000
+        #tables with more rows than this are probed by gguid (see get_gguid)
+        self.gguid_lookup_threshold = 20000
+        self.gguid_lookup_chunk = 1000
+        #schema metadata shared by every instance working on this schema
+        self.__catalog = get_catalog(hostdb,dbname,self.__load_catalog)
+        self.__indexes = index_nios4(self,dbname)
+        #optional trigger-based change capture (see install_capture)
+        self.__capture = capture_nios4(self,dbname)
+        #ind values reserved in blocks (see get_ind)
+        self.__sequences = sequence_nios4(self.__pool)
+
+        #startup timing in seconds (connect, bootstrap, total)
+        self.timing: Dict[str, float] = {}
+        start = time.perf_counter()
+
+        try:
+            #normal case: the database exists, the first pooled connection proves it
+            self.__pool.release(self.__pool.acquire())
+        except Exception as e:
+            if self.__connecterrno != ER_BAD_DB_ERROR or self.__createdb() == False:
+                if self.err.errorcode == "":
+                    self.err.errorcode = "E001"
+                    self.err.errormessage = str(e)
+                print(f"Error connecting to MySQL: {self.err.errormessage}")
+                self.timing["connect"] = self.timing["total"] = time.perf_counter() - start
+                return
+        self.timing["connect"] = time.perf_counter() - start
+
+        bootstrap = time.perf_counter()
+        self.initializedb()
+        self.timing["bootstrap"] = time.perf_counter() - bootstrap
+        self.timing["total"] = time.perf_counter() - start
+        if self.viewmessage == True:
+            print(self.stime() + "     DB READY ({:.3f}s)".format(self.timing["total"]))
+    #--------------------------------------------------------------------------------------
+    def __createdb(self) -> bool:
+        """Create the database through a server-level connection (no DB selected)."""
+        import mysql.connector
 
+        connection = None
+        cursor = None
         try:
             connection = mysql.connector.connect(
-                host=hostdb,
-                user=usernamedb,
-                password=passworddb
+                host=self.__host,
+                user=self.__usernamedb,
+                password=self.__passworddb
             )
+            cursor = connection.cursor()
+            cursor.execute(f"CREATE DATABASE IF NOT EXISTS {self.__dbname} CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
+            print(f"Database '{self.__dbname}' created successfully.")
+            self.err.error = False
+            return True
 
-            if connection.is_connected():
-                cursor = connection.cursor()
-                cursor.execute("SHOW DATABASES")
-                databases = [db[0] for db in cursor]
-                if dbname in databases:
-                    print(f"Il database '{dbname}' esiste già.")
-                else:
-                    cursor.execute(f"CREATE DATABASE {dbname} CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
-                    print(f"Database '{dbname}' created successfully.")
-
-                self.initializedb()
-
-        except Error as e:
-            print(f"Error connecting to MySQL: {e}")
+        except mysql.connector.Error as e:
+            self.err.errorcode = "E001"
+            self.err.errormessage = str(e)
+            return False
         finally:
-            if (connection.is_connected()):
+            if cursor is not None:
                 cursor.close()
+            if connection is not None and connection.is_connected():
                 connection.close()
-
-        self.err = error_n4("","")
     #--------------------------------------------------------------------------------------
     def exists_table(self, tablename: str) -> bool:
         """
@@ -100,14 +187,7 @@ class database_nios4:
         bool
             ``True`` if the table exists, ``False`` otherwise.
         """        
-        connectiondb = self.connectdb()
-        cursor = connectiondb.cursor()
-        query = f"SHOW TABLES LIKE '{tablename}'"
-        cursor.execute(query)
-        result = cursor.fetchone()
-        cursor.close()
-        connectiondb.close()
-        return result is not None        
+        return self.__catalog.has_table(tablename)
     #--------------------------------------------------------------------------------------
     def exists_field(self, tablename: str, fieldname: str) -> bool:
         """
@@ -125,14 +205,7 @@ class database_nios4:
         bool
             ``True`` if the column exists, ``False`` otherwise.
         """        
-        connectiondb = self.connectdb()
-        cursor = connectiondb.cursor()
-        query = f"SHOW COLUMNS FROM {tablename} LIKE '{fieldname}'"
-        cursor.execute(query)
-        result = cursor.fetchone()
-        cursor.close()
-        connectiondb.close()
-        return result is not None  
+        return self.__catalog.column(tablename, fieldname) is not None
     #--------------------------------------------------------------------------------------
     def connectdb(self) -> Optional[MySQLConnection]:
         """
@@ -145,9 +218,11 @@ class database_nios4:
 
         Notes
         -----
-        Stores error details in ``self.err`` on failure.
+        Stores error details in ``self.err`` on failure. The returned
+        connection is not pooled: use :meth:`pool` for pooled access.
         """
         try:
+            import mysql.connector
 
             db_config = {
                 'host': self.__host,
@@ -160,10 +235,219 @@ class database_nios4:
             return connectiondb
         
         except Exception as e:
+            self.__connecterrno = getattr(e, "errno", None)
             self.err.errorcode = "E001"
             self.err.errormessage = str(e)
             return None
     #--------------------------------------------------------------------------------------
+    def pool(self) -> pool_nios4:
+        """
+        Connection pool shared by all helpers.
+
+        Returns
+        -------
+        pool_nios4
+            The pool; ``with db.pool().connection() as conn:`` checks out
+            the connection held by the current thread.
+        """
+        return self.__pool
+    #--------------------------------------------------------------------------------------
+    def pool_stats(self) -> Dict[str, float]:
+        """
+        Connection pool statistics (hits, misses, waits, evictions).
+
+        Returns
+        -------
+        dict
+            See :meth:`pool_nios4.stats`.
+        """
+        return self.__pool.stats()
+    #--------------------------------------------------------------------------------------
+    def close(self) -> None:
+        """Close every idle pooled connection."""
+        self.__pool.closeall()
+    #--------------------------------------------------------------------------------------
+    def catalog(self) -> catalog_nios4:
+        """
+        Cached schema metadata (tables and columns).
+
+        Returns
+        -------
+        catalog_nios4
+            The process-wide catalog of this schema.
+        """
+        return self.__catalog
+    #--------------------------------------------------------------------------------------
+    def invalidate_schema(self) -> None:
+        """
+        Drop the cached schema metadata.
+
+        Notes
+        -----
+        DDL run through :meth:`setsql`/:meth:`setsql_params` invalidates the
+        cache automatically; call this after schema changes made elsewhere.
+        """
+        self.__catalog.invalidate()
+    #--------------------------------------------------------------------------------------
+    def ensure_indexes(self) -> bool:
+        """
+        Create the missing keys of synced tables and sync queues.
+
+        Returns
+        -------
+        bool
+            ``True`` if all keys exist, ``False`` otherwise (see ``self.err``).
+
+        Notes
+        -----
+        Primary key on ``gguid`` and ``(tid, ind)`` on synced tables,
+        ``(tablename, gguidrif)`` on ``lo_syncbox``/``lo_cleanbox``; see
+        :class:`index_nios4`.
+        """
+        return self.__indexes.ensure()
+    #--------------------------------------------------------------------------------------
+    def index_report(self) -> Optional[Dict[str, Dict[str, List[str]]]]:
+        """
+        Report missing, duplicate and redundant indexes.
+
+        Returns
+        -------
+        dict or None
+            See :meth:`index_nios4.report`.
+        """
+        return self.__indexes.report()
+    #--------------------------------------------------------------------------------------
+    def capture(self) -> capture_nios4:
+        """
+        Change capture manager of this schema.
+
+        Returns
+        -------
+        capture_nios4
+            Manager of the ``lo_changelog`` table and its triggers.
+        """
+        return self.__capture
+    #--------------------------------------------------------------------------------------
+    def install_capture(self) -> bool:
+        """
+        Enable trigger-based change capture on every synced table.
+
+        Returns
+        -------
+        bool
+            ``True`` on success, ``False`` otherwise (see ``self.err``).
+
+        Notes
+        -----
+        Rows changed since the last synchronization (``lo_setting.tidsync``)
+        are copied into the log. Requires the ``TRIGGER`` privilege (and,
+        with binary logging, ``log_bin_trust_function_creators`` or
+        ``SUPER``). Once installed, :meth:`sync_nios4.syncro` reads the rows
+        to upload from the log instead of scanning the tables.
+        """
+        records = self.getsql("SELECT tidsync FROM lo_setting WHERE gguid='0'")
+        if records == None:
+            return False
+        return self.__capture.install(records[0][0] if len(records) > 0 else 0)
+    #--------------------------------------------------------------------------------------
+    def uninstall_capture(self) -> bool:
+        """
+        Drop the change capture triggers and log.
+
+        Returns
+        -------
+        bool
+            ``True`` on success, ``False`` otherwise (see ``self.err``).
+        """
+        return self.__capture.uninstall()
+    #--------------------------------------------------------------------------------------
+    def __load_catalog(self) -> Optional[List[Tuple[Any, ...]]]:
+        """Read every column of the schema with one INFORMATION_SCHEMA query."""
+        return self.getsql(f"SELECT TABLE_NAME, COLUMN_NAME, DATA_TYPE, IS_NULLABLE, COLUMN_DEFAULT, COLUMN_KEY FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_SCHEMA ='{self.__dbname}' ORDER BY TABLE_NAME, ORDINAL_POSITION")
+    #--------------------------------------------------------------------------------------
+    def __txstack(self) -> List[bool]:
+        """Transaction stack of the current thread."""
+        stack = getattr(self.__local, "txstack", None)
+        if stack is None:
+            stack = []
+            self.__local.txstack = stack
+        return stack
+    #--------------------------------------------------------------------------------------
+    def in_transaction(self) -> bool:
+        """
+        Whether the current thread is inside :meth:`transaction`.
+
+        Returns
+        -------
+        bool
+            ``True`` if statements are currently grouped in a transaction.
+        """
+        return len(self.__txstack()) > 0
+    #--------------------------------------------------------------------------------------
+    @contextmanager
+    def transaction(self) -> Iterator[Any]:
+        """
+        Group statements in a single unit of work.
+
+        Yields
+        ------
+        connection
+            The pooled connection used by every helper called by this thread
+            inside the block.
+
+        Notes
+        -----
+        - :meth:`setsql` does not commit inside the block; the outermost
+          block commits once on exit.
+        - The block is rolled back if an exception escapes it or if any
+          :meth:`setsql` inside it fails.
+        - Nested blocks use ``SAVEPOINT``: a failing inner block only rolls
+          back its own statements.
+        - DDL statements (``CREATE``/``ALTER``/``DROP``) commit implicitly in
+          MySQL and cannot be rolled back.
+        """
+        stack = self.__txstack()
+        level = len(stack)
+        savepoint = "n4sp" + str(level)
+        conn = self.__pool.acquire()
+        try:
+            if level > 0:
+                c = conn.cursor()
+                c.execute("SAVEPOINT " + savepoint)
+                c.close()
+        except BaseException:
+            self.__pool.release(conn, checkhealth=True)
+            raise
+
+        stack.append(False)
+        completed = False
+        try:
+            yield conn
+            completed = True
+        finally:
+            failed = stack.pop() or not completed
+            try:
+                if level == 0:
+                    if failed:
+                        conn.rollback()
+                    else:
+                        conn.commit()
+                else:
+                    c = conn.cursor()
+                    if failed:
+                        c.execute("ROLLBACK TO SAVEPOINT " + savepoint)
+                    c.execute("RELEASE SAVEPOINT " + savepoint)
+                    c.close()
+            except Exception as e:
+                self.err.errorcode = "E020"
+                self.err.errormessage = str(e)
+                if level > 0:
+                    stack[-1] = True
+                if completed:
+                    self.__pool.release(conn, checkhealth=True)
+                    raise
+            self.__pool.release(conn, checkhealth=not completed)
+    #--------------------------------------------------------------------------------------
     def stime(self) -> str:
         """
         Get the current timestamp as a formatted string.
@@ -194,7 +478,15 @@ class database_nios4:
         - ``lo_setting`` (with an initial row)
         - ``lo_cleanbox``
         - ``lo_syncbox``
+        - ``lo_sequences``
+
+        Then creates any missing index (see :meth:`ensure_indexes`) and
+        stamps ``lo_setting.schemaversion`` with :data:`SCHEMA_VERSION`.
+        When the stamp is already current, all checks are skipped.
         """
+        if self.schema_version() == SCHEMA_VERSION:
+            return True
+
         try:
             if self.viewmessage == True:
                 print("--------------------------------------------------------------------")
@@ -205,25 +497,25 @@ class database_nios4:
             if not self.exists_table("so_tables"):
                 if self.viewmessage == True:
                     print(self.stime() +  "     create so_tables")
-                if self.setsql("CREATE TABLE so_tables (gguid VARCHAR(40) Not NULL Default '' PRIMARY KEY, tid DOUBLE NOT NULL DEFAULT 0,eli INTEGER NOT NULL DEFAULT 0,arc INTEGER NOT NULL DEFAULT 0,ut VARCHAR(255) NOT NULL DEFAULT '' , displayable DOUBLE NOT NULL DEFAULT 0,eliminable DOUBLE NOT NULL DEFAULT 0,editable DOUBLE NOT NULL DEFAULT 0 , tablename TEXT,syncyes DOUBLE NOT NULL DEFAULT 0,syncsel DOUBLE NOT NULL DEFAULT 0,param MEDIUMTEXT NOT NULL,expressions MEDIUMTEXT NOT NULL,tablelabel TEXT NOT NULL,newlabel TEXT NOT NULL, ind INTEGER NOT NULL DEFAULT 0,lgroup TEXT NOT NULL)") == False:
+                if self.setsql("CREATE TABLE so_tables (gguid VARCHAR(40) Not NULL Default '' PRIMARY KEY, tid DOUBLE NOT NULL DEFAULT 0,eli INTEGER NOT NULL DEFAULT 0,arc INTEGER NOT NULL DEFAULT 0,ut VARCHAR(255) NOT NULL DEFAULT '' , displayable DOUBLE NOT NULL DEFAULT 0,eliminable DOUBLE NOT NULL DEFAULT 0,editable DOUBLE NOT NULL DEFAULT 0 , tablename TEXT,syncyes DOUBLE NOT NULL DEFAULT 0,syncsel DOUBLE NOT NULL DEFAULT 0,param MEDIUMTEXT NOT NULL,expressions MEDIUMTEXT NOT NULL,tablelabel TEXT NOT NULL,newlabel TEXT NOT NULL, ind INTEGER NOT NULL DEFAULT 0,lgroup TEXT NOT NULL, KEY ix_n4_tid_ind (tid,ind))") == False:
                     return False
 
             if not self.exists_table("so_fields"):
                 if self.viewmessage == True:
                     print(self.stime() +  "     create so_fields")
-                if self.setsql("CREATE TABLE so_fields(gguid VARCHAR(40) NOT NULL DEFAULT '' PRIMARY KEY, tid DOUBLE NOT NULL DEFAULT 0,eli INTEGER NOT NULL DEFAULT 0,arc INTEGER NOT NULL DEFAULT 0,ut VARCHAR(255) NOT NULL, displayable DOUBLE NOT NULL DEFAULT 0,eliminable DOUBLE NOT NULL DEFAULT 0,editable DOUBLE NOT NULL DEFAULT 0 , tablename TEXT NOT NULL, fieldname TEXT NOT NULL, fieldlabel TEXT NOT NULL, fieldtype INTEGER NOT NULL DEFAULT 0, viewcolumn INTEGER NOT NULL DEFAULT 0, columnwidth DOUBLE NOT NULL DEFAULT 0, obligatory INTEGER NOT NULL DEFAULT 0, param TEXT NOT NULL, ofsystem INTEGER NOT NULL DEFAULT 0, expression TEXT NOT NULL, style TEXT NOT NULL, panel TEXT NOT NULL, panelindex INTEGER NOT NULL DEFAULT 0, fieldlabel2 TEXT NOT NULL, ind INTEGER NOT NULL DEFAULT 0, columnindex INTEGER NOT NULL DEFAULT 0)") == False:
+                if self.setsql("CREATE TABLE so_fields(gguid VARCHAR(40) NOT NULL DEFAULT '' PRIMARY KEY, tid DOUBLE NOT NULL DEFAULT 0,eli INTEGER NOT NULL DEFAULT 0,arc INTEGER NOT NULL DEFAULT 0,ut VARCHAR(255) NOT NULL, displayable DOUBLE NOT NULL DEFAULT 0,eliminable DOUBLE NOT NULL DEFAULT 0,editable DOUBLE NOT NULL DEFAULT 0 , tablename TEXT NOT NULL, fieldname TEXT NOT NULL, fieldlabel TEXT NOT NULL, fieldtype INTEGER NOT NULL DEFAULT 0, viewcolumn INTEGER NOT NULL DEFAULT 0, columnwidth DOUBLE NOT NULL DEFAULT 0, obligatory INTEGER NOT NULL DEFAULT 0, param TEXT NOT NULL, ofsystem INTEGER NOT NULL DEFAULT 0, expression TEXT NOT NULL, style TEXT NOT NULL, panel TEXT NOT NULL, panelindex INTEGER NOT NULL DEFAULT 0, fieldlabel2 TEXT NOT NULL, ind INTEGER NOT NULL DEFAULT 0, columnindex INTEGER NOT NULL DEFAULT 0, KEY ix_n4_tid_ind (tid,ind))") == False:
                     return False
 
             if not self.exists_table("so_users"):
                 if self.viewmessage == True:
                     print(self.stime() +  "     create so_users")
-                if self.setsql("CREATE TABLE so_users(gguid VARCHAR(40) NOT NULL DEFAULT '' PRIMARY KEY, tid DOUBLE NOT NULL DEFAULT 0,eli INTEGER NOT NULL DEFAULT 0,arc INTEGER NOT NULL DEFAULT 0,ut VARCHAR(255) NOT NULL DEFAULT '' , username TEXT NOT NULL, password_hash TEXT NOT NULL, param TEXT NOT NULL, categories DOUBLE NOT NULL DEFAULT 0,admin INTEGER NOT NULL DEFAULT 0,id INTEGER NOT NULL DEFAULT 0, ind INTEGER NOT NULL DEFAULT 0)") == False:
+                if self.setsql("CREATE TABLE so_users(gguid VARCHAR(40) NOT NULL DEFAULT '' PRIMARY KEY, tid DOUBLE NOT NULL DEFAULT 0,eli INTEGER NOT NULL DEFAULT 0,arc INTEGER NOT NULL DEFAULT 0,ut VARCHAR(255) NOT NULL DEFAULT '' , username TEXT NOT NULL, password_hash TEXT NOT NULL, param TEXT NOT NULL, categories DOUBLE NOT NULL DEFAULT 0,admin INTEGER NOT NULL DEFAULT 0,id INTEGER NOT NULL DEFAULT 0, ind INTEGER NOT NULL DEFAULT 0, KEY ix_n4_tid_ind (tid,ind))") == False:
                     return False
 
             if not self.exists_table("lo_setting"):
                 if self.viewmessage == True:
                     print(self.stime() +  "     create lo_setting")
-                if self.setsql("CREATE TABLE lo_setting(gguid VARCHAR(40) NOT NULL DEFAULT '' PRIMARY KEY, tidsync DOUBLE NOT NULL DEFAULT 0)") == False:
+                if self.setsql("CREATE TABLE lo_setting(gguid VARCHAR(40) NOT NULL DEFAULT '' PRIMARY KEY, tidsync DOUBLE NOT NULL DEFAULT 0, schemaversion INTEGER NOT NULL DEFAULT 0)") == False:
                     return False
                 if self.setsql("INSERT INTO lo_setting(gguid, tidsync) VALUES ('0',0)") == False:
                     return False
@@ -231,13 +523,32 @@ class database_nios4:
             if not self.exists_table("lo_cleanbox"):
                 if self.viewmessage == True:
                     print(self.stime() +  "     create lo_cleanbox")
-                if self.setsql("CREATE TABLE lo_cleanbox(gguid VARCHAR(40) NOT NULL DEFAULT '' PRIMARY KEY, tid DOUBLE NOT NULL DEFAULT 0,tablename TEXT NOT NULL,gguidrif CHAR(40) NOT NULL DEFAULT '')") == False:
+                if self.setsql("CREATE TABLE lo_cleanbox(gguid VARCHAR(40) NOT NULL DEFAULT '' PRIMARY KEY, tid DOUBLE NOT NULL DEFAULT 0,tablename TEXT NOT NULL,gguidrif CHAR(40) NOT NULL DEFAULT '', " + QUEUE_KEYS_DDL + ")") == False:
                     return False
 
             if not self.exists_table("lo_syncbox"):
                 if self.viewmessage == True:
                     print(self.stime() +  "     create lo_syncbox")
-                if self.setsql("CREATE TABLE lo_syncbox(gguid VARCHAR(40) NOT NULL DEFAULT '' PRIMARY KEY, tid DOUBLE NOT NULL DEFAULT 0,tablename TEXT NOT NULL,gguidrif CHAR(40) NOT NULL DEFAULT '')") == False:
+                if self.setsql("CREATE TABLE lo_syncbox(gguid VARCHAR(40) NOT NULL DEFAULT '' PRIMARY KEY, tid DOUBLE NOT NULL DEFAULT 0,tablename TEXT NOT NULL,gguidrif CHAR(40) NOT NULL DEFAULT '', " + QUEUE_KEYS_DDL + ")") == False:
+                    return False
+
+            if not self.exists_table("lo_sequences"):
+                if self.viewmessage == True:
+                    print(self.stime() +  "     create lo_sequences")
+                if self.setsql(SEQUENCES_DDL) == False:
+                    return False
+
+            #databases created before the index manager get their keys here
+            indexes = self.ensure_indexes()
+            if indexes == False:
+                print("ERROR INDEX ->" + str(self.err.errormessage))
+
+            if not self.exists_field("lo_setting","schemaversion"):
+                if self.setsql("ALTER TABLE lo_setting ADD schemaversion INTEGER NOT NULL DEFAULT 0") == False:
+                    return False
+            #stamp only a complete bootstrap, so a failed index migration is retried
+            if indexes == True:
+                if self.setsql_params("UPDATE lo_setting SET schemaversion=%s WHERE gguid='0'",(SCHEMA_VERSION,)) == False:
                     return False
 
         except Exception as e:
@@ -247,6 +558,33 @@ class database_nios4:
 
         return True
     #--------------------------------------------------------------------------------------
+    def schema_version(self) -> int:
+        """
+        Core structure version stamped in ``lo_setting``.
+
+        Returns
+        -------
+        int
+            The stamped version, or ``0`` if the database has not been
+            stamped yet (or ``lo_setting`` does not exist).
+
+        Notes
+        -----
+        Runs a single query and leaves ``self.err`` untouched on failure,
+        since a missing stamp is expected on new databases.
+        """
+        try:
+            with self.__pool.connection() as connectiondb:
+                c = connectiondb.cursor()
+                c.execute("SELECT schemaversion FROM lo_setting WHERE gguid='0'")
+                records = c.fetchall()
+                c.close()
+            if records:
+                return int(records[0][0])
+        except Exception:
+            pass
+        return 0
+    #--------------------------------------------------------------------------------------
     def get_ind(self, tablename: str) -> int:
         """
         Compute the next `ind` value for a table.
@@ -259,19 +597,54 @@ class database_nios4:
         Returns
         -------
         int
-            The next integer index (``max(ind)+1``), or ``0`` on error.
+            The next integer index, or ``0`` on error.
+
+        Notes
+        -----
+        Values come from a per-table sequence in ``lo_sequences`` (seeded
+        with ``max(ind)+1``) reserved in blocks of :attr:`indblock`, so
+        concurrent threads and processes never get the same value.
         """
         try:
-            records=self.getsql(f"SELECT ind FROM {tablename} ORDER BY ind desc limit 1")
-            if records:
-                return records[0][0] + 1
-            else:
-                return 1
+            return self.__sequences.next(tablename)
         except Exception as e:
             self.err.errorcode = "E006"
             self.err.errormessage = str(e)
             return 0   
     #--------------------------------------------------------------------------------------
+    def observe_ind(self, tablename: str, ind: int) -> bool:
+        """
+        Keep the ``ind`` sequence of a table ahead of externally written rows.
+
+        Parameters
+        ----------
+        tablename : str
+            Table name.
+        ind : int
+            Highest ``ind`` written without :meth:`get_ind`.
+
+        Returns
+        -------
+        bool
+            ``True`` on success, ``False`` otherwise.
+        """
+        try:
+            self.__sequences.observe(tablename, ind)
+            return True
+        except Exception as e:
+            self.err.errorcode = "E006"
+            self.err.errormessage = str(e)
+            return False
+    #--------------------------------------------------------------------------------------
+    @property
+    def indblock(self) -> int:
+        """Number of ``ind`` values reserved per round-trip by :meth:`get_ind`."""
+        return self.__sequences.blocksize
+
+    @indblock.setter
+    def indblock(self, value: int) -> None:
+        self.__sequences.blocksize = value
+    #--------------------------------------------------------------------------------------
     def convap(self, value: Optional[Any]) -> str:
         """
         Convert a Python value to a SQL-safe string for embedding in queries.
@@ -311,10 +684,8 @@ class database_nios4:
         gguid = uuid.uuid4()
         tid = datetime.datetime.utcnow().strftime('%Y%m%d%H%M%S')
 
-        stringa = f"INSERT INTO lo_syncbox (gguid,tid,tablename,gguidrif) "    
-        stringa2 = f"VALUES ('{gguid}',{tid},'{self.convap(tablename)}','{gguidrif}')"
-
-        return self.setsql(stringa + stringa2)
+        return self.setsql_params("INSERT INTO lo_syncbox (gguid,tid,tablename,gguidrif) VALUES (%s,%s,%s,%s)",
+                                  (str(gguid), tid, tablename, str(gguidrif)))
     #--------------------------------------------------------------------------------------
     def addcleanbox(self, tablename: str, gguidrif: str) -> bool:
         """
@@ -336,13 +707,11 @@ class database_nios4:
         gguid = uuid.uuid4()
         tid = datetime.datetime.utcnow().strftime('%Y%m%d%H%M%S')
 
-        sql1 = f"INSERT INTO lo_cleanbox (gguid,tid,tablename,gguidrif) "    
-        sql2 = f"VALUES ('{gguid}',{tid},'{self.convap(tablename)}','{gguidrif}')"
-
         # Remove from syncbox if present
-        self.setsql(f"DELETE FROM lo_syncbox WHERE tablename='{self.convap(tablename)}' and gguidrif='{gguidrif}'")
+        self.setsql_params("DELETE FROM lo_syncbox WHERE tablename=%s and gguidrif=%s", (tablename, str(gguidrif)))
 
-        return self.setsql(sql1 + sql2)
+        return self.setsql_params("INSERT INTO lo_cleanbox (gguid,tid,tablename,gguidrif) VALUES (%s,%s,%s,%s)",
+                                  (str(gguid), tid, tablename, str(gguidrif)))
     #--------------------------------------------------------------------------------------
     def setsql(self, sql: str) -> bool:
         """
@@ -360,24 +729,234 @@ class database_nios4:
 
         Notes
         -----
-        Commits the transaction if the statement succeeds.
+        Commits the transaction if the statement succeeds, unless called
+        inside :meth:`transaction` (the block commits on exit instead).
         """
+        stack = self.__txstack()
         try:
-            connectiondb = self.connectdb()
-            if connectiondb is None:
-                raise RuntimeError("Cannot open DB connection")            
-            c = connectiondb.cursor()
-            c.execute(sql)
-            connectiondb.commit()
-            c.close()
-            connectiondb.close()
+            with self.__pool.connection() as connectiondb:
+                c = connectiondb.cursor()
+                try:
+                    c.execute(sql)
+                finally:
+                    if is_ddl(sql):
+                        self.__catalog.invalidate()
+                if not stack:
+                    connectiondb.commit()
+                c.close()
             return True
         except Exception as e:
+            if stack:
+                stack[-1] = True
             self.err.errorcode = "E004"
             self.err.errormessage = str(e)
             print("ERROR SQL ->" + str(e))
             return False
     #--------------------------------------------------------------------------------------
+    def add_columns(self, tablename: str, columns: Sequence[str]) -> bool:
+        """
+        Add several columns to a table with a single ``ALTER TABLE``.
+
+        Parameters
+        ----------
+        tablename : str
+            Target table.
+        columns : sequence of str
+            Column definitions (e.g. ``"price DOUBLE NOT NULL DEFAULT 0"``).
+
+        Returns
+        -------
+        bool
+            ``True`` on success, ``False`` otherwise.
+
+        Notes
+        -----
+        ``ALGORITHM=INSTANT`` is tried first, then ``INPLACE``, then the
+        server default (table copy), so the table is rebuilt at most once
+        and only when the server cannot avoid it. The next algorithm is
+        tried only when the server refuses the current one; any other error
+        is reported at once.
+        """
+        if len(columns) == 0:
+            return True
+        sql = "ALTER TABLE " + tablename + " " + ",".join("ADD " + c for c in columns)
+        stack = self.__txstack()
+        error: Optional[Exception] = None
+        for algorithm in ("INSTANT", "INPLACE", ""):
+            try:
+                with self.__pool.connection() as connectiondb:
+                    c = connectiondb.cursor()
+                    try:
+                        c.execute(sql + (", ALGORITHM=" + algorithm if algorithm != "" else ""))
+                    finally:
+                        self.__catalog.invalidate()
+                    c.close()
+                return True
+            except Exception as e:
+                error = e
+                errno = getattr(e, "errno", None)
+                if errno not in ER_ALGORITHM_ERRORS and not (algorithm == "INSTANT" and errno == ER_PARSE_ERROR):
+                    break
+        if stack:
+            stack[-1] = True
+        self.err.errorcode = "E004"
+        self.err.errormessage = str(error)
+        print("ERROR SQL ->" + str(error))
+        return False
+    #--------------------------------------------------------------------------------------
+    def __prepared(self, connectiondb: Any, sql: str) -> Any:
+        """Prepared cursor for ``sql`` on a connection, reused across calls."""
+        with self.__stmtlock:
+            cache = self.__stmtcache.get(connectiondb)
+            if cache is None:
+                cache = OrderedDict()
+                self.__stmtcache[connectiondb] = cache
+        c = cache.get(sql)
+        if c is not None:
+            cache.move_to_end(sql)
+            return c
+        c = connectiondb.cursor(prepared=True)
+        cache[sql] = c
+        if len(cache) > self.stmtcachesize:
+            _, old = cache.popitem(last=False)
+            try:
+                old.close()
+            except Exception:
+                pass
+        return c
+    #--------------------------------------------------------------------------------------
+    def __unprepare(self, connectiondb: Any, sql: str) -> None:
+        """Drop a prepared cursor after an error (its state is unknown)."""
+        cache = self.__stmtcache.get(connectiondb)
+        if cache is not None:
+            c = cache.pop(sql, None)
+            if c is not None:
+                try:
+                    c.close()
+                except Exception:
+                    pass
+    #--------------------------------------------------------------------------------------
+    def setsql_params(self, sql: str, params: Sequence[Any]) -> bool:
+        """
+        Execute a single parameterized SQL statement (no result expected).
+
+        Parameters
+        ----------
+        sql : str
+            SQL with ``%s`` placeholders.
+        params : sequence
+            Values bound to the placeholders (no escaping needed).
+
+        Returns
+        -------
+        bool
+            ``True`` on success, ``False`` otherwise.
+
+        Notes
+        -----
+        The statement is prepared once per pooled connection and reused for
+        the same SQL text. Commits like :meth:`setsql`.
+        """
+        stack = self.__txstack()
+        try:
+            with self.__pool.connection() as connectiondb:
+                c = self.__prepared(connectiondb, sql)
+                try:
+                    c.execute(sql, tuple(params))
+                except Exception:
+                    self.__unprepare(connectiondb, sql)
+                    raise
+                finally:
+                    if is_ddl(sql):
+                        self.__catalog.invalidate()
+                if not stack:
+                    connectiondb.commit()
+            return True
+        except Exception as e:
+            if stack:
+                stack[-1] = True
+            self.err.errorcode = "E004"
+            self.err.errormessage = str(e)
+            print("ERROR SQL ->" + str(e))
+            return False
+    #--------------------------------------------------------------------------------------
+    def executemany(self, sql: str, seq_of_params: Iterable[Sequence[Any]]) -> bool:
+        """
+        Execute a parameterized statement for many rows.
+
+        Parameters
+        ----------
+        sql : str
+            SQL with ``%s`` placeholders.
+        seq_of_params : iterable of sequence
+            One parameter tuple per row.
+
+        Returns
+        -------
+        bool
+            ``True`` on success, ``False`` otherwise.
+
+        Notes
+        -----
+        ``INSERT ... VALUES`` statements are sent as one multi-row insert per
+        :attr:`executemany_chunk` rows. Everything is committed once at the
+        end (or by the enclosing :meth:`transaction`).
+        """
+        rows = [tuple(p) for p in seq_of_params]
+        if not rows:
+            return True
+        stack = self.__txstack()
+        try:
+            with self.__pool.connection() as connectiondb:
+                c = connectiondb.cursor()
+                try:
+                    step = max(self.executemany_chunk, 1)
+                    for first in range(0, len(rows), step):
+                        c.executemany(sql, rows[first:first + step])
+                finally:
+                    c.close()
+                if not stack:
+                    connectiondb.commit()
+            return True
+        except Exception as e:
+            if stack:
+                stack[-1] = True
+            self.err.errorcode = "E004"
+            self.err.errormessage = str(e)
+            print("ERROR SQL ->" + str(e))
+            return False
+    #--------------------------------------------------------------------------------------
+    def getsql_params(self, sql: str, params: Sequence[Any]) -> Optional[List[Tuple[Any, ...]]]:
+        """
+        Execute a parameterized query and fetch all rows.
+
+        Parameters
+        ----------
+        sql : str
+            SQL query with ``%s`` placeholders.
+        params : sequence
+            Values bound to the placeholders.
+
+        Returns
+        -------
+        list of tuple or None
+            Result rows, or ``None`` on failure.
+        """
+        try:
+            with self.__pool.connection() as connectiondb:
+                c = self.__prepared(connectiondb, sql)
+                try:
+                    c.execute(sql, tuple(params))
+                    records: List[Tuple[Any, ...]] = c.fetchall()
+                except Exception:
+                    self.__unprepare(connectiondb, sql)
+                    raise
+            return records
+        except Exception as e:
+            self.err.errorcode = "E005"
+            self.err.errormessage = str(e)
+            return None
+    #--------------------------------------------------------------------------------------
     def getsql(self, sql: str) -> Optional[List[Tuple[Any, ...]]]:
         """
         Execute a SQL query and fetch all rows.
@@ -394,19 +973,216 @@ class database_nios4:
             ``None`` on failure.
         """
         try:
-            connectiondb = self.connectdb()
-            if connectiondb is None:
-                raise RuntimeError("Cannot open DB connection")            
-            c = connectiondb.cursor()
-            c.execute(sql)
-            records: List[Tuple[Any, ...]] = c.fetchall()
-            c.close()
-            connectiondb.close()
+            with self.__pool.connection() as connectiondb:
+                c = connectiondb.cursor()
+                c.execute(sql)
+                records: List[Tuple[Any, ...]] = c.fetchall()
+                c.close()
             return records
         except Exception as e:
             self.err.errorcode = "E005"
             self.err.errormessage = str(e)
             return None
+    #--------------------------------------------------------------------------------------
+    def iter_sql(self, sql: str, batch_size: int = 1000) -> Optional[Iterator[Tuple[Any, ...]]]:
+        """
+        Execute a SQL query and stream its rows.
+
+        Parameters
+        ----------
+        sql : str
+            SQL query to execute.
+        batch_size : int
+            Rows read from the server per ``fetchmany`` call.
+
+        Returns
+        -------
+        iterator of tuple or None
+            Iterator over the result rows, or ``None`` if the query failed.
+
+        Notes
+        -----
+        - Uses an unbuffered cursor on a private pooled connection, so only
+          ``batch_size`` rows are held in memory at a time and other helpers
+          can be called while iterating. Uncommitted changes of the caller's
+          :meth:`transaction` are not visible to the query.
+        - Stopping the iteration early closes the connection instead of
+          returning it to the pool.
+        """
+        try:
+            connectiondb = self.__pool.acquire(private=True)
+        except Exception as e:
+            self.err.errorcode = "E005"
+            self.err.errormessage = str(e)
+            return None
+        try:
+            c = connectiondb.cursor(buffered=False)
+            c.execute(sql)
+        except Exception as e:
+            self.__pool.release(connectiondb, private=True, discard=True)
+            self.err.errorcode = "E005"
+            self.err.errormessage = str(e)
+            return None
+
+        rows = self.__iter_rows(connectiondb, c, batch_size)
+        #start the generator so that its cleanup runs even if never iterated
+        next(rows)
+        return rows
+    #--------------------------------------------------------------------------------------
+    def __iter_rows(self, connectiondb: Any, c: Any, batch_size: int) -> Iterator[Any]:
+        """Generator behind :meth:`iter_sql` (first item is a priming ``None``)."""
+        completed = False
+        try:
+            yield None
+            while True:
+                records = c.fetchmany(batch_size)
+                if not records:
+                    break
+                for r in records:
+                    yield r
+            completed = True
+        except Exception as e:
+            self.err.errorcode = "E005"
+            self.err.errormessage = str(e)
+            raise
+        finally:
+            try:
+                c.close()
+            except Exception:
+                completed = False
+            self.__pool.release(connectiondb, private=True, discard=not completed)
+    #--------------------------------------------------------------------------------------
+    def has_changes(self, tablename: str, TID: float) -> Optional[bool]:
+        """
+        Tell whether a table has rows with ``tid >= TID``.
+
+        Parameters
+        ----------
+        tablename : str
+            Table name.
+        TID : float
+            Lower bound (inclusive) on the ``tid`` column.
+
+        Returns
+        -------
+        bool or None
+            ``True`` if at least one row matches, ``None`` on error.
+
+        Notes
+        -----
+        A ``LIMIT 1`` probe on the ``(tid, ind)`` key: it stops at the first
+        match instead of counting every changed row.
+        """
+        records = self.getsql_params("SELECT 1 FROM " + tablename + " WHERE tid >= %s LIMIT 1", (TID,))
+        if records == None:
+            return None
+        return len(records) > 0
+    #--------------------------------------------------------------------------------------
+    def iter_changes(self, tablename: str, TID: float, batch_size: int = 1000) -> Optional[Iterator[Tuple[Any, ...]]]:
+        """
+        Stream the rows of a table with ``tid >= TID``, one page at a time.
+
+        Parameters
+        ----------
+        tablename : str
+            Table name.
+        TID : float
+            Lower bound (inclusive) on the ``tid`` column.
+        batch_size : int
+            Rows per page.
+
+        Returns
+        -------
+        iterator of tuple or None
+            ``SELECT *`` rows ordered by ``(tid, ind, gguid)``, or ``None``
+            if the first page cannot be read. A failure on a later page
+            raises ``RuntimeError`` (details in :attr:`err`).
+
+        Notes
+        -----
+        - Keyset pagination: each page continues after the ``(tid, ind,
+          gguid)`` of the previous one with ``LIMIT batch_size``. The order
+          is the one of the ``ix_n4_tid_ind`` key (InnoDB appends the
+          primary key ``gguid`` to it), so no page sorts or skips rows.
+        - Each page is a short query on a pooled connection: memory and
+          server resources stay bounded by one page whatever the table size.
+        """
+        columns = self.get_columnsname(tablename)
+        if columns == None:
+            return None
+        lower = [c.lower() for c in columns]
+        if "tid" not in lower or "ind" not in lower or "gguid" not in lower:
+            self.err.errorcode = "E005"
+            self.err.errormessage = "Table " + tablename + " has no tid/ind/gguid columns"
+            return None
+        keys = (lower.index("tid"), lower.index("ind"), lower.index("gguid"))
+
+        limit = " ORDER BY tid, ind, gguid LIMIT " + str(int(batch_size))
+        records = self.getsql_params("SELECT * FROM " + tablename + " WHERE tid >= %s" + limit, (TID,))
+        if records == None:
+            return None
+        nextsql = "SELECT * FROM " + tablename + " WHERE tid >= %s AND (tid > %s OR (tid = %s AND (ind > %s OR (ind = %s AND gguid > %s))))" + limit
+        return self.__iter_pages(records, nextsql, TID, keys, batch_size)
+    #--------------------------------------------------------------------------------------
+    def __iter_pages(self, records: List[Tuple[Any, ...]], nextsql: str, TID: float, keys: Tuple[int, int, int], batch_size: int) -> Iterator[Tuple[Any, ...]]:
+        """Generator behind :meth:`iter_changes`."""
+        while True:
+            for r in records:
+                yield r
+            if len(records) < batch_size:
+                return
+            last = records[-1]
+            tid, ind, gguid = last[keys[0]], last[keys[1]], last[keys[2]]
+            records = self.getsql_params(nextsql, (TID, tid, tid, ind, ind, gguid))
+            if records == None:
+                raise RuntimeError(self.err.errormessage)
+    #--------------------------------------------------------------------------------------
+    def iter_gguids(self, tablename: str, gguids: Sequence[str], chunk: int = 500) -> Optional[Iterator[Tuple[Any, ...]]]:
+        """
+        Stream the rows of a table with the given GUIDs.
+
+        Parameters
+        ----------
+        tablename : str
+            Table name.
+        gguids : sequence of str
+            GUIDs to read.
+        chunk : int
+            GUIDs per ``WHERE gguid IN (...)`` query.
+
+        Returns
+        -------
+        iterator of tuple or None
+            ``SELECT *`` rows (missing GUIDs are skipped), or ``None`` if
+            the first chunk cannot be read. A failure on a later chunk
+            raises ``RuntimeError`` (details in :attr:`err`).
+        """
+        gguids = list(gguids)
+        chunk = max(int(chunk), 1)
+        records = self.__gguid_chunk(tablename, gguids[:chunk], chunk)
+        if records == None:
+            return None
+        return self.__iter_chunks(tablename, gguids, chunk, records)
+    #--------------------------------------------------------------------------------------
+    def __gguid_chunk(self, tablename: str, part: List[str], chunk: int) -> Optional[List[Tuple[Any, ...]]]:
+        """Rows of one chunk of GUIDs (padded to a power of two to reuse few statements)."""
+        if len(part) == 0:
+            return []
+        part = _padded(part, chunk)
+        return self.getsql_params("SELECT * FROM " + tablename + " WHERE gguid IN (" + ",".join(["%s"] * len(part)) + ")", part)
+    #--------------------------------------------------------------------------------------
+    def __iter_chunks(self, tablename: str, gguids: List[str], chunk: int, records: List[Tuple[Any, ...]]) -> Iterator[Tuple[Any, ...]]:
+        """Generator behind :meth:`iter_gguids`."""
+        first = 0
+        while True:
+            for r in records:
+                yield r
+            first += chunk
+            if first >= len(gguids):
+                return
+            records = self.__gguid_chunk(tablename, gguids[first:first + chunk], chunk)
+            if records == None:
+                raise RuntimeError(self.err.errormessage)
     #--------------------------------------------------------------------------------------    
     def get_tablesname(self) -> Optional[Dict[str, float]]:
         """
@@ -447,15 +1223,16 @@ class database_nios4:
         dict or None
             Mapping ``{column_name: data_type}`` (as reported by
             ``INFORMATION_SCHEMA.COLUMNS``), or ``None`` on error.
+
+        Notes
+        -----
+        Served from the schema catalog (see :meth:`catalog`); an unknown
+        table yields an empty mapping.
         """
         try:
-            records=self.getsql(f"SELECT COLUMN_NAME, DATA_TYPE, IS_NULLABLE, COLUMN_DEFAULT, COLUMN_KEY FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_NAME='{tablename}' and TABLE_SCHEMA ='{self.__dbname}'")
-            if records == None:
-                return None
             tfields: Dict[str, str] = {}
-            for r in records:
-                t = r[1]
-                tfields[str(r[0])] = t
+            for c in self.__catalog.columns(tablename) or []:
+                tfields[c[0]] = c[1]
 
             return tfields
 
@@ -487,47 +1264,156 @@ class database_nios4:
           :meth:`get_fieldstype`.
         """
         try:
-            #list of skipped field
-            skipfields = ["gguid"]
-            
-            s1 = "INSERT INTO " + tablename + "(gguid,"
-            s2 = ") VALUES ('" + gguid + "',"
-
-            tfields = self.get_fieldstype(tablename)
-            for c in tfields:
-                if c not in skipfields:
-                    s1 = s1 + c + ","
-                    if "varchar" in tfields[c]:
-                        s2 = s2 + "'',"
-                    elif tfields[c] == "BIGINT":
-                        s2 = s2 + "0,"
-                    elif tfields[c] == "int":
-                        s2 = s2 + "0,"
-                    elif tfields[c] == "integer":
-                        s2 = s2 + "0,"
-                    elif tfields[c] == "datetime":
-                        s2 = s2 + "NULL,"
-                    elif tfields[c] == "FLOAT":
-                        s2 = s2 + "0,"
-                    elif tfields[c] == "text":
-                        s2 = s2 + "'',"
-                    elif tfields[c] == "mediumtext":
-                        s2 = s2 + "'',"
-                    elif tfields[c] == "double":
-                        s2 = s2 + "0,"
-
-            sql=s1[:-1] + s2[:-1] + ")"
-
-            if self.setsql(sql) == False:
+            built = self.__newrow_sql(tablename)
+            if built is None:
                 return False
-
-            return True
+            sql, defaults = built
+            return self.setsql_params(sql, (gguid,) + defaults)
 
         except Exception as e:
             self.err.errorcode = "E008"
             self.err.errormessage = str(e)
             return False            
     #--------------------------------------------------------------------------------------
+    def newrows(self, tablename: str, gguids: Sequence[str]) -> bool:
+        """
+        Insert several new rows at once, auto-filling defaults.
+
+        Parameters
+        ----------
+        tablename : str
+            Target table.
+        gguids : sequence of str
+            GUIDs of the rows to insert.
+
+        Returns
+        -------
+        bool
+            ``True`` on success, ``False`` otherwise.
+
+        Notes
+        -----
+        Same defaults as :meth:`newrow`, sent through :meth:`executemany`.
+        """
+        try:
+            if len(gguids) == 0:
+                return True
+            built = self.__newrow_sql(tablename)
+            if built is None:
+                return False
+            sql, defaults = built
+            return self.executemany(sql, [(g,) + defaults for g in gguids])
+
+        except Exception as e:
+            self.err.errorcode = "E008"
+            self.err.errormessage = str(e)
+            return False
+    #--------------------------------------------------------------------------------------
+    def newrow_defaults(self, tablename: str) -> Optional[Dict[str, Any]]:
+        """
+        Default values used for the columns of a new row.
+
+        Parameters
+        ----------
+        tablename : str
+            Table name.
+
+        Returns
+        -------
+        dict or None
+            ``{column: default}`` in column order, ``gguid`` excluded, or
+            ``None`` on error. Columns of unhandled data types are omitted.
+        """
+        #list of skipped field
+        skipfields = ["gguid"]
+
+        tfields = self.get_fieldstype(tablename)
+        if tfields is None:
+            return None
+        defaults: Dict[str, Any] = {}
+        for c in tfields:
+            if c not in skipfields:
+                if "varchar" in tfields[c]:
+                    defaults[c] = ""
+                elif tfields[c] == "BIGINT":
+                    defaults[c] = 0
+                elif tfields[c] == "int":
+                    defaults[c] = 0
+                elif tfields[c] == "integer":
+                    defaults[c] = 0
+                elif tfields[c] == "datetime":
+                    defaults[c] = None
+                elif tfields[c] == "FLOAT":
+                    defaults[c] = 0
+                elif tfields[c] == "text":
+                    defaults[c] = ""
+                elif tfields[c] == "mediumtext":
+                    defaults[c] = ""
+                elif tfields[c] == "double":
+                    defaults[c] = 0
+        return defaults
+    #--------------------------------------------------------------------------------------
+    def __newrow_sql(self, tablename: str) -> Optional[Tuple[str, Tuple[Any, ...]]]:
+        """Parameterized INSERT for a new row and the default values after ``gguid``."""
+        defaults = self.newrow_defaults(tablename)
+        if defaults is None:
+            return None
+        columns = ["gguid"] + list(defaults.keys())
+        sql = "INSERT INTO " + tablename + "(" + ",".join(columns) + ") VALUES (" + ",".join(["%s"] * len(columns)) + ")"
+        return sql, tuple(defaults.values())
+    #--------------------------------------------------------------------------------------
+    def insertmany(self, tablename: str, columns: Sequence[str], rows: Iterable[Sequence[Any]],
+                   update: Optional[Sequence[str]] = None) -> bool:
+        """
+        Insert (or upsert) many rows with multi-row statements.
+
+        Parameters
+        ----------
+        tablename : str
+            Target table.
+        columns : sequence of str
+            Columns of every row, in parameter order.
+        rows : iterable of sequence
+            One value tuple per row.
+        update : sequence of str, optional
+            Columns overwritten when the key already exists
+            (``INSERT ... ON DUPLICATE KEY UPDATE``); plain ``INSERT`` if omitted.
+
+        Returns
+        -------
+        bool
+            ``True`` on success, ``False`` otherwise.
+        """
+        sql = "INSERT INTO " + tablename + " (" + ",".join(columns) + ") VALUES (" + ",".join(["%s"] * len(columns)) + ")"
+        if update:
+            sql = sql + " ON DUPLICATE KEY UPDATE " + ",".join(c + "=VALUES(" + c + ")" for c in update)
+        return self.executemany(sql, rows)
+    #--------------------------------------------------------------------------------------
+    def deletemany(self, tablename: str, gguids: Sequence[str], chunk: int = 500) -> bool:
+        """
+        Delete many rows by GUID with ``DELETE ... WHERE gguid IN (...)``.
+
+        Parameters
+        ----------
+        tablename : str
+            Target table.
+        gguids : sequence of str
+            GUIDs to delete.
+        chunk : int
+            GUIDs per statement.
+
+        Returns
+        -------
+        bool
+            ``True`` on success, ``False`` otherwise.
+        """
+        for first in range(0, len(gguids), chunk):
+            part = tuple(gguids[first:first + chunk])
+            sql = "DELETE FROM " + tablename + " WHERE gguid IN (" + ",".join(["%s"] * len(part)) + ")"
+            if self.setsql_params(sql, part) == False:
+                return False
+        return True
+    #--------------------------------------------------------------------------------------
     def get_fieldsname(self) -> Optional[Dict[str, Tuple[int, int]]]:
         """
         Retrieve all created fields and tables known to Nios4,
@@ -556,22 +1442,7 @@ class database_nios4:
                 return None
 
             for r in records:
-                tfields = self.get_fieldstype(r[0])
-                for c in tfields:
-                    key = str(r[0]).lower() + "|" + str(c).lower()
-                    if key not in fields:
-                        v = key.split("|")
-                        if v[1] == "gguid" or v[1] == "ut" or v[1] == "uta" or v[1] == "exp" or v[1] == "gguidp" or v[1] == "tap" or v[1] == "dsp" or v[1] == "dsc" or v[1] == "utc":
-                            fields[key] = [0,0]
-                        elif v[1] == "tidc" or v[1] == "tid" or v[1] == "eli" or v[1] == "arc" or v[1] == "ind" or v[1] == "dsq1" or v[1] == "dsq2":
-                            fields[key] = [0,10]
-                        else:
-                            if "varchar" in tfields[c]  or tfields[c] == "text" or tfields[c] == "mediumtext":
-                                fields[key] = [0,0]
-                            elif tfields[c] == "int" or tfields[c] == "integer" or tfields[c] == "DECIMAL" or tfields[c] == "FLOAT" or tfields[c] == "double":
-                                fields[key] = [0,10]
-                            else:
-                                fields[key] = [0,0]
+                self.fill_fieldsname(fields,r[0])
 
             return fields
         
@@ -580,6 +1451,41 @@ class database_nios4:
             self.err.errormessage = str(e)
             return None    
     #--------------------------------------------------------------------------------------
+    def fill_fieldsname(self, fields: Dict[str, Tuple[int, int]], tablename: str) -> None:
+        """
+        Add to a :meth:`get_fieldsname` map the columns of a table missing from it.
+
+        Parameters
+        ----------
+        fields : dict
+            ``{ 'table|field': (tid, fieldtype) }`` map, updated in place.
+        tablename : str
+            Table whose DB columns are checked.
+
+        Notes
+        -----
+        Missing columns get ``tid`` 0 and a ``fieldtype`` inferred from the
+        column name and SQL type (0 text, 10 number).
+        """
+        tfields = self.get_fieldstype(tablename)
+        if tfields == None:
+            return
+        for c in tfields:
+            key = str(tablename).lower() + "|" + str(c).lower()
+            if key not in fields:
+                v = key.split("|")
+                if v[1] == "gguid" or v[1] == "ut" or v[1] == "uta" or v[1] == "exp" or v[1] == "gguidp" or v[1] == "tap" or v[1] == "dsp" or v[1] == "dsc" or v[1] == "utc":
+                    fields[key] = [0,0]
+                elif v[1] == "tidc" or v[1] == "tid" or v[1] == "eli" or v[1] == "arc" or v[1] == "ind" or v[1] == "dsq1" or v[1] == "dsq2":
+                    fields[key] = [0,10]
+                else:
+                    if "varchar" in tfields[c]  or tfields[c] == "text" or tfields[c] == "mediumtext":
+                        fields[key] = [0,0]
+                    elif tfields[c] == "int" or tfields[c] == "integer" or tfields[c] == "DECIMAL" or tfields[c] == "FLOAT" or tfields[c] == "double":
+                        fields[key] = [0,10]
+                    else:
+                        fields[key] = [0,0]
+    #--------------------------------------------------------------------------------------
     def get_columnsname(self, tablename: str) -> Optional[List[str]]:
         """
         Retrieve the column names of a table.
@@ -593,37 +1499,49 @@ class database_nios4:
         -------
         list of str or None
             Column names in order, or ``None`` on error.
+
+        Notes
+        -----
+        Served from the schema catalog, without querying the table.
         """
         try:
-            connectiondb = self.connectdb()
-            if connectiondb is None:
-                raise RuntimeError("Cannot open DB connection")            
-            c = connectiondb.cursor()
-            c.execute("select * from " + tablename)
-            connectiondb.close()
-            return [member[0] for member in c.description]
+            columns = self.__catalog.columns(tablename)
+            if columns is None:
+                raise RuntimeError("Table " + tablename + " doesn't exist")
+            return [c[0] for c in columns]
 
         except Exception as e:
             self.err.errorcode = "E011"
             self.err.errormessage = str(e)
             return None
     #--------------------------------------------------------------------------------------
-    def get_gguid(self, tablename: str) -> Optional[Dict[str, float]]:
+    def get_gguid(self, tablename: str, gguids: Optional[Iterable[str]] = None) -> Optional[Dict[str, float]]:
         """
-        Get all GUIDs (`gguid`) with their `tid` from a table.
+        Get GUIDs (`gguid`) with their `tid` from a table.
 
         Parameters
         ----------
         tablename : str
             Table name.
+        gguids : iterable of str, optional
+            GUIDs of interest. When given and the table holds more than
+            :attr:`gguid_lookup_threshold` rows, only these GUIDs are read
+            (chunked ``WHERE gguid IN (...)``); otherwise the whole table is.
 
         Returns
         -------
         dict or None
-            Mapping ``{gguid: tid}``, or ``None`` on error.
+            Mapping ``{gguid: tid}``, or ``None`` on error. With ``gguids``,
+            GUIDs missing from the result are not in the table.
         """
         try:
-            values = []
+            if gguids is not None:
+                gguids = list(dict.fromkeys(gguids))
+                if len(gguids) == 0:
+                    return {}
+                if self.__estimate_rows(tablename) > self.gguid_lookup_threshold:
+                    return self.__lookup_gguid(tablename, gguids)
+
             records=self.getsql("SELECT gguid,tid FROM " + tablename)
             if records == None:
                 return None        
@@ -638,6 +1556,28 @@ class database_nios4:
             self.err.errormessage = str(e)
             return None
     #--------------------------------------------------------------------------------------
+    def __estimate_rows(self, tablename: str) -> int:
+        """Row count estimate from ``INFORMATION_SCHEMA.TABLES`` (0 if unknown)."""
+        records = self.getsql_params("SELECT TABLE_ROWS FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_SCHEMA=%s AND TABLE_NAME=%s", (self.__dbname, tablename))
+        if records == None or len(records) == 0 or records[0][0] == None:
+            return 0
+        return int(records[0][0])
+    #--------------------------------------------------------------------------------------
+    def __lookup_gguid(self, tablename: str, gguids: List[str]) -> Optional[Dict[str, float]]:
+        """``{gguid: tid}`` of the given GUIDs, read through the gguid index."""
+        values: Dict[str, float] = {}
+        chunk = max(self.gguid_lookup_chunk, 1)
+        for first in range(0, len(gguids), chunk):
+            #powers of two: lookups of any size share a few statement texts
+            part = _padded(gguids[first:first + chunk], chunk)
+            records = self.getsql_params("SELECT gguid,tid FROM " + tablename + " WHERE gguid IN (" + ",".join(["%s"] * len(part)) + ")", part)
+            if records == None:
+                return None
+            for r in records:
+                if r[0] not in values:
+                    values[r[0]] = r[1]
+        return values
+    #--------------------------------------------------------------------------------------
     def extract_sotables(self, tablename: str, TID: float) -> Optional[List[Dict[str, Any]]]:
         """
         Extract rows changed after a given `tid`, ready for synchronization.
@@ -656,23 +1596,17 @@ class database_nios4:
             a row. ``None`` on error.
         """
         try:
-            values: List[Dict[str, Any]] = []
-            records=self.getsql("SELECT * FROM " + tablename + " where tid >= " + str(TID) + " ORDER BY ind")
-            if records == None:
-                return None
-
             columns_name = self.get_columnsname(tablename)
             if columns_name == None:
                 return None
-            
+
+            records=self.iter_sql("SELECT * FROM " + tablename + " where tid >= " + str(TID) + " ORDER BY ind")
+            if records == None:
+                return None
+
+            values: List[Dict[str, Any]] = []
             for r in records:
-                o = {}
-                count =0
-                for c in columns_name:
-                    o[c] = r[count]
-                    count =count+1
-                    
-                values.append(o)
+                values.append(dict(zip(columns_name, r)))
 
             return values
 
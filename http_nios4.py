@@ -0,0 +1,693 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#================================================================================
+#Copyright of Davide Sbreviglieri 2024
+#THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE
+#================================================================================
+#HTTP NIOS4
+#================================================================================
+from __future__ import annotations
+
+import codecs
+import gzip
+import json
+import threading
+import time
+import urllib.parse
+import zlib
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import json_nios4
+
+#status codes worth retrying for idempotent calls
+RETRY_STATUS = (429, 502, 503, 504)
+#status codes of a server refusing a compressed request body
+REJECT_ENCODING_STATUS = (400, 415)
+#status of a server refusing a chunked request body
+LENGTH_REQUIRED = 411
+#content codings accepted for request and response bodies
+ENCODINGS = ("gzip", "deflate")
+#zlib window bits of each coding
+WBITS = {"gzip": 31, "deflate": 15}
+#================================================================================
+def _not_sent(error: Exception) -> bool:
+    """Whether a failed request never reached the server (connection not opened)."""
+    import requests
+    from urllib3.exceptions import NewConnectionError
+
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(error, requests.exceptions.ConnectionError):
+        reason = error.args[0] if error.args else None
+        return isinstance(getattr(reason, "reason", None), NewConnectionError)
+    return False
+#================================================================================
+def iterjson(value: Dict[str, Any], chunksize: int = 65536) -> Iterator[bytes]:
+    """
+    Encode a JSON object incrementally.
+
+    Lists at the top level are encoded one item at a time, so the whole
+    document is never held in memory; the output is the same as
+    ``json.dumps(value, allow_nan=False)``.
+
+    Parameters
+    ----------
+    value : dict
+        Object to encode (e.g. ``{"sync_box": [...]}``).
+    chunksize : int
+        Approximate size of the yielded chunks.
+
+    Yields
+    ------
+    bytes
+        UTF-8 chunks of the document.
+    """
+    dumps = json.dumps
+    parts: List[str] = ["{"]
+    size = 1
+    for n, (key, item) in enumerate(value.items()):
+        parts.append((", " if n else "") + dumps(str(key)) + ": ")
+        if type(item) == list:
+            parts.append("[")
+            for i, element in enumerate(item):
+                text = dumps(element, allow_nan=False)
+                parts.append(", " + text if i else text)
+                size += len(text) + 2
+                if size >= chunksize:
+                    yield "".join(parts).encode("utf-8")
+                    parts = []
+                    size = 0
+            parts.append("]")
+        else:
+            text = dumps(item, allow_nan=False)
+            parts.append(text)
+            size += len(text)
+    parts.append("}")
+    yield "".join(parts).encode("utf-8")
+#================================================================================
+class _jsonreader:
+    """
+    Text buffer over a stream of UTF-8 chunks, decoded one JSON value at a time
+    (with the ``json`` decoder: the faster backends cannot resume a value).
+    """
+    def __init__(self, chunks: Iterable[bytes]) -> None:
+        self.__source = iter(chunks)
+        self.__decode = codecs.getincrementaldecoder("utf-8")().decode
+        self.__raw = json.JSONDecoder().raw_decode
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+    #--------------------------------------------------------------------------------------
+    def fill(self, size: int) -> None:
+        """Read until at least ``size`` characters are buffered after :attr:`pos`."""
+        parts = [self.buf[self.pos:]]
+        n = len(parts[0])
+        while n < size and not self.eof:
+            try:
+                text = self.__decode(next(self.__source))
+            except StopIteration:
+                self.eof = True
+                text = self.__decode(b"", True)
+            parts.append(text)
+            n += len(text)
+        self.buf = "".join(parts)
+        self.pos = 0
+    #--------------------------------------------------------------------------------------
+    def peek(self) -> str:
+        """Next character after whitespace (``""`` at the end)."""
+        while True:
+            buf = self.buf
+            pos = self.pos
+            n = len(buf)
+            while pos < n and buf[pos] in " \t\r\n":
+                pos += 1
+            self.pos = pos
+            if pos < n:
+                return buf[pos]
+            if self.eof:
+                return ""
+            self.fill(1)
+    #--------------------------------------------------------------------------------------
+    def expect(self, char: str) -> None:
+        """Skip a structural character."""
+        if self.peek() != char:
+            raise ValueError("Invalid JSON: expected '" + char + "' at character " + str(self.pos))
+        self.pos += 1
+    #--------------------------------------------------------------------------------------
+    def value(self) -> Any:
+        """Decode the next JSON value, reading more of the stream as needed."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.__raw(self.buf, self.pos)
+                #a number at the end of the buffer may continue in the next chunk
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except ValueError:
+                if self.eof:
+                    raise
+            #grow geometrically: a long value is decoded a few times, not once per chunk
+            self.fill(max(2 * (len(self.buf) - self.pos), 4096))
+#================================================================================
+def iterobject(chunks: Iterable[bytes], streamkey: str) -> Iterator[Tuple[str, Any]]:
+    """
+    Decode a JSON object incrementally.
+
+    Parameters
+    ----------
+    chunks : iterable of bytes
+        UTF-8 document, in chunks of any size.
+    streamkey : str
+        Key whose list is decoded one item at a time.
+
+    Yields
+    ------
+    tuple
+        ``(key, value)`` for every member of the object, in document order;
+        for ``streamkey`` one ``(streamkey, item)`` per list item instead.
+
+    Raises
+    ------
+    ValueError
+        If the document is not a valid JSON object or is truncated.
+    """
+    r = _jsonreader(chunks)
+    r.expect("{")
+    if r.peek() == "}":
+        return
+    while True:
+        key = r.value()
+        r.expect(":")
+        if key == streamkey and r.peek() == "[":
+            r.pos += 1
+            if r.peek() == "]":
+                r.pos += 1
+            else:
+                while True:
+                    yield key, r.value()
+                    c = r.peek()
+                    r.pos += 1
+                    if c == "]":
+                        break
+                    if c != ",":
+                        raise ValueError("Invalid JSON: expected ',' or ']' at character " + str(r.pos - 1))
+        else:
+            yield key, r.value()
+        c = r.peek()
+        r.pos += 1
+        if c == "}":
+            return
+        if c != ",":
+            raise ValueError("Invalid JSON: expected ',' or '}' at character " + str(r.pos - 1))
+#================================================================================
+class http_nios4:
+    """
+    Shared HTTP session for the remote service.
+
+    One ``requests.Session`` (created on first use) keeps connections
+    alive and pooled across calls, so consecutive packets reuse the same
+    TCP/TLS connection. Every call has a timeout; failed calls are retried
+    with exponential backoff when it is safe to do so, and the latency of
+    each endpoint (the ``action`` of the URL) is recorded.
+
+    When :attr:`compress` is set, JSON bodies sent with :meth:`post_json`
+    are compressed (``gzip`` or ``deflate``) above a size threshold; if the
+    server refuses them (``400``/``415``) the body is sent again
+    uncompressed and compression stays off for the session. Compressed
+    responses are always requested with
+    ``Accept-Encoding`` and decoded transparently. Sizes and ratios of the
+    last packet of each thread are kept in :attr:`lastpacket`.
+    """
+    def __init__(self, connecttimeout: float = 10.0, readtimeout: float = 300.0, retries: int = 3,
+                 backoff: float = 0.5, poolsize: int = 4, compress: Optional[str] = None,
+                 compressthreshold: int = 16384, compresslevel: int = 6) -> None:
+        """
+        Initialize the client (no connection is opened yet).
+
+        Parameters
+        ----------
+        connecttimeout : float
+            Seconds allowed to open a connection.
+        readtimeout : float
+            Seconds allowed between bytes of the response.
+        retries : int
+            Extra attempts after a failure.
+        backoff : float
+            Delay before the first retry; doubled at each new attempt.
+        poolsize : int
+            Connections kept alive per host.
+        compress : str or None
+            Coding of request bodies (``"gzip"`` or ``"deflate"``), for
+            servers that decode a compressed request; ``None`` sends them
+            uncompressed.
+        compressthreshold : int
+            Bodies smaller than this many bytes are sent uncompressed.
+        compresslevel : int
+            zlib compression level (1 fastest - 9 smallest).
+        """
+        self.connecttimeout = connecttimeout
+        self.readtimeout = readtimeout
+        self.retries = retries
+        self.backoff = backoff
+        self.poolsize = poolsize
+        self.compress = compress
+        self.compressthreshold = compressthreshold
+        self.compresslevel = compresslevel
+        #chunk size of streamed bodies (see post_json_stream)
+        self.streamchunk = 65536
+        #sizes of the last packet of each thread (see post_json and read_json)
+        self.__local = threading.local()
+        #False once the server refused a compressed (or chunked) body
+        self.__compressaccepted = True
+        self.__streamaccepted = True
+        self.__session: Any = None
+        self.__lock = threading.Lock()
+        self.__stats: Dict[str, Dict[str, float]] = {}
+    #--------------------------------------------------------------------------------------
+    @property
+    def lastpacket(self) -> Dict[str, Any]:
+        """
+        Sizes of the last packet sent or received by the calling thread.
+
+        Keys ``sent``, ``sentwire``, ``sentratio`` (see :meth:`post_json`)
+        and ``received``, ``receivedwire``, ``receivedratio`` (see
+        :meth:`read_json`); sizes in bytes, decoded and transferred.
+        """
+        packet = getattr(self.__local, "packet", None)
+        if packet is None:
+            packet = self.__local.packet = {}
+        return packet
+    #--------------------------------------------------------------------------------------
+    @lastpacket.setter
+    def lastpacket(self, value: Dict[str, Any]) -> None:
+        self.__local.packet = value
+    #--------------------------------------------------------------------------------------
+    def session(self) -> Any:
+        """
+        The underlying ``requests.Session``, created on first use.
+
+        Returns
+        -------
+        requests.Session
+            Session with a pooled adapter for ``http`` and ``https``.
+        """
+        with self.__lock:
+            if self.__session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=self.poolsize, pool_maxsize=self.poolsize)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self.__session = session
+                session.headers["Accept-Encoding"] = ", ".join(ENCODINGS)
+            return self.__session
+    #--------------------------------------------------------------------------------------
+    def request(self, method: str, url: str, idempotent: bool = False, **kwargs: Any) -> Any:
+        """
+        Send a request through the shared session.
+
+        Parameters
+        ----------
+        method : str
+            HTTP method.
+        url : str
+            Full URL.
+        idempotent : bool
+            ``True`` if the call can be repeated safely: it is then retried
+            on any connection error, timeout or 429/502/503/504 status.
+            Other calls are retried only when the connection could not be
+            opened (the server never saw the request).
+        **kwargs
+            Passed to ``requests.Session.request`` (``timeout`` defaults to
+            ``(connecttimeout, readtimeout)``); ``body`` may be a callable
+            returning the ``data`` of each attempt (e.g. a generator, sent
+            with chunked transfer encoding).
+
+        Returns
+        -------
+        requests.Response
+            Response of the last attempt.
+
+        Raises
+        ------
+        requests.RequestException
+            If every attempt failed.
+        """
+        import requests
+
+        kwargs.setdefault("timeout", (self.connecttimeout, self.readtimeout))
+        body = kwargs.pop("body", None)
+        endpoint = self.endpoint(url)
+        self.lastpacket = {}
+        session = self.session()
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                if body is not None:
+                    #a new generator for every attempt
+                    kwargs["data"] = body()
+                response = session.request(method, url, **kwargs)
+            except requests.RequestException as e:
+                self.__record(endpoint, time.perf_counter() - start, True, attempt)
+                if attempt >= self.retries or not (idempotent or _not_sent(e)):
+                    raise
+            else:
+                retry = idempotent and response.status_code in RETRY_STATUS and attempt < self.retries
+                self.__record(endpoint, time.perf_counter() - start, retry, attempt)
+                if not retry:
+                    return response
+                response.close()
+            time.sleep(self.backoff * (2 ** attempt))
+            attempt += 1
+    #--------------------------------------------------------------------------------------
+    def get(self, url: str, idempotent: bool = True, **kwargs: Any) -> Any:
+        """``GET`` through :meth:`request` (idempotent by default)."""
+        return self.request("GET", url, idempotent=idempotent, **kwargs)
+    #--------------------------------------------------------------------------------------
+    def post(self, url: str, idempotent: bool = False, **kwargs: Any) -> Any:
+        """``POST`` through :meth:`request` (not idempotent by default)."""
+        return self.request("POST", url, idempotent=idempotent, **kwargs)
+    #--------------------------------------------------------------------------------------
+    def coding(self) -> Optional[str]:
+        """
+        Coding of the next compressed request body.
+
+        Returns
+        -------
+        str or None
+            ``"gzip"`` or ``"deflate"``, or ``None`` if bodies are sent
+            uncompressed (compression off or refused by the server).
+        """
+        if not self.__compressaccepted:
+            return None
+        return self.compress if self.compress in ENCODINGS else None
+    #--------------------------------------------------------------------------------------
+    def encode(self, body: bytes) -> Optional[bytes]:
+        """
+        Compress a request body with the current :meth:`coding`.
+
+        Parameters
+        ----------
+        body : bytes
+            Uncompressed body.
+
+        Returns
+        -------
+        bytes or None
+            Compressed body, or ``None`` if it must be sent as is
+            (no coding, body below the threshold, or no size gain).
+        """
+        coding = self.coding()
+        if coding is None or len(body) < self.compressthreshold:
+            return None
+        if coding == "gzip":
+            encoded = gzip.compress(body, compresslevel=self.compresslevel, mtime=0)
+        else:
+            encoded = zlib.compress(body, self.compresslevel)
+        if len(encoded) >= len(body):
+            return None
+        return encoded
+    #--------------------------------------------------------------------------------------
+    def post_json(self, url: str, value: Any, idempotent: bool = False, **kwargs: Any) -> Any:
+        """
+        ``POST`` a JSON body, compressed when worthwhile.
+
+        Parameters
+        ----------
+        url : str
+            Full URL.
+        value : Any
+            JSON-serializable body (encoded as ``requests`` does for
+            ``json=``).
+        idempotent : bool
+            See :meth:`request`.
+        **kwargs
+            Passed to :meth:`request`.
+
+        Returns
+        -------
+        requests.Response
+            Response of the server.
+        """
+        body = json.dumps(value, allow_nan=False).encode("utf-8")
+        headers = dict(kwargs.pop("headers", None) or {})
+        headers["Content-Type"] = "application/json"
+        coding = self.coding()
+        encoded = self.encode(body)
+        if encoded is not None:
+            response = self.request("POST", url, idempotent=idempotent, data=encoded,
+                                    headers=dict(headers, **{"Content-Encoding": coding}), **kwargs)
+            if response.status_code not in REJECT_ENCODING_STATUS:
+                self.__sent(url, len(body), len(encoded))
+                return response
+            #the server does not take compressed bodies: send it as is from now on
+            response.close()
+            self.__compressaccepted = False
+        response = self.request("POST", url, idempotent=idempotent, data=body, headers=headers, **kwargs)
+        self.__sent(url, len(body), len(body))
+        return response
+    #--------------------------------------------------------------------------------------
+    def post_json_stream(self, url: str, value: Dict[str, Any], idempotent: bool = False, **kwargs: Any) -> Any:
+        """
+        ``POST`` a JSON object encoded while it is sent.
+
+        The body is produced by :func:`iterjson` (compressed on the fly when
+        compression is on) and sent with chunked transfer encoding, so the
+        encoded document never exists as a whole: memory does not grow
+        with the size of the lists in ``value``. Refused compression is
+        handled as in :meth:`post_json`; if the server wants a length
+        (``411``) the body is sent through :meth:`post_json` from then on.
+
+        Parameters
+        ----------
+        url : str
+            Full URL.
+        value : dict
+            JSON object; its top-level lists are streamed item by item.
+        idempotent : bool
+            See :meth:`request`.
+        **kwargs
+            Passed to :meth:`request`.
+
+        Returns
+        -------
+        requests.Response
+            Response of the server.
+        """
+        if not self.__streamaccepted:
+            return self.post_json(url, value, idempotent, **kwargs)
+        headers = dict(kwargs.pop("headers", None) or {})
+        headers["Content-Type"] = "application/json"
+        coding = self.coding()
+        sizes = [0, 0]
+
+        def plain() -> Iterator[bytes]:
+            sizes[0] = sizes[1] = 0
+            for chunk in iterjson(value, self.streamchunk):
+                sizes[0] += len(chunk)
+                sizes[1] += len(chunk)
+                yield chunk
+
+        def compressed() -> Iterator[bytes]:
+            sizes[0] = sizes[1] = 0
+            z = zlib.compressobj(self.compresslevel, zlib.DEFLATED, WBITS[coding])
+            for chunk in iterjson(value, self.streamchunk):
+                sizes[0] += len(chunk)
+                data = z.compress(chunk)
+                if data:
+                    sizes[1] += len(data)
+                    yield data
+            data = z.flush()
+            sizes[1] += len(data)
+            yield data
+
+        if coding is not None:
+            response = self.request("POST", url, idempotent=idempotent, body=compressed,
+                                    headers=dict(headers, **{"Content-Encoding": coding}), **kwargs)
+            if response.status_code not in REJECT_ENCODING_STATUS + (LENGTH_REQUIRED,):
+                self.__sent(url, sizes[0], sizes[1])
+                return response
+            response.close()
+            if response.status_code == LENGTH_REQUIRED:
+                self.__streamaccepted = False
+                return self.post_json(url, value, idempotent, headers=headers, **kwargs)
+            self.__compressaccepted = False
+        response = self.request("POST", url, idempotent=idempotent, body=plain, headers=headers, **kwargs)
+        if response.status_code == LENGTH_REQUIRED:
+            response.close()
+            self.__streamaccepted = False
+            return self.post_json(url, value, idempotent, headers=headers, **kwargs)
+        self.__sent(url, sizes[0], sizes[1])
+        return response
+    #--------------------------------------------------------------------------------------
+    def read_json(self, response: Any) -> Any:
+        """
+        Decode a JSON response and record its sizes in :attr:`lastpacket`.
+
+        Parameters
+        ----------
+        response : requests.Response
+            Response of the server.
+
+        Returns
+        -------
+        Any
+            Decoded JSON value.
+        """
+        content = response.content
+        self.__received(response, len(content))
+        return json_nios4.loads(content)
+    #--------------------------------------------------------------------------------------
+    def read_json_stream(self, response: Any, streamkey: str) -> Iterator[Tuple[str, Any]]:
+        """
+        Decode a JSON object response while it is received.
+
+        The response must be requested with ``stream=True``; the items of
+        the ``streamkey`` list are yielded as soon as they are complete,
+        so only one chunk and one item are held at a time. Sizes are
+        recorded in :attr:`lastpacket` (of the iterating thread) at the end.
+
+        Parameters
+        ----------
+        response : requests.Response
+            Streamed response of the server.
+        streamkey : str
+            Key whose list is decoded one item at a time.
+
+        Yields
+        ------
+        tuple
+            See :func:`iterobject`.
+        """
+        received = [0]
+
+        def chunks() -> Iterator[bytes]:
+            for chunk in response.iter_content(self.streamchunk):
+                received[0] += len(chunk)
+                yield chunk
+
+        try:
+            yield from iterobject(chunks(), streamkey)
+        finally:
+            response.close()
+            self.__received(response, received[0])
+    #--------------------------------------------------------------------------------------
+    def __received(self, response: Any, received: int) -> None:
+        """Add the sizes of a received body to :attr:`lastpacket` and the statistics."""
+        wire = received
+        if response.headers.get("Content-Encoding", "").lower() in ENCODINGS:
+            try:
+                wire = int(response.headers.get("Content-Length", received))
+            except ValueError:
+                pass
+        self.lastpacket["received"] = received
+        self.lastpacket["receivedwire"] = wire
+        self.lastpacket["receivedratio"] = wire / received if received else 1.0
+        with self.__lock:
+            s = self.__stats.get(self.endpoint(response.url or ""))
+            if s is not None:
+                s["received"] += received
+                s["receivedwire"] += wire
+    #--------------------------------------------------------------------------------------
+    def describe(self) -> str:
+        """
+        Sizes of the last packet, for logging.
+
+        Returns
+        -------
+        str
+            e.g. ``"sent 1024 KB as 97 KB (9.5%), received 2 KB as 2 KB (100.0%)"``
+            (decoded size as transferred size).
+        """
+        p = self.lastpacket
+        parts = []
+        if "sent" in p:
+            parts.append("sent %d KB as %d KB (%.1f%%)" % (p["sent"] // 1024, p["sentwire"] // 1024, p["sentratio"] * 100))
+        if "received" in p:
+            parts.append("received %d KB as %d KB (%.1f%%)" % (p["received"] // 1024, p["receivedwire"] // 1024, p["receivedratio"] * 100))
+        return ", ".join(parts)
+    #--------------------------------------------------------------------------------------
+    def __sent(self, url: str, sent: int, wire: int) -> None:
+        """Start :attr:`lastpacket` with the sizes of a sent body."""
+        with self.__lock:
+            self.lastpacket = {"endpoint": self.endpoint(url), "sent": sent, "sentwire": wire,
+                               "sentratio": wire / sent if sent else 1.0}
+            s = self.__stats.get(self.lastpacket["endpoint"])
+            if s is not None:
+                s["sent"] += sent
+                s["sentwire"] += wire
+    #--------------------------------------------------------------------------------------
+    def endpoint(self, url: str) -> str:
+        """
+        Name under which the latency of a URL is recorded.
+
+        Parameters
+        ----------
+        url : str
+            Full URL.
+
+        Returns
+        -------
+        str
+            The ``action`` query parameter, or the URL path.
+        """
+        parts = urllib.parse.urlsplit(url)
+        action = urllib.parse.parse_qs(parts.query).get("action")
+        if action:
+            return action[0]
+        return parts.path
+    #--------------------------------------------------------------------------------------
+    def __record(self, endpoint: str, elapsed: float, failed: bool, attempt: int) -> None:
+        """Add one attempt to the statistics of an endpoint."""
+        with self.__lock:
+            s = self.__stats.setdefault(endpoint, {"calls": 0, "errors": 0, "retries": 0, "total": 0.0, "max": 0.0,
+                                                      "sent": 0, "sentwire": 0, "received": 0, "receivedwire": 0})
+            s["calls"] += 1
+            if failed:
+                s["errors"] += 1
+            if attempt > 0:
+                s["retries"] += 1
+            s["total"] += elapsed
+            if elapsed > s["max"]:
+                s["max"] = elapsed
+    #--------------------------------------------------------------------------------------
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Latency statistics per endpoint.
+
+        Returns
+        -------
+        dict
+            ``{endpoint: {"calls", "errors", "retries", "total", "max", "avg",
+            "sent", "sentwire", "received", "receivedwire"}}`` (times in
+            seconds, every attempt counts as a call; body sizes in bytes
+            before and after compression, for :meth:`post_json` and
+            :meth:`read_json` only).
+        """
+        with self.__lock:
+            result = {}
+            for endpoint, s in self.__stats.items():
+                values = dict(s)
+                values["avg"] = s["total"] / s["calls"] if s["calls"] else 0.0
+                result[endpoint] = values
+            return result
+    #--------------------------------------------------------------------------------------
+    def close(self) -> None:
+        """Close the pooled connections."""
+        with self.__lock:
+            if self.__session is not None:
+                self.__session.close()
+                self.__session = None
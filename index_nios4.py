@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#================================================================================
+#Copyright of Davide Sbreviglieri 2024
+#THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE
+#================================================================================
+#INDEX NIOS4
+#================================================================================
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from database_nios4 import database_nios4
+
+#keys of every synced table: lookups by gguid, scans by tid ordered by ind
+SYNCED_KEYS: List[Tuple[str, Tuple[str, ...]]] = [
+    ("PRIMARY", ("gguid",)),
+    ("ix_n4_tid_ind", ("tid", "ind")),
+]
+#keys of the local sync queues: lookups/deletes by (tablename, gguidrif)
+QUEUE_KEYS: List[Tuple[str, Tuple[str, ...]]] = [
+    ("ix_n4_table_rif", ("tablename", "gguidrif")),
+]
+QUEUE_TABLES = ["lo_syncbox", "lo_cleanbox"]
+CORE_TABLES = ["so_tables", "so_fields", "so_users"]
+#prefix length used when a key column is TEXT
+TEXT_PREFIX = 64
+
+#DDL clause appended to CREATE TABLE for tables created by install_data
+SYNCED_KEYS_DDL = "PRIMARY KEY (gguid), KEY ix_n4_tid_ind (tid,ind)"
+#DDL clause appended to CREATE TABLE for lo_syncbox/lo_cleanbox
+QUEUE_KEYS_DDL = "KEY ix_n4_table_rif (tablename(" + str(TEXT_PREFIX) + "),gguidrif)"
+
+#existing index: (columns, unique)
+Index = Tuple[List[str], bool]
+#================================================================================
+class index_nios4:
+    """
+    Index manager for the synced tables and the local sync queues.
+
+    Compares the keys each table should have (primary key on ``gguid``,
+    ``(tid, ind)`` for extraction scans, ``(tablename, gguidrif)`` on the
+    queues) with ``INFORMATION_SCHEMA.STATISTICS``, creates what is missing
+    and reports missing, duplicate and redundant indexes.
+    """
+    def __init__(self, db: "database_nios4", dbname: str) -> None:
+        """
+        Initialize the manager.
+
+        Parameters
+        ----------
+        db : database_nios4
+            Database helper used to run queries and DDL.
+        dbname : str
+            Schema name.
+        """
+        self.__db = db
+        self.__dbname = dbname
+    #--------------------------------------------------------------------------------------
+    def tables(self) -> Optional[List[str]]:
+        """
+        Tables managed by the index manager that exist in the schema.
+
+        Returns
+        -------
+        list of str or None
+            Core, queue and ``so_tables`` tables, or ``None`` on error.
+        """
+        names = list(CORE_TABLES) + list(QUEUE_TABLES)
+        if self.__db.exists_table("so_tables"):
+            records = self.__db.getsql("SELECT tablename FROM so_tables")
+            if records == None:
+                return None
+            for r in records:
+                name = str(r[0]).lower()
+                if name != "" and name not in names:
+                    names.append(name)
+        return [t for t in names if self.__db.exists_table(t)]
+    #--------------------------------------------------------------------------------------
+    def required(self, tablename: str) -> List[Tuple[str, Tuple[str, ...]]]:
+        """
+        Keys a table should have.
+
+        Parameters
+        ----------
+        tablename : str
+            Table name.
+
+        Returns
+        -------
+        list of tuple
+            ``(index_name, columns)``; ``PRIMARY`` stands for the primary key.
+            Keys whose columns are missing from the table are left out.
+        """
+        keys = QUEUE_KEYS if tablename in QUEUE_TABLES else SYNCED_KEYS
+        catalog = self.__db.catalog()
+        return [(name, cols) for name, cols in keys
+                if all(catalog.column(tablename, c) is not None for c in cols)]
+    #--------------------------------------------------------------------------------------
+    def existing(self) -> Optional[Dict[str, Dict[str, Index]]]:
+        """
+        Indexes present in the schema.
+
+        Returns
+        -------
+        dict or None
+            ``{table: {index_name: (columns, unique)}}`` (table names
+            lowercased), or ``None`` on error.
+        """
+        records = self.__db.getsql(f"SELECT TABLE_NAME, INDEX_NAME, NON_UNIQUE, COLUMN_NAME FROM INFORMATION_SCHEMA.STATISTICS WHERE TABLE_SCHEMA='{self.__dbname}' ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX")
+        if records == None:
+            return None
+        indexes: Dict[str, Dict[str, Index]] = {}
+        for r in records:
+            table = indexes.setdefault(str(r[0]).lower(), {})
+            name = str(r[1])
+            if name not in table:
+                table[name] = ([], int(r[2]) == 0)
+            table[name][0].append(str(r[3]).lower())
+        return indexes
+    #--------------------------------------------------------------------------------------
+    def __covered(self, name: str, cols: Tuple[str, ...], present: Dict[str, Index]) -> bool:
+        """Whether a required key is already served by an existing index."""
+        if name == "PRIMARY":
+            #any unique index on exactly gguid gives the same guarantees
+            return any(unique and list(c) == list(cols) for c, unique in present.values())
+        return any(c[:len(cols)] == list(cols) for c, _ in present.values())
+    #--------------------------------------------------------------------------------------
+    def report(self) -> Optional[Dict[str, Dict[str, List[str]]]]:
+        """
+        Report index problems of the managed tables.
+
+        Returns
+        -------
+        dict or None
+            ``{table: {"missing": [...], "duplicate": [...], "redundant": [...]}}``
+            for the tables with at least one problem, or ``None`` on error.
+            ``duplicate`` lists indexes with the same columns as another one,
+            ``redundant`` non-unique indexes that are a left prefix of another.
+        """
+        tables = self.tables()
+        indexes = self.existing()
+        if tables == None or indexes == None:
+            return None
+
+        result: Dict[str, Dict[str, List[str]]] = {}
+        for t in tables:
+            present = indexes.get(t.lower(), {})
+            missing = [name for name, cols in self.required(t) if not self.__covered(name, cols, present)]
+
+            duplicate: List[str] = []
+            redundant: List[str] = []
+            names = sorted(present.keys(), key=lambda n: (n != "PRIMARY", n))
+            for i, a in enumerate(names):
+                cols_a, unique_a = present[a]
+                for b in names:
+                    if a == b:
+                        continue
+                    cols_b, _ = present[b]
+                    if cols_a == cols_b and names.index(b) < i:
+                        duplicate.append(a + " = " + b)
+                        break
+                    if not unique_a and len(cols_a) < len(cols_b) and cols_b[:len(cols_a)] == cols_a:
+                        redundant.append(a + " < " + b)
+                        break
+
+            if missing or duplicate or redundant:
+                result[t] = {"missing": missing, "duplicate": duplicate, "redundant": redundant}
+        return result
+    #--------------------------------------------------------------------------------------
+    def __keydef(self, tablename: str, name: str, cols: Tuple[str, ...]) -> str:
+        """``ADD ...`` clause for a key (TEXT columns get a prefix length)."""
+        parts = []
+        for c in cols:
+            column = self.__db.catalog().column(tablename, c)
+            if column is not None and ("text" in column[1] or "blob" in column[1]):
+                parts.append(c + "(" + str(TEXT_PREFIX) + ")")
+            else:
+                parts.append(c)
+        if name == "PRIMARY":
+            return "ADD PRIMARY KEY (" + ",".join(parts) + ")"
+        return "ADD KEY " + name + " (" + ",".join(parts) + ")"
+    #--------------------------------------------------------------------------------------
+    def ensure(self) -> bool:
+        """
+        Create the missing keys of every managed table.
+
+        Returns
+        -------
+        bool
+            ``True`` if every key exists afterwards, ``False`` otherwise.
+
+        Notes
+        -----
+        - Each table is altered once, with all its missing keys.
+        - A table that already has another primary key gets a unique key on
+          ``gguid`` instead.
+        - If the primary key cannot be added (duplicate ``gguid`` values),
+          a plain index on ``gguid`` is created and the error is reported.
+        """
+        tables = self.tables()
+        indexes = self.existing()
+        if tables == None or indexes == None:
+            return False
+
+        result = True
+        for t in tables:
+            present = indexes.get(t.lower(), {})
+            clauses = []
+            fallback = []
+            for name, cols in self.required(t):
+                if self.__covered(name, cols, present):
+                    continue
+                if name == "PRIMARY":
+                    if "PRIMARY" in present:
+                        clauses.append(self.__keydef(t, "ux_n4_gguid", cols).replace("ADD KEY", "ADD UNIQUE KEY"))
+                    else:
+                        clauses.append(self.__keydef(t, name, cols))
+                    if not any(c[:1] == ["gguid"] for c, _ in present.values()):
+                        fallback.append(self.__keydef(t, "ix_n4_gguid", cols))
+                else:
+                    clauses.append(self.__keydef(t, name, cols))
+                    fallback.append(clauses[-1])
+
+            if len(clauses) == 0:
+                continue
+            if self.__db.viewmessage == True:
+                print(self.__db.stime() + "     create index " + t)
+            if self.__db.setsql("ALTER TABLE " + t + " " + ",".join(clauses)) == False:
+                result = False
+                message = self.__db.err.errormessage
+                if len(fallback) > 0 and fallback != clauses:
+                    self.__db.setsql("ALTER TABLE " + t + " " + ",".join(fallback))
+                self.__db.err.errorcode = "E021"
+                self.__db.err.errormessage = "Index creation on " + t + " failed: " + message
+        return result
@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#================================================================================
+#Copyright of Davide Sbreviglieri 2024
+#THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE
+#================================================================================
+#JSON NIOS4
+#================================================================================
+from __future__ import annotations
+
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+#{name: (dumps or None for the json one, loads)} of the available backends
+_BACKENDS: Dict[str, Tuple[Optional[Callable[[Any], str]], Callable[[Union[str, bytes]], Any]]] = {}
+#name and functions of the backend in use
+_current = "json"
+_dumps: Callable[[Any], str]
+_loads: Callable[[Union[str, bytes]], Any]
+#================================================================================
+def _json_dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False)
+#--------------------------------------------------------------------------------
+def _orjson_loads(data: Union[str, bytes]) -> Any:
+    try:
+        return orjson.loads(data)
+    except orjson.JSONDecodeError:
+        #NaN/Infinity literals, accepted by json
+        return json.loads(data)
+#================================================================================
+def register(name: str, loads: Callable[[Union[str, bytes]], Any], dumps: Optional[Callable[[Any], str]] = None, select: bool = False) -> None:
+    """
+    Add a JSON backend.
+
+    Parameters
+    ----------
+    name : str
+        Backend name.
+    loads : callable
+        Decoder of JSON text or bytes.
+    dumps : callable, optional
+        Encoder of a value into the same text as
+        ``json.dumps(value, ensure_ascii=False)``; if omitted the backend
+        only decodes and :func:`dumps` keeps using ``json``.
+    select : bool
+        Use it from now on.
+    """
+    _BACKENDS[name] = (dumps, loads)
+    if select:
+        use(name)
+#--------------------------------------------------------------------------------
+def backends() -> List[str]:
+    """
+    Names of the available backends.
+
+    Returns
+    -------
+    list of str
+        Installed backends, ``"json"`` (always there) first.
+    """
+    return list(_BACKENDS)
+#--------------------------------------------------------------------------------
+def backend() -> str:
+    """
+    Name of the backend in use.
+
+    Returns
+    -------
+    str
+        ``"json"`` unless changed with :func:`use`.
+    """
+    return _current
+#--------------------------------------------------------------------------------
+def use(name: Optional[str] = None) -> str:
+    """
+    Select the backend used by :func:`dumps` and :func:`loads`.
+
+    ``"orjson"`` (registered when installed) is opt-in: on sync packets it
+    decodes only slightly faster than ``json`` and it reads integers above
+    64 bit as floats, so it suits data known to hold no such values.
+
+    Parameters
+    ----------
+    name : str, optional
+        Backend name; ``None`` selects ``"json"``.
+
+    Returns
+    -------
+    str
+        Name of the selected backend.
+
+    Raises
+    ------
+    ValueError
+        If the backend is not available.
+    """
+    global _current, _dumps, _loads
+    if name is None:
+        name = "json"
+    if name not in _BACKENDS:
+        raise ValueError("JSON backend not available: " + name)
+    encode, _loads = _BACKENDS[name]
+    _dumps = encode if encode is not None else _json_dumps
+    _current = name
+    return name
+#--------------------------------------------------------------------------------
+def dumps(value: Any) -> str:
+    """
+    Encode a value as JSON text.
+
+    The text is always the one of ``json.dumps(value, ensure_ascii=False)``
+    (``", "`` and ``": "`` separators, non-ASCII characters kept), since it
+    is stored and compared as it is (e.g. ``cvalues``). ``orjson`` writes
+    other separators and float notations, so it is used for decoding only.
+
+    Parameters
+    ----------
+    value : Any
+        JSON-serializable value.
+
+    Returns
+    -------
+    str
+        JSON document.
+    """
+    return _dumps(value)
+#--------------------------------------------------------------------------------
+def loads(data: Union[str, bytes]) -> Any:
+    """
+    Decode JSON text or bytes with the selected backend.
+
+    Parameters
+    ----------
+    data : str or bytes
+        JSON document.
+
+    Returns
+    -------
+    Any
+        Decoded value.
+
+    Raises
+    ------
+    ValueError
+        If the document is not valid JSON.
+    """
+    return _loads(data)
+#--------------------------------------------------------------------------------
+def benchmark(rows: int = 5000, repeat: int = 3) -> Dict[str, Dict[str, float]]:
+    """
+    Time every backend on rows shaped like a ``sync_box`` packet.
+
+    Each row is encoded on its own (like ``cvalues``), then the whole
+    packet is decoded, as on download.
+
+    Parameters
+    ----------
+    rows : int
+        Rows of the sample packet.
+    repeat : int
+        Runs per measure (the best one is kept).
+
+    Returns
+    -------
+    dict
+        ``{backend: {"dumps_row", "loads_packet"}}`` in microseconds per row,
+        plus ``"same"``: 1.0 if the encoded rows and the decoded packet equal
+        the ``json`` ones, 0.0 otherwise.
+    """
+    cvalues = [{"gguid": "5f0c1a52-%012d" % i, "tid": 20240101120000 + i, "eli": 0, "arc": 0, "ind": i,
+                "ut": "admin", "description": "Articolo n. %d - perché è più economico" % i,
+                "price": i * 1.25, "quantity": i % 17, "note": None} for i in range(rows)]
+    reference = [_json_dumps(c) for c in cvalues]
+    packet = {"sync_box": [{"command": "insert", "tablename": "items", "cvalues": text} for text in reference]}
+    body = json.dumps(packet).encode("utf-8")
+    def best(work: Callable[[], Any]) -> float:
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            work()
+            times.append(time.perf_counter() - start)
+        return min(times) * 1000000 / rows
+
+    result: Dict[str, Dict[str, float]] = {}
+    for name, (encode, decode) in _BACKENDS.items():
+        if encode is None:
+            encode = _json_dumps
+        same = [encode(c) for c in cvalues] == reference and decode(body) == packet
+        result[name] = {"dumps_row": best(lambda: [encode(c) for c in cvalues]),
+                        "loads_packet": best(lambda: decode(body)),
+                        "same": 1.0 if same else 0.0}
+    return result
+#================================================================================
+register("json", json.loads, _json_dumps)
+if orjson is not None:
+    register("orjson", _orjson_loads)
+use()
+
+if __name__ == "__main__":
+    print("backend in use: " + backend())
+    for name, values in benchmark().items():
+        print("%-8s dumps row %6.2f us  loads packet %6.2f us/row  same output %s"
+              % (name, values["dumps_row"], values["loads_packet"], values["same"] == 1.0))
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#================================================================================
+#Copyright of Davide Sbreviglieri 2024
+#THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE
+#================================================================================
+#PACKET NIOS4
+#================================================================================
+from __future__ import annotations
+
+from typing import Any, Dict, List
+
+#estimated JSON size of a sync_box object besides cvalues
+ROW_OVERHEAD = 160
+#================================================================================
+def rowsize(o: Dict[str, Any]) -> int:
+    """
+    Estimated encoded size of a ``sync_box`` object.
+
+    Parameters
+    ----------
+    o : dict
+        ``sync_box`` object.
+
+    Returns
+    -------
+    int
+        Length of ``cvalues`` plus a fixed overhead for the other keys.
+    """
+    cvalues = o.get("cvalues")
+    return ROW_OVERHEAD + (len(cvalues) if type(cvalues) == str else 0)
+#================================================================================
+class packet_nios4:
+    """
+    Packet sizer bounded by rows and bytes.
+
+    Rows are collected until the packet reaches :attr:`rows` rows or
+    :attr:`maxbytes` estimated bytes. After each round-trip
+    :meth:`observe` adapts :attr:`rows` to the measured time and size:
+    it is halved (at most) when a packet is slower than :attr:`seconds` or
+    larger than :attr:`maxbytes`, and doubled when a full packet took less
+    than half of both, always within ``[minrows, maxrows]``.
+    """
+    def __init__(self, rows: int = 5000, minrows: int = 500, maxrows: int = 20000,
+                 maxbytes: int = 8388608, seconds: float = 5.0, adaptive: bool = True) -> None:
+        """
+        Initialize the sizer.
+
+        Parameters
+        ----------
+        rows : int
+            Initial rows per packet.
+        minrows : int
+            Lowest rows per packet.
+        maxrows : int
+            Highest rows per packet.
+        maxbytes : int
+            Estimated bytes per packet (``0`` = no byte bound).
+        seconds : float
+            Target duration of a round-trip.
+        adaptive : bool
+            ``False`` keeps :attr:`rows` fixed.
+        """
+        self.minrows = max(1, minrows)
+        self.maxrows = max(self.minrows, maxrows)
+        self.rows = min(max(rows, self.minrows), self.maxrows)
+        self.maxbytes = maxbytes
+        self.seconds = seconds
+        self.adaptive = adaptive
+        self.packets = 0
+        self.__items: List[Dict[str, Any]] = []
+        self.__bytes = 0
+    #--------------------------------------------------------------------------------------
+    def add(self, o: Dict[str, Any]) -> bool:
+        """
+        Append a row to the packet being built.
+
+        Parameters
+        ----------
+        o : dict
+            ``sync_box`` object.
+
+        Returns
+        -------
+        bool
+            ``True`` if the packet is full and should be sent.
+        """
+        self.__items.append(o)
+        self.__bytes += rowsize(o)
+        return self.full()
+    #--------------------------------------------------------------------------------------
+    def full(self) -> bool:
+        """Whether the packet being built reached the row or byte bound."""
+        return len(self.__items) >= self.rows or (self.maxbytes > 0 and self.__bytes >= self.maxbytes)
+    #--------------------------------------------------------------------------------------
+    def size(self) -> int:
+        """Estimated bytes of the packet being built."""
+        return self.__bytes
+    #--------------------------------------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self.__items)
+    #--------------------------------------------------------------------------------------
+    def take(self) -> List[Dict[str, Any]]:
+        """
+        Detach the packet being built and start a new one.
+
+        Returns
+        -------
+        list of dict
+            Rows of the packet.
+        """
+        items = self.__items
+        self.__items = []
+        self.__bytes = 0
+        self.packets += 1
+        return items
+    #--------------------------------------------------------------------------------------
+    def observe(self, rows: int, nbytes: int, elapsed: float) -> int:
+        """
+        Adapt :attr:`rows` to a completed round-trip.
+
+        Parameters
+        ----------
+        rows : int
+            Rows of the packet (sent, or requested for a download).
+        nbytes : int
+            Bytes of the packet (sent or received, uncompressed).
+        elapsed : float
+            Seconds of the round-trip.
+
+        Returns
+        -------
+        int
+            Rows per packet from now on.
+        """
+        if not self.adaptive or rows <= 0:
+            return self.rows
+        scale = 1.0
+        if self.maxbytes > 0 and nbytes > self.maxbytes:
+            scale = min(scale, self.maxbytes / nbytes)
+        if self.seconds > 0 and elapsed > self.seconds:
+            scale = min(scale, self.seconds / elapsed)
+        if scale < 1.0:
+            self.rows = max(self.minrows, min(self.rows, int(rows * max(scale, 0.5))))
+        elif (rows >= self.rows and elapsed * 2 < self.seconds
+              and (self.maxbytes <= 0 or nbytes * 2 < self.maxbytes)):
+            self.rows = min(self.maxrows, self.rows * 2)
+        return self.rows
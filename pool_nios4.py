@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#================================================================================
+#Copyright of Davide Sbreviglieri 2024
+#THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE
+#================================================================================
+#POOL NIOS4
+#================================================================================
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, Optional, Tuple
+#================================================================================
+class pool_nios4:
+    """
+    Thread-safe MySQL connection pool used by :class:`database_nios4`.
+
+    Connections are checked out per thread: nested checkouts from the same
+    thread return the connection already held, so a caller can run several
+    helpers on a single connection. Idle connections are health-checked
+    before reuse and closed once they stay unused for too long.
+    """
+    def __init__(self, connect: Callable[[], Any], poolsize: int = 5, maxidle: float = 300.0,
+                 pinginterval: float = 30.0, timeout: float = 30.0) -> None:
+        """
+        Initialize an empty pool (connections are opened lazily).
+
+        Parameters
+        ----------
+        connect : callable
+            Factory returning a new live connection.
+        poolsize : int
+            Maximum number of open connections.
+        maxidle : float
+            Seconds after which an idle connection is closed.
+        pinginterval : float
+            Idle seconds after which a connection is pinged before reuse.
+        timeout : float
+            Maximum seconds to wait for a free connection.
+        """
+        if poolsize < 1:
+            raise ValueError("poolsize must be >= 1")
+        self.__connect = connect
+        self.poolsize = poolsize
+        self.maxidle = maxidle
+        self.pinginterval = pinginterval
+        self.timeout = timeout
+
+        self.__idle: Deque[Tuple[Any, float]] = deque()
+        self.__opened = 0
+        self.__lock = threading.Condition(threading.Lock())
+        self.__local = threading.local()
+
+        self.__stats: Dict[str, float] = {
+            "hits": 0,
+            "misses": 0,
+            "waits": 0,
+            "waittime": 0.0,
+            "evicted": 0,
+            "discarded": 0,
+        }
+    #--------------------------------------------------------------------------------------
+    def acquire(self, private: bool = False) -> Any:
+        """
+        Check out a connection for the current thread.
+
+        Parameters
+        ----------
+        private : bool
+            If ``True`` return a connection that is not shared with the
+            thread's other checkouts (e.g. for a long streaming read);
+            release it with ``release(conn, private=True)``.
+
+        Returns
+        -------
+        connection
+            A live connection. If the thread already holds one, the same
+            connection is returned and its checkout depth is increased.
+
+        Raises
+        ------
+        RuntimeError
+            If no connection becomes available within :attr:`timeout`.
+        """
+        if private:
+            return self.__take()
+
+        held = getattr(self.__local, "conn", None)
+        if held is not None:
+            self.__local.depth += 1
+            with self.__lock:
+                self.__stats["hits"] += 1
+            return held
+
+        conn = self.__take()
+        self.__local.conn = conn
+        self.__local.depth = 1
+        return conn
+    #--------------------------------------------------------------------------------------
+    def release(self, conn: Any, checkhealth: bool = False, private: bool = False, discard: bool = False) -> None:
+        """
+        Return a connection checked out with :meth:`acquire`.
+
+        Parameters
+        ----------
+        conn : connection
+            Connection to release.
+        checkhealth : bool
+            If ``True`` the connection is verified before going back to the
+            pool and discarded when dead (use it after an error).
+        private : bool
+            ``True`` for connections acquired with ``private=True``.
+        discard : bool
+            Close the connection instead of pooling it (e.g. when it still
+            has an unread result).
+        """
+        if private:
+            self.__giveback(conn, checkhealth, discard)
+            return
+
+        if getattr(self.__local, "conn", None) is not conn:
+            #released from another thread: the owner state is unknown, drop it
+            with self.__lock:
+                self.__opened -= 1
+                self.__stats["discarded"] += 1
+                self.__lock.notify()
+            self.__close(conn)
+            return
+
+        self.__local.depth -= 1
+        if self.__local.depth > 0:
+            return
+        self.__local.conn = None
+        self.__giveback(conn, checkhealth, discard)
+    #--------------------------------------------------------------------------------------
+    def __giveback(self, conn: Any, checkhealth: bool, discard: bool) -> None:
+        """Put a released connection back in the idle list, or close it."""
+        alive = not discard
+        if alive:
+            try:
+                if checkhealth and not conn.is_connected():
+                    alive = False
+                elif getattr(conn, "in_transaction", False):
+                    #never hand out a connection with a pending transaction
+                    conn.rollback()
+            except Exception:
+                alive = False
+
+        with self.__lock:
+            if alive:
+                self.__idle.append((conn, time.monotonic()))
+            else:
+                self.__opened -= 1
+                self.__stats["discarded"] += 1
+            self.__lock.notify()
+
+        if not alive:
+            self.__close(conn)
+    #--------------------------------------------------------------------------------------
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """
+        Context manager wrapping :meth:`acquire`/:meth:`release`.
+
+        Yields
+        ------
+        connection
+            Connection checked out for the current thread.
+        """
+        conn = self.acquire()
+        failed = False
+        try:
+            yield conn
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self.release(conn, checkhealth=failed)
+    #--------------------------------------------------------------------------------------
+    def stats(self) -> Dict[str, float]:
+        """
+        Pool usage statistics.
+
+        Returns
+        -------
+        dict
+            ``hits`` (reused connections), ``misses`` (new connections),
+            ``waits``/``waittime`` (checkouts that blocked, total seconds),
+            ``evicted`` (idle timeouts), ``discarded`` (dead connections),
+            plus the current ``opened``, ``idle`` and ``size`` values.
+        """
+        with self.__lock:
+            values = dict(self.__stats)
+            values["opened"] = self.__opened
+            values["idle"] = len(self.__idle)
+            values["size"] = self.poolsize
+        return values
+    #--------------------------------------------------------------------------------------
+    def closeall(self) -> None:
+        """Close every idle connection (checked-out ones are closed on release)."""
+        with self.__lock:
+            idle = list(self.__idle)
+            self.__idle.clear()
+            self.__opened -= len(idle)
+            self.__lock.notify_all()
+        for conn, _ in idle:
+            self.__close(conn)
+    #--------------------------------------------------------------------------------------
+    def __take(self) -> Any:
+        """Pop a healthy idle connection, open a new one, or wait for a release."""
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        start = time.monotonic()
+        while True:
+            stale = []
+            candidate = None
+            create = False
+            with self.__lock:
+                now = time.monotonic()
+                while self.__idle:
+                    conn, lastused = self.__idle.pop()
+                    if now - lastused > self.maxidle:
+                        stale.append(conn)
+                        self.__opened -= 1
+                        self.__stats["evicted"] += 1
+                        continue
+                    candidate = (conn, lastused)
+                    break
+                if candidate is None and self.__opened < self.poolsize:
+                    self.__opened += 1
+                    create = True
+                if candidate is None and not create:
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        raise RuntimeError("Connection pool exhausted")
+                    if not waited:
+                        waited = True
+                        self.__stats["waits"] += 1
+                    self.__lock.wait(remaining)
+                elif waited:
+                    self.__stats["waittime"] += time.monotonic() - start
+
+            for conn in stale:
+                self.__close(conn)
+
+            if create:
+                try:
+                    conn = self.__connect()
+                    if conn is None:
+                        raise RuntimeError("Cannot open DB connection")
+                except BaseException:
+                    with self.__lock:
+                        self.__opened -= 1
+                        self.__lock.notify()
+                    raise
+                with self.__lock:
+                    self.__stats["misses"] += 1
+                return conn
+
+            if candidate is not None:
+                conn, lastused = candidate
+                if time.monotonic() - lastused > self.pinginterval and not self.__ping(conn):
+                    with self.__lock:
+                        self.__opened -= 1
+                        self.__stats["discarded"] += 1
+                    self.__close(conn)
+                    continue
+                with self.__lock:
+                    self.__stats["hits"] += 1
+                return conn
+    #--------------------------------------------------------------------------------------
+    def __ping(self, conn: Any) -> bool:
+        """Return ``True`` if the connection still answers the server."""
+        try:
+            return bool(conn.is_connected())
+        except Exception:
+            return False
+    #--------------------------------------------------------------------------------------
+    def __close(self, conn: Any) -> None:
+        """Close a connection ignoring errors."""
+        try:
+            conn.close()
+        except Exception:
+            pass
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#================================================================================
+#Copyright of Davide Sbreviglieri 2024
+#THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE
+#================================================================================
+#SEQUENCE NIOS4
+#================================================================================
+from __future__ import annotations
+
+import threading
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+if TYPE_CHECKING:
+    from pool_nios4 import pool_nios4
+
+#table holding the next free ind of every table
+SEQUENCES_DDL = "CREATE TABLE lo_sequences(tablename VARCHAR(255) NOT NULL DEFAULT '' PRIMARY KEY, nextind BIGINT NOT NULL DEFAULT 1)"
+#================================================================================
+class sequence_nios4:
+    """
+    Per-table allocator of ``ind`` values.
+
+    Values are reserved in blocks from ``lo_sequences`` with a single atomic
+    ``UPDATE`` and then handed out from memory. The reservation is committed
+    on its own connection, so blocks never overlap between threads or
+    processes, even if the caller's transaction is rolled back. Values of a
+    block not used before the process exits are skipped (gaps are allowed).
+    """
+    def __init__(self, pool: "pool_nios4", blocksize: int = 100) -> None:
+        """
+        Initialize the allocator.
+
+        Parameters
+        ----------
+        pool : pool_nios4
+            Connection pool used for reservations.
+        blocksize : int
+            Number of values reserved per round-trip.
+        """
+        self.__pool = pool
+        self.blocksize = blocksize
+        self.__lock = threading.Lock()
+        #tablename -> [next value, end of block (excluded)]
+        self.__blocks: Dict[str, List[int]] = {}
+    #--------------------------------------------------------------------------------------
+    def next(self, tablename: str) -> int:
+        """
+        Allocate the next ``ind`` of a table.
+
+        Parameters
+        ----------
+        tablename : str
+            Table name.
+
+        Returns
+        -------
+        int
+            A value never returned before for this table.
+
+        Raises
+        ------
+        Exception
+            Database errors while reserving a new block.
+        """
+        key = tablename.lower()
+        with self.__lock:
+            block = self.__blocks.get(key)
+            if block is None or block[0] >= block[1]:
+                start, end = self.__reserve(key, max(self.blocksize, 1))
+                block = [start, end]
+                self.__blocks[key] = block
+            value = block[0]
+            block[0] += 1
+            return value
+    #--------------------------------------------------------------------------------------
+    def observe(self, tablename: str, ind: int) -> None:
+        """
+        Move the sequence past an ``ind`` written by someone else.
+
+        Parameters
+        ----------
+        tablename : str
+            Table name.
+        ind : int
+            Highest ``ind`` stored in the table by another writer (e.g. rows
+            received from the server).
+        """
+        key = tablename.lower()
+        with self.__lock:
+            block = self.__blocks.get(key)
+            if block is not None and block[0] <= ind:
+                #the rest of the cached block would collide: drop it
+                del self.__blocks[key]
+            conn = self.__pool.acquire(private=True)
+            failed = True
+            try:
+                c = conn.cursor()
+                c.execute("UPDATE lo_sequences SET nextind=GREATEST(nextind,%s) WHERE tablename=%s", (int(ind) + 1, key))
+                c.close()
+                conn.commit()
+                failed = False
+            finally:
+                self.__pool.release(conn, checkhealth=failed, private=True)
+    #--------------------------------------------------------------------------------------
+    def __reserve(self, key: str, count: int) -> Tuple[int, int]:
+        """Reserve ``count`` values; the first use of a table seeds it from ``max(ind)``."""
+        conn = self.__pool.acquire(private=True)
+        failed = True
+        try:
+            c = conn.cursor()
+            c.execute("UPDATE lo_sequences SET nextind=LAST_INSERT_ID(nextind+%s) WHERE tablename=%s", (count, key))
+            if c.rowcount == 0:
+                #INSERT IGNORE: a concurrent writer may have seeded the row meanwhile
+                c.execute("INSERT IGNORE INTO lo_sequences (tablename,nextind) SELECT %s, COALESCE(MAX(ind),0)+1 FROM " + key, (key,))
+                c.execute("UPDATE lo_sequences SET nextind=LAST_INSERT_ID(nextind+%s) WHERE tablename=%s", (count, key))
+            c.execute("SELECT LAST_INSERT_ID()")
+            end = int(c.fetchone()[0])
+            c.close()
+            conn.commit()
+            failed = False
+            return end - count, end
+        finally:
+            self.__pool.release(conn, checkhealth=failed, private=True)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#================================================================================
+#Copyright of Davide Sbreviglieri 2024
+#THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE
+#================================================================================
+#SERIALIZER NIOS4
+#================================================================================
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import json_nios4
+
+#local column names renamed back to the server names
+REFIELDFORBIDDEN = {"read_b": "read", "usercloud_b": "usercloud", "repeat_b": "repeat"}
+#columns copied in the sync_box object besides cvalues
+HEADER_COLUMNS = ("gguid", "tid", "arc", "uta", "ut")
+#SQL types returned as datetime by the connector
+DATETIME_TYPES = ("datetime", "timestamp")
+#================================================================================
+def _tid14(value: datetime) -> int:
+    """``datetime`` as the ``YYYYMMDDHHMMSS`` integer used by the server."""
+    return (value.year * 10000000000 + value.month * 100000000 + value.day * 1000000
+            + value.hour * 10000 + value.minute * 100 + value.second)
+#================================================================================
+class serializer_nios4:
+    """
+    Converter of DB rows of one table into ``sync_box`` objects.
+
+    Built once from the column list: renamed columns, header columns and
+    datetime columns are resolved up front, so each row is converted with
+    a ``zip`` and a few index lookups.
+    """
+    def __init__(self, tablename: str, columns: Sequence[str], datetimecolumns: Optional[Iterable[str]] = None) -> None:
+        """
+        Compile the serializer.
+
+        Parameters
+        ----------
+        tablename : str
+            Table name.
+        columns : sequence of str
+            Column names in the order of the fetched rows.
+        datetimecolumns : iterable of str, optional
+            Columns holding ``datetime`` values. If omitted every value is
+            type-checked, as when the column types are unknown.
+        """
+        self.tablename = tablename
+        self.columns = list(columns)
+        self.__keys = tuple(REFIELDFORBIDDEN.get(c, c) for c in self.columns)
+        self.__headers = [(c, i) for i, c in enumerate(self.columns) if c in HEADER_COLUMNS]
+        if datetimecolumns is None:
+            self.__dates: Optional[List[int]] = None
+        else:
+            names = set(datetimecolumns)
+            self.__dates = [i for i, c in enumerate(self.columns) if c in names]
+    #--------------------------------------------------------------------------------------
+    def row(self, record: Sequence[Any]) -> Dict[str, Any]:
+        """
+        Convert one row.
+
+        Parameters
+        ----------
+        record : sequence
+            Row values as fetched from the DB.
+
+        Returns
+        -------
+        dict
+            ``sync_box`` object (``command``, ``tablename``, ``client``,
+            header columns and the JSON string ``cvalues``).
+        """
+        o: Dict[str, Any] = {"command": "insert", "tablename": self.tablename, "client": 0}
+        for name, i in self.__headers:
+            o[name] = record[i]
+
+        dates = self.__dates
+        if dates is None:
+            values = [_tid14(v) if type(v) == datetime else v for v in record]
+        elif dates:
+            values = list(record)
+            for i in dates:
+                if values[i] is not None:
+                    values[i] = _tid14(values[i])
+        else:
+            values = record
+
+        #same text as json.dumps(cvalue, ensure_ascii=False) for every row
+        o["cvalues"] = json_nios4.dumps(dict(zip(self.__keys, values)))
+        return o
+    #--------------------------------------------------------------------------------------
+    def rows(self, records: Iterable[Sequence[Any]]) -> List[Dict[str, Any]]:
+        """
+        Convert a batch of rows.
+
+        Parameters
+        ----------
+        records : iterable of sequence
+            Rows as fetched from the DB.
+
+        Returns
+        -------
+        list of dict
+            ``sync_box`` objects, in the same order.
+        """
+        row = self.row
+        return [row(r) for r in records]
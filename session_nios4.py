@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#================================================================================
+#Copyright of Davide Sbreviglieri 2024
+#THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE
+#================================================================================
+#SESSION NIOS4
+#================================================================================
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+from codec_nios4 import codec_nios4
+from serializer_nios4 import DATETIME_TYPES, serializer_nios4
+
+if TYPE_CHECKING:
+    from database_nios4 import database_nios4
+#================================================================================
+class session_nios4:
+    """
+    Metadata of one synchronization round.
+
+    Holds the table, field and user maps and the row codecs used by
+    ``install_data``, and the column lists and row serializers used to
+    extract rows for upload.
+    The maps are read once (:meth:`load`) and then kept up to date by the
+    caller as tables, fields and users are created, updated or dropped, so
+    consecutive packets of the same round do not read ``so_tables``,
+    ``so_fields`` and ``so_users`` again.
+    """
+    def __init__(self, db: "database_nios4") -> None:
+        """
+        Initialize an empty session.
+
+        Parameters
+        ----------
+        db : database_nios4
+            Database helper used to read the metadata.
+        """
+        self.__db = db
+        #{tablename: tid}
+        self.tables: Dict[str, float] = {}
+        #{'table|field': (tid, fieldtype)}
+        self.fields: Dict[str, Any] = {}
+        #{gguid: tid} of so_users
+        self.users: Dict[str, float] = {}
+        self.__columns: Dict[str, List[str]] = {}
+        self.__codecs: Dict[Tuple[str, Callable[[Any], str]], codec_nios4] = {}
+        self.__serializers: Dict[str, serializer_nios4] = {}
+        self.__loaded = False
+        self.loads = 0
+    #--------------------------------------------------------------------------------------
+    def load(self) -> bool:
+        """
+        Read the table, field and user maps (only the first time).
+
+        Returns
+        -------
+        bool
+            ``True`` on success, ``False`` otherwise (see ``db.err``).
+        """
+        if self.__loaded:
+            return True
+        tables = self.__db.get_tablesname()
+        fields = self.__db.get_fieldsname()
+        users = self.__db.get_gguid("so_users")
+        if tables == None or fields == None or users == None:
+            return False
+        self.tables = tables
+        self.fields = fields
+        self.users = users
+        self.__loaded = True
+        self.loads += 1
+        return True
+    #--------------------------------------------------------------------------------------
+    def reload(self) -> bool:
+        """
+        Forget every map and read them again.
+
+        Returns
+        -------
+        bool
+            ``True`` on success, ``False`` otherwise.
+        """
+        self.__loaded = False
+        self.__columns.clear()
+        self.__codecs.clear()
+        self.__serializers.clear()
+        return self.load()
+    #--------------------------------------------------------------------------------------
+    def columns(self, tablename: str) -> Optional[List[str]]:
+        """
+        Column names of a table, cached for the session.
+
+        Parameters
+        ----------
+        tablename : str
+            Table name.
+
+        Returns
+        -------
+        list of str or None
+            Column names in ordinal order, or ``None`` on error.
+        """
+        key = tablename.lower()
+        if key not in self.__columns:
+            columns = self.__db.get_columnsname(tablename)
+            if columns == None:
+                return None
+            self.__columns[key] = columns
+        return self.__columns[key]
+    #--------------------------------------------------------------------------------------
+    def serializer(self, tablename: str) -> Optional[serializer_nios4]:
+        """
+        Row serializer of a table for upload, compiled on first use.
+
+        Parameters
+        ----------
+        tablename : str
+            Table name.
+
+        Returns
+        -------
+        serializer_nios4 or None
+            Serializer for ``SELECT *`` rows of the table, or ``None`` on error.
+        """
+        key = tablename.lower()
+        if key not in self.__serializers:
+            columns = self.columns(tablename)
+            types = self.__db.get_fieldstype(tablename)
+            if columns == None or types == None:
+                return None
+            dates = [c for c in columns if types.get(c) in DATETIME_TYPES]
+            self.__serializers[key] = serializer_nios4(tablename, columns, dates)
+        return self.__serializers[key]
+    #--------------------------------------------------------------------------------------
+    def codec(self, tablename: str, fieldforbidden: Dict[str, str], tid: Callable[[Any], str]) -> codec_nios4:
+        """
+        Row codec of a table, compiled on first use.
+
+        Parameters
+        ----------
+        tablename : str
+            Table name.
+        fieldforbidden : dict
+            Remote-to-local renames of reserved field names.
+        tid : callable
+            Converter of the received ``tid``; codecs are cached per
+            ``(tablename, tid)``, pass the same callable to reuse them.
+
+        Returns
+        -------
+        codec_nios4
+            Compiled codec.
+        """
+        key = (tablename, tid)
+        codec = self.__codecs.get(key)
+        if codec is None:
+            codec = codec_nios4(tablename, self.fields, fieldforbidden, tid)
+            self.__codecs[key] = codec
+        return codec
+    #--------------------------------------------------------------------------------------
+    def invalidate(self, tablename: str) -> None:
+        """
+        Forget the cached columns, codecs and serializers of a table.
+
+        Parameters
+        ----------
+        tablename : str
+            Table name.
+        """
+        self.__columns.pop(tablename.lower(), None)
+        self.__serializers.pop(tablename.lower(), None)
+        for key in [k for k in self.__codecs if k[0].lower() == tablename.lower()]:
+            del self.__codecs[key]
+    #--------------------------------------------------------------------------------------
+    def drop_table(self, tablename: str) -> None:
+        """
+        Forget a dropped table and its fields.
+
+        Parameters
+        ----------
+        tablename : str
+            Table name.
+        """
+        self.tables.pop(tablename, None)
+        prefix = tablename.lower() + "|"
+        for key in [k for k in self.fields if k.startswith(prefix)]:
+            del self.fields[key]
+        self.invalidate(tablename)
+    #--------------------------------------------------------------------------------------
+    def drop_field(self, tablename: str, fieldname: str) -> None:
+        """
+        Forget a dropped field.
+
+        Parameters
+        ----------
+        tablename : str
+            Table name.
+        fieldname : str
+            Field name.
+        """
+        self.fields.pop(tablename.lower() + "|" + fieldname.lower(), None)
+        self.invalidate(tablename)
+    #--------------------------------------------------------------------------------------
+    def refresh_columns(self, tablename: str) -> None:
+        """
+        Register the DB columns of a table changed by DDL.
+
+        Columns not yet in :attr:`fields` are added as
+        :meth:`database_nios4.get_fieldsname` would report them.
+
+        Parameters
+        ----------
+        tablename : str
+            Table name.
+        """
+        self.invalidate(tablename)
+        self.__db.fill_fieldsname(self.fields, tablename)
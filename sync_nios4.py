@@ -17,22 +17,95 @@
 #================================================================================
 from __future__ import annotations
 
+import itertools
 import json
 import os
+import queue
 import sys
+import threading
+import time
 import uuid
-import urllib.request
-import urllib.parse
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import AbstractContextManager
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
-import requests
 from urllib.parse import quote
+#requests is imported on the first remote call (faster startup)
 
 from database_nios4 import database_nios4
+from http_nios4 import http_nios4
+from index_nios4 import SYNCED_KEYS_DDL
+import json_nios4
+from packet_nios4 import packet_nios4
+from serializer_nios4 import serializer_nios4
+from session_nios4 import session_nios4
 from utility_nios4 import error_n4, utility_n4
 
 Number = Union[int, float]
+#end of a pipeline stage
+_END = object()
+#members of a sync response that must be applied before its rows
+STRUCTURE_KEYS = ("data", "clean_tables", "clean_fields", "tables", "fields", "users")
+#================================================================================
+class _background:
+    """
+    Iterator running another iterable on a thread started at once, through
+    a queue of ``maxsize`` items.
+
+    The producer blocks when the queue is full; exceptions it raises are
+    raised again by :meth:`__next__`. Closing (or dropping) the iterator
+    stops the producer at its next item.
+    """
+    def __init__(self, iterable: Iterable[Any], maxsize: int) -> None:
+        self.__items: "queue.Queue[Tuple[bool, Any]]" = queue.Queue(maxsize=max(1, maxsize))
+        self.__stop = threading.Event()
+        self.__done = False
+        items = self.__items
+        stop = self.__stop
+
+        def put(item: Tuple[bool, Any]) -> bool:
+            while not stop.is_set():
+                try:
+                    items.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def run() -> None:
+            try:
+                for item in iterable:
+                    if not put((True, item)):
+                        return
+                put((False, None))
+            except BaseException as e:
+                put((False, e))
+
+        threading.Thread(target=run, name="nios4-stream", daemon=True).start()
+    #--------------------------------------------------------------------------------------
+    def __iter__(self) -> "_background":
+        return self
+    #--------------------------------------------------------------------------------------
+    def __next__(self) -> Any:
+        if self.__done:
+            raise StopIteration
+        more, item = self.__items.get()
+        if not more:
+            self.close()
+            if item is not None:
+                raise item
+            raise StopIteration
+        return item
+    #--------------------------------------------------------------------------------------
+    def close(self) -> None:
+        """Stop the producer."""
+        self.__done = True
+        self.__stop.set()
+    #--------------------------------------------------------------------------------------
+    def __del__(self) -> None:
+        self.__stop.set()
 #================================================================================
 
 class sync_nios4:
@@ -43,9 +116,10 @@ class sync_nios4:
     packets, and utility helpers (TID/UUID, URL encoding, notifications, email).
     """
 
-    def __init__(self,username:str,password:str,token:str,dbname:str,hostdb:str,usernamedb:str,passworddb:str) -> None:
+    def __init__(self,username:str,password:str,token:str,dbname:str,hostdb:str,usernamedb:str,passworddb:str,
+                 poolsize:int = 5,compress:Optional[str] = None) -> None:
         """
-        Initialize the sync class and lazy-login if no token is provided.
+        Initialize the sync class; login is deferred if no token is provided.
 
         Parameters
         ----------
@@ -54,7 +128,7 @@ class sync_nios4:
         password : str
             Application password for the remote service.
         token : str
-            Access token; if empty, :meth:`login` is called.
+            Access token; if empty, :meth:`login` is called on the first remote call.
         dbname : str
             Local MySQL database name.
         hostdb : str
@@ -63,18 +137,32 @@ class sync_nios4:
             MySQL username.
         passworddb : str
             MySQL password.
+        poolsize : int
+            Size of the local MySQL connection pool.
+        compress : str or None
+            Coding of the sync packets sent (``"gzip"`` or ``"deflate"``),
+            only for servers that accept compressed requests; ``None``
+            (default) sends them uncompressed.
 
         Notes
         -----
         - Creates :class:`database_nios4` and shares the same :class:`error_n4`.
-        - Sets default packet size (:attr:`nrow_sync`) to 5000 rows.
+        - Login is deferred to the first remote call.
+        - Remote calls share one keep-alive HTTP session (:meth:`http`);
+          sync packets are streamed, compressed as set by ``compress``
+          (also ``http().compress``); responses are always requested
+          compressed.
+        - Sets default packet size (:attr:`nrow_sync`) to 5000 rows; during
+          :meth:`syncro` it adapts between :attr:`nrow_sync_min` and
+          :attr:`nrow_sync_max` and packets stay below :attr:`packet_maxbytes`.
         - Initializes allowlists for table-level enablement.
         """
+        start = time.perf_counter()
         self.__username = username
         self.__password = password
         self.__token = token
         self.__dbname = dbname
-        self.__db = database_nios4(username,password,dbname,hostdb,usernamedb,passworddb)
+        self.__db = database_nios4(username,password,dbname,hostdb,usernamedb,passworddb,poolsize=poolsize)
         self.__utility = utility_n4
         #class for errors
         self.err = error_n4("","")
@@ -82,8 +170,33 @@ class sync_nios4:
         #if view message log on console
         self.viewmessage = True
         self.__db.viewmessage = self.viewmessage
-        #maximum number of lines that can be shipped at a time
+        #maximum number of lines that can be shipped at a time (initial value when adaptive)
         self.nrow_sync = 5000
+        #packet sizing: rows adapt to the round-trip time within [min, max],
+        #packets are also closed at packet_maxbytes estimated bytes (0 = no bound)
+        self.adaptive_packets = True
+        self.nrow_sync_min = 500
+        self.nrow_sync_max = 20000
+        self.packet_maxbytes = 8388608
+        self.packet_seconds = 5.0
+        #partial pages downloaded ahead while the previous one is applied:
+        #worker threads, and pages in flight or waiting (memory bound; 1 = serial)
+        self.download_workers = 2
+        self.download_buffer = 3
+        #uploads running at once (>1 only if the server accepts packets out of order)
+        #and packets ready for upload while the rows are still being read
+        self.upload_workers = 1
+        self.push_buffer = 2
+        #received rows are decoded while they arrive and applied nrow_stream at a time,
+        #one commit each (see install_data)
+        self.download_stream = True
+        self.nrow_stream = 1000
+        #rows of a received packet applied in one transaction (0 = whole packet)
+        self.nrow_transaction = 0
+        #rows read per query when extracting changed rows
+        self.extract_pagesize = 1000
+        #shared HTTP session (keep-alive, timeouts, retry) for every remote call
+        self.__http = http_nios4(compress=compress)
         
         # tables allowlists
         #If these lists are filled in, the synchronizer will only act on these tables 
@@ -92,8 +205,9 @@ class sync_nios4:
         self.enabled_getdata_tables = [] # tables to receive data for
         self.enabled_setdata_tables = [] # tables to send data for
 
-        if token == "":
-            self.login()
+        #startup timing in seconds (database bootstrap and whole constructor)
+        self.timing: Dict[str, float] = dict(self.__db.timing)
+        self.timing["init"] = time.perf_counter() - start
 
     #----------------------------------------------------------------------------
     def send_notificationrecord(self,uta:str,title:str,description:str,tablename:str,gguidrif:str) -> None:
@@ -171,8 +285,12 @@ class sync_nios4:
         -----
         Error details are stored in :attr:`err` on failure.
         """
+        import requests
+
         try:
             self.err.error = False
+            if not self.__ensure_login():
+                return False
             data = {}
             data['from'] = sendfrom
             data['fromName'] = sendfromname
@@ -187,7 +305,7 @@ class sync_nios4:
 
             url = f"https://app.pocketsell.com/_master/?action=email_send&token={self.__token}&db={dbname}"
 
-            response = requests.post(url, json=data)
+            response = self.__http.post(url, json=data)
 
             if response.status_code == 200:
                 return True
@@ -266,6 +384,8 @@ class sync_nios4:
           ``file_<fieldname>`` to the original filename, bumping ``tid``.
         - Adds the row to ``lo_syncbox``.
         """
+        if not self.__ensure_login():
+            return None
         gguidrif = str(uuid.uuid4())
         tid = datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')
         dizionario = {"gguidfile":gguidrif,"nomefile":filename,"tid":tid}
@@ -279,8 +399,13 @@ class sync_nios4:
         with open(pathfile, "rb") as file:
             file_data = file.read()
 
-        response = requests.post(url, headers=headers, data=file_data)
-        result = response.json()
+        try:
+            response = self.__http.post(url, headers=headers, data=file_data)
+            result = self.__http.read_json(response)
+        except Exception as e:
+            self.err.errorcode = "E014"
+            self.err.errormessage = str(e)
+            return None
 
         self.setsql(f"UPDATE {tablename} SET {fieldname}='{self.convap(stringa)}',file_{fieldname}='{self.convap(filename)}',tid={self.tid()} WHERE gguid='{gguid}'")
         self.addsyncbox(tablename,gguid)
@@ -373,6 +498,67 @@ class sync_nios4:
         """
         return self.__db.newrow(tablename, gguid)
     #----------------------------------------------------------------------------
+    def transaction(self) -> AbstractContextManager:
+        """
+        Group several local statements in one transaction.
+
+        Returns
+        -------
+        contextmanager
+            ``with SYNC.transaction():`` block, see :meth:`database_nios4.transaction`.
+        """
+        return self.__db.transaction()
+    #----------------------------------------------------------------------------
+    def pool_stats(self) -> Dict[str, float]:
+        """
+        Statistics of the local MySQL connection pool.
+
+        Returns
+        -------
+        dict
+            Hit/miss/wait counters, see :meth:`database_nios4.pool_stats`.
+        """
+        return self.__db.pool_stats()
+    #----------------------------------------------------------------------------
+    def http(self) -> http_nios4:
+        """
+        Shared HTTP client of the remote calls.
+
+        Returns
+        -------
+        http_nios4
+            Client whose ``connecttimeout``, ``readtimeout``, ``retries`` and
+            ``backoff`` attributes can be tuned.
+        """
+        return self.__http
+    #----------------------------------------------------------------------------
+    def http_stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Latency of the remote calls per endpoint.
+
+        Returns
+        -------
+        dict
+            See :meth:`http_nios4.stats`.
+        """
+        return self.__http.stats()
+    #----------------------------------------------------------------------------
+    def index_report(self) -> Optional[Dict[str, Dict[str, List[str]]]]:
+        """
+        Report missing, duplicate and redundant indexes of the local DB.
+
+        Returns
+        -------
+        dict or None
+            See :meth:`database_nios4.index_report`.
+        """
+        return self.__db.index_report()
+    #----------------------------------------------------------------------------
+    def close(self) -> None:
+        """Release the pooled MySQL and HTTP connections."""
+        self.__db.close()
+        self.__http.close()
+    #----------------------------------------------------------------------------
     def tid(self) -> int:
         """
         Get a UTC TID (``YYYYMMDDHHMMSS``) as integer.
@@ -503,8 +689,7 @@ class sync_nios4:
             else:
                 url = "https://app.pocketsell.com/_master/?action=user_login&email=" + self.__username + "&password=" + self.__password
 
-            req = urllib.request.Request(url)
-            values = json.load(urllib.request.urlopen(req))
+            values = self.__http.read_json(self.__http.get(url))
             if values["error"] == True:
                 self.err.errorcode = values["error_code"]
                 self.err.errormessage = values["error_message"]
@@ -521,7 +706,21 @@ class sync_nios4:
             self.err.errormessage = str(e)
             return None
     #----------------------------------------------------------------------------
-    def download_datablock(self,dbname:str,TID:Number,countrows:int)-> Optional[Dict[str, Any]]:
+    def __ensure_login(self) -> bool:
+        """
+        Log in on first use when no token was given.
+
+        Returns
+        -------
+        bool
+            ``True`` if a token is available.
+        """
+        if self.__token == "" and self.__username != "":
+            self.login()
+        return self.__token != ""
+    #----------------------------------------------------------------------------
+    def download_datablock(self,dbname:str,TID:Number,countrows:int,pagesize:Optional[int]=None,err:Optional[error_n4]=None,
+                           stream:bool=False)-> Optional[Dict[str, Any]]:
         """
         Request a partial sync data block from the remote service.
 
@@ -533,30 +732,53 @@ class sync_nios4:
             Lower bound for synchronization (``tid_sync``).
         countrows : int
             Offset for partial download (``partial_from``).
+        pagesize : int, optional
+            Rows requested (``partial``), default :attr:`nrow_sync`; the next
+            offset is ``countrows + pagesize``.
+        err : error_n4, optional
+            Where errors are recorded, default :attr:`err` (pages downloaded
+            on worker threads use their own).
+        stream : bool
+            If ``True``, ``sync_box`` is an iterator decoding the rows while
+            they are received (see :meth:`__stream_datablock`).
 
         Returns
         -------
         dict or None
             The JSON payload with sync data, or ``None`` on error.
         """
-        sendstring = f"https://app.pocketsell.com/_sync/?action=sync_all&token={self.__token}&db={dbname}&tid_sync={str(TID)}&dos=Linux&dmodel=desktop&partial={str(self.nrow_sync)}&partial_from={str(countrows)}"
+        if err == None:
+            err = self.err
+        if not self.__ensure_login():
+            return None
+        sendstring = f"https://app.pocketsell.com/_sync/?action=sync_all&token={self.__token}&db={dbname}&tid_sync={str(TID)}&dos=Linux&dmodel=desktop&partial={str(pagesize or self.nrow_sync)}&partial_from={str(countrows)}"
        
         datablock = {}
         s = [""]
         datablock["XXX"] = s
 
-        datablock = urllib.parse.urlencode(datablock).encode()
-        req =  urllib.request.Request(sendstring, data=datablock)
-        resp = json.load(urllib.request.urlopen(req))
+        try:
+            #a read: safe to retry
+            resp = self.__http.post(sendstring, data=datablock, idempotent=True, stream=stream)
+            if stream:
+                return self.__stream_datablock(resp,err)
+            resp = self.__http.read_json(resp)
+        except Exception as e:
+            err.errorcode = "E014"
+            err.errormessage = str(e)
+            return None
+        if self.viewmessage == True:
+            print("download packet: " + self.__http.describe())
 
         if resp["result"] == "KO":
-            self.err.errorcode = resp["code"]
-            self.err.errormessage = resp["message"]
+            err.errorcode = resp["code"]
+            err.errormessage = resp["message"]
             return None
 
         return resp
     #----------------------------------------------------------------------------
-    def upload_datablock(self,datablock:Dict[str, Any],dbname:str,TID:Number,partial:bool) -> Optional[Dict[str, Any]]:
+    def upload_datablock(self,datablock:Dict[str, Any],dbname:str,TID:Number,partial:bool,pagesize:Optional[int]=None,
+                         stream:bool=False) -> Optional[Dict[str, Any]]:
         """
         Send a sync data block to the remote service.
 
@@ -571,28 +793,46 @@ class sync_nios4:
         partial : bool
             Whether this is a normal incremental packet (``True``) or the
             final/front packet (``False``).
+        pagesize : int, optional
+            Rows of the first received packet when ``partial`` is ``False``
+            (``partial``), default :attr:`nrow_sync`.
+        stream : bool
+            If ``True``, ``sync_box`` of the response is an iterator decoding
+            the rows while they are received (see :meth:`__stream_datablock`).
 
         Returns
         -------
         dict or None
             The JSON response, or ``None`` on error.
         """
+        if not self.__ensure_login():
+            return None
         partialstring = ""
         if partial == False:
-            partialstring = f"0&partial={self.nrow_sync}&partial_from=0"
+            partialstring = f"0&partial={pagesize or self.nrow_sync}&partial_from=0"
         else:
             partialstring = f"1"
 
         sendstring = "https://app.pocketsell.com/_sync/?action=sync_all&token=" + self.__token + "&db=" + dbname + "&tid_sync=" + self.__utility.float_to_str(self,TID) + "&dos=Windows&dmodel=python&lang=it&system=nios4&partial_send=" + partialstring
         
-        resp = requests.post(sendstring, json=datablock)
+        try:
+            #encoded row by row while sent (chunked), compressed if http().compress is set
+            resp = self.__http.post_json_stream(sendstring, datablock, stream=stream)
+            if stream:
+                return self.__stream_datablock(resp,self.err)
+        except Exception as e:
+            self.err.errorcode = "E014"
+            self.err.errormessage = str(e)
+            return None
 
         try:
-            response: Dict[str, Any] = resp.json()
+            response: Dict[str, Any] = self.__http.read_json(resp)
         except Exception:
             self.err.errorcode = "E014"
             self.err.errormessage = "Invalid JSON from upload_datablock"
             return None
+        if self.viewmessage == True:
+            print("upload packet: " + self.__http.describe())
 
         if response["result"] == "KO":
             self.err.errorcode = response["code"]
@@ -601,6 +841,63 @@ class sync_nios4:
 
         return response
     #----------------------------------------------------------------------------
+    def __stream_datablock(self,resp:Any,err:error_n4) -> Optional[Dict[str, Any]]:
+        """
+        Decode a sync response while it is received.
+
+        The members before ``sync_box`` are decoded at once; ``sync_box``
+        becomes an iterator over the rows, decoded as they arrive, and the
+        members after it are added to the returned dict once the rows are
+        exhausted (read ``tid_sync`` and ``partial`` after the rows). A
+        transfer or decoding error while iterating is recorded in ``err``
+        and raised as ``RuntimeError``.
+
+        Members after ``sync_box`` (e.g. ``tables`` or ``fields`` sent after
+        the rows) are not applied before the rows: :meth:`install_data`
+        keeps aside the rows they concern and applies them afterwards.
+
+        Returns
+        -------
+        dict or None
+            The payload, or ``None`` on error.
+        """
+        events = self.__http.read_json_stream(resp,"sync_box")
+        values: Dict[str, Any] = {}
+        first: Any = _END
+        for key, value in events:
+            if key == "sync_box":
+                first = value
+                break
+            values[key] = value
+
+        if values.get("result") == "KO":
+            events.close()
+            err.errorcode = values.get("code","E014")
+            err.errormessage = values.get("message","")
+            return None
+        if first is _END:
+            return values
+
+        def rows() -> Iterator[Dict[str, Any]]:
+            try:
+                yield first
+                for key, value in events:
+                    if key == "sync_box":
+                        yield value
+                    else:
+                        values[key] = value
+            except Exception as e:
+                err.errorcode = "E014"
+                err.errormessage = str(e)
+                raise RuntimeError(err.errormessage)
+            if values.get("result") == "KO":
+                err.errorcode = values.get("code","E014")
+                err.errormessage = values.get("message","")
+                raise RuntimeError(err.errormessage)
+
+        values["sync_box"] = rows()
+        return values
+    #----------------------------------------------------------------------------
     def extract_syncrow(self,tablename:str,record: Union[Tuple[Any, ...], List[Any]],columns: List[str]) -> Dict[str, Any]:
         """
         Convert a DB row into a `sync_box`-compatible object.
@@ -620,41 +917,15 @@ class sync_nios4:
             Object containing ``command``, ``tablename``, ``client`` and
             a JSON string ``cvalues`` with the row content. Special field
             name mappings are applied (``*_b``).
-        """
-        refieldforbidden={}
-        refieldforbidden["read_b"] = "read"
-        refieldforbidden["usercloud_b"] = "usercloud"
-        refieldforbidden["repeat_b"] = "repeat"
-
-        count = 0
-        o = {}
-        cvalue = {}
-        o["command"] ="insert"
-        o["tablename"] =tablename
-        o["client"] =0
-        for nc in columns:
-            
-            if nc == "gguid" or nc =="tid" or nc=="arc" or nc=="uta" or nc=="ut":
-                o[nc] = record[count]    
-            
-            if nc in refieldforbidden:
-                nc = refieldforbidden[nc]
-
-            cvalue[nc] = record[count]
 
-            #devo controllare se il valore è una data, se si lo devo convertire
-            if type(cvalue[nc]) == datetime:
-                if cvalue[nc] is None:
-                    cvalue[nc] = 0
-                else:
-                    cvalue[nc] = int(cvalue[nc].strftime('%Y%m%d%H%M%S'))
-
-            count = count+1
-
-        o["cvalues"] = json.dumps(cvalue, ensure_ascii=False)
-        return o
+        Notes
+        -----
+        Builds a :class:`serializer_nios4` for a single row; to convert many
+        rows of a table build the serializer once and reuse it.
+        """
+        return serializer_nios4(tablename,columns).row(record)
     #----------------------------------------------------------------------------
-    def install_data(self,useNTID:bool,datablock:Dict[str, Any],managefile:bool,skipusers:bool,reworkdata:bool):
+    def install_data(self,useNTID:bool,datablock:Dict[str, Any],managefile:bool,skipusers:bool,reworkdata:bool,session:Optional[session_nios4]=None):
         """
         Apply a received sync data block to the local database.
 
@@ -664,13 +935,18 @@ class sync_nios4:
             If ``True``, bump local TIDs instead of using remote ones.
         datablock : dict
             Full sync payload (may include ``data``, ``tables``, ``fields``,
-            ``users``, ``clean_tables``, ``clean_fields``, ``sync_box``).
+            ``users``, ``clean_tables``, ``clean_fields``, ``sync_box``);
+            ``sync_box`` may be an iterator of rows still being received.
         managefile : bool
             Whether file processing is needed (currently unused in this method).
         skipusers : bool
             If ``True``, skip applying user records (currently unused here).
         reworkdata : bool
             If ``True``, perform data rework steps (currently unused here).
+        session : session_nios4, optional
+            Metadata of the current synchronization round; pass the same
+            session for every packet of a round to read the table, field
+            and user maps only once. A new one is created if omitted.
 
         Returns
         -------
@@ -683,11 +959,30 @@ class sync_nios4:
         - Drops tables/fields present in cleanup lists.
         - Creates/updates tables and fields from structure.
         - Upserts users into ``so_users`` and ``so_localusers``.
-        - Applies row-level changes from ``sync_box``.
+        - Applies row-level changes from ``sync_box``, one transaction per
+          :attr:`nrow_transaction` rows (or per packet, or per
+          :attr:`nrow_stream` rows of a streamed packet); a failing chunk
+          is rolled back as a whole.
+        - Rows of a streamed packet whose table or fields are not known yet
+          are kept aside and applied after the members that follow
+          ``sync_box`` (late ``tables``, ``fields``...).
+        - Keeps the session maps in step with every change it makes.
+
+        A packet applied in several transactions is not atomic: if it fails
+        midway the chunks already committed stay. :meth:`syncro` stores
+        ``tid_sync`` only once every packet is applied, so synchronizing
+        again receives the packet again and re-applies it (rows whose
+        ``tid`` is not newer than the local one are skipped).
         """
-        actualtables = self.__db.get_tablesname()
-        actualfields = self.__db.get_fieldsname()
-        actualusers = self.__db.get_gguid("so_users")
+        if session == None:
+            session = session_nios4(self.__db)
+        if session.load() == False:
+            self.err.errorcode = self.__db.err.errorcode
+            self.err.errormessage = self.__db.err.errormessage
+            return False
+        actualtables = session.tables
+        actualfields = session.fields
+        actualusers = session.users
 
         #--------------------------------------------
         #Head of data
@@ -698,7 +993,6 @@ class sync_nios4:
         #--------------------------------------------
         #Delete tables
         #--------------------------------------------
-        reloadtables= False
         if "clean_tables" in datablock:
             if type(datablock["clean_tables"]) is list:
                 for dtable in datablock["clean_tables"]:
@@ -707,22 +1001,20 @@ class sync_nios4:
                             if self.__db.exists_table(dtable) == True:
                                 if self.viewmessage == True:
                                     print(self.stime() +  "     delete table " + dtable)
-                                if self.__db.setsql("DELETE FROM so_tables WHERE tablename='" + dtable + "'") == False:
+                                if self.__db.setsql_params("DELETE FROM so_tables WHERE tablename=%s",(dtable,)) == False:
                                     return False
-                                if self.__db.setsql("DELETE FROM so_fields WHERE tablename='" + dtable + "'") == False:
+                                if self.__db.setsql_params("DELETE FROM so_fields WHERE tablename=%s",(dtable,)) == False:
                                     return False
                                 if self.__db.setsql("DROP TABLE " + dtable) == False:
                                     return False
-                                reloadtables = True
+                                session.drop_table(dtable)
 
         #--------------------------------------------
         #Delete fields
         #--------------------------------------------
-        reloadfields = False
         if "clean_fields" in datablock:
             for key in datablock["clean_fields"].keys():
                 if key in actualtables:
-                    reloadfields = True
                     if self.viewmessage == True:
                         print(self.stime() +  "     delete field " + str(datablock["clean_fields"][key]) + " from table " + key)
 
@@ -730,15 +1022,10 @@ class sync_nios4:
                         if self.__db.exists_field(key,fieldname) == True:
                             if self.__db.setsql(f"ALTER TABLE {key} DROP COLUMN {fieldname}") == False:
                                 return False
-                            if self.__db.setsql(f"DELETE FROM so_fields WHERE tablename='{key}' AND fieldname='{fieldname}'") == False:
+                            if self.__db.setsql_params("DELETE FROM so_fields WHERE tablename=%s AND fieldname=%s",(key,fieldname)) == False:
                                 return False
+                            session.drop_field(key,fieldname)
 
-        #--------------------------------------------
-        if reloadtables == True or reloadfields == True:
-            actualtables = self.__db.get_tablesname()
-            actualfields = self.__db.get_fieldsname()      
-        reloadtables = False
-        reloadfields = False
         #--------------------------------------------
         # Tables creation/update (respect allowlists)
         #--------------------------------------------
@@ -771,53 +1058,50 @@ class sync_nios4:
                         key = str(table["tablename"]).lower()
 
                         if table["tablename"] not in actualtables:
-                            reloadtables = True
                             if self.viewmessage == True:
                                 print(self.stime() +  "     add table " + table["tablename"])
-                            if self.__db.setsql("CREATE TABLE " + key + " (gguid VARCHAR(40) Not NULL DEFAULT '', tid DOUBLE NOT NULL DEFAULT 0,eli INTEGER NOT NULL DEFAULT 0,arc INTEGER NOT NULL DEFAULT 0,ut VARCHAR(255) NOT NULL DEFAULT '',uta VARCHAR(255) NOT NULL DEFAULT '',exp TEXT NOT NULL DEFAULT '',gguidp VARCHAR(40) NOT NULL DEFAULT '', ind INTEGER NOT NULL DEFAULT 0,tap TEXT NOT NULL DEFAULT '',dsp TEXT NOT NULL DEFAULT '',dsc TEXT NOT NULL DEFAULT '', dsq1 DOUBLE NOT NULL DEFAULT 0, dsq2 DOUBLE NOT NULL DEFAULT 0,utc VARCHAR(255) NOT NULL DEFAULT '', tidc DOUBLE NOT NULL DEFAULT 0)") == False:
+                            if self.__db.setsql("CREATE TABLE " + key + " (gguid VARCHAR(40) Not NULL DEFAULT '', tid DOUBLE NOT NULL DEFAULT 0,eli INTEGER NOT NULL DEFAULT 0,arc INTEGER NOT NULL DEFAULT 0,ut VARCHAR(255) NOT NULL DEFAULT '',uta VARCHAR(255) NOT NULL DEFAULT '',exp TEXT NOT NULL DEFAULT '',gguidp VARCHAR(40) NOT NULL DEFAULT '', ind INTEGER NOT NULL DEFAULT 0,tap TEXT NOT NULL DEFAULT '',dsp TEXT NOT NULL DEFAULT '',dsc TEXT NOT NULL DEFAULT '', dsq1 DOUBLE NOT NULL DEFAULT 0, dsq2 DOUBLE NOT NULL DEFAULT 0,utc VARCHAR(255) NOT NULL DEFAULT '', tidc DOUBLE NOT NULL DEFAULT 0, " + SYNCED_KEYS_DDL + ")") == False:
                                 return False
-                            if self.__db.setsql("INSERT INTO so_tables (GGUID,tablename,param,expressions,tablelabel,newlabel,lgroup) VALUES ('{0}','{1}','','','','','')".format(str(table["gguid"]),key)) == False:
+                            if self.__db.setsql_params("INSERT INTO so_tables (GGUID,tablename,param,expressions,tablelabel,newlabel,lgroup) VALUES (%s,%s,'','','','','')",(str(table["gguid"]),key)) == False:
                                 return False
                             actualtables[key] = 0
+                            session.refresh_columns(key)
+                            if self.__db.capture().enabled():
+                                if self.__db.capture().install_table(key) == False:
+                                    self.err.errorcode = self.__db.err.errorcode
+                                    self.err.errormessage = self.__db.err.errormessage
+                                    return False
 
                         if actualtables[key] < table["tid"]:
-                            reloadtables = True
                             if self.viewmessage == True:
                                 print(self.stime() +  "     update table " + table["tablename"])
-                            sqlstring = ""
                             if useNTID == False:
-                                sqlstring = "UPDATE so_tables SET tid=" + self.__utility.float_to_str(self,table["tid"]) + ","
-                            else:
-                                sqlstring = "UPDATE so_tables SET tid=" + self.__utility.float_to_str(self,self.__utility.tid(self) + 10) + ","
-                            
-                            sqlstring = sqlstring + "eli=" + str(table["eli"]) + ","
-                            sqlstring = sqlstring + "arc=" + str(table["arc"]) + ","
-                            sqlstring = sqlstring + "ut='" + str(table["ut"]) + "',"
-                            sqlstring = sqlstring + "eliminable=" + str(table["eliminable"]) + ","
-                            sqlstring = sqlstring + "editable=" + str(table["editable"]) + ","
-                            sqlstring = sqlstring + "displayable=" + str(table["displayable"]) + ","
-                            sqlstring = sqlstring + "syncsel=" + str(table["syncsel"]) + ","
-                            sqlstring = sqlstring + "syncyes=" + str(table["syncyes"]) + ","
-                            sqlstring = sqlstring + "tablename='" + table["tablename"] + "',"
-                            if "lgroup" in table:
-                                sqlstring = sqlstring + "lgroup='" + self.__utility.convap(self,table["lgroup"]) + "',"
+                                tidvalue = self.__utility.float_to_str(self,table["tid"])
                             else:
-                                sqlstring = sqlstring + "lgroup=''"
-                            if "param" in table:
-                                sqlstring = sqlstring + "param='" + self.__utility.convap(self,table["param"]) + "',"
-                            else:
-                                sqlstring = sqlstring + "param='',"
-                            if "expressions" in table:
-                                sqlstring = sqlstring + "expressions='" + self.__utility.convap(self,table["expressions"]) + "',"
-                            else:
-                                sqlstring = sqlstring + "expressions='',"
-                            
-                            sqlstring = sqlstring + "newlabel='" + self.__utility.convap(self,table["newlabel"]) + "',"
-                            sqlstring = sqlstring + "tablelabel='" + self.__utility.convap(self,table["tablelabel"]) + "'"
-                            sqlstring = sqlstring + " WHERE tablename='" + table["tablename"] + "'"
-
-                            if self.__db.setsql(sqlstring) == False:
+                                tidvalue = self.__utility.float_to_str(self,self.__utility.tid(self) + 10)
+
+                            sqlstring = "UPDATE so_tables SET tid=%s,eli=%s,arc=%s,ut=%s,eliminable=%s,editable=%s,displayable=%s,syncsel=%s,syncyes=%s,"
+                            sqlstring = sqlstring + "tablename=%s,lgroup=%s,param=%s,expressions=%s,newlabel=%s,tablelabel=%s WHERE tablename=%s"
+                            params = (tidvalue,
+                                      table["eli"],
+                                      table["arc"],
+                                      str(table["ut"]),
+                                      table["eliminable"],
+                                      table["editable"],
+                                      table["displayable"],
+                                      table["syncsel"],
+                                      table["syncyes"],
+                                      table["tablename"],
+                                      self.__utility.tostr(self,table.get("lgroup")),
+                                      self.__utility.tostr(self,table.get("param")),
+                                      self.__utility.tostr(self,table.get("expressions")),
+                                      self.__utility.tostr(self,table["newlabel"]),
+                                      self.__utility.tostr(self,table["tablelabel"]),
+                                      table["tablename"])
+
+                            if self.__db.setsql_params(sqlstring,params) == False:
                                 return False
+                            actualtables[key] = table["tid"]
 
         #--------------------------------------------
         # Fields creation/update
@@ -828,8 +1112,37 @@ class sync_nios4:
         fieldforbidden["usercloud"] = "usercloud_b"
         fieldforbidden["repeat"] = "repeat_b"
 
+        alteredtables = []
         if "fields" in datablock:
             if type(datablock["fields"]) is list:
+                #columns of the new fields, one ALTER TABLE per table
+                newcolumns: Dict[str, List[str]] = {}
+                backfill: Dict[str, List[str]] = {}
+                newkeys = []
+                for field in datablock["fields"]:
+                    if str(field["fieldname"]) != "" and str(field["fieldname"]) != "system" and str(field["tablename"]) != "" and field["tablename"] in actualtables:
+                        if field["fieldname"].lower() in fieldforbidden:
+                            field["fieldname"] = fieldforbidden[field["fieldname"]]
+                        key =  field["tablename"].lower() + "|" + field["fieldname"].lower()
+                        if key not in actualfields and key not in newkeys and str(field["fieldname"]).lower():
+                            newkeys.append(key)
+                            columns = self.__field_columns(field["fieldname"],field["fieldtype"])
+                            if columns == None:
+                                self.err.errorcode = "E001"
+                                self.err.errormessage = "CAMPO " + str(field["fieldtype"]) + " NON GESTITO!"
+                                return False
+                            tablename = str(field["tablename"]).lower()
+                            newcolumns.setdefault(tablename, []).extend(columns[0])
+                            backfill.setdefault(tablename, []).extend(columns[1])
+
+                for tablename in newcolumns:
+                    if self.__db.add_columns(tablename,newcolumns[tablename]) == False:
+                        return False
+                    #columns without a DEFAULT are filled with a single UPDATE
+                    if len(backfill[tablename]) > 0:
+                        if self.__db.setsql("UPDATE " + tablename + " SET " + ",".join(c + "=''" for c in backfill[tablename])) == False:
+                            return False
+
                 for field in datablock["fields"]:
                     if str(field["fieldname"]) != "" and str(field["fieldname"]) != "system" and str(field["tablename"]) != "" and field["tablename"] in actualtables:
                         #check special fields
@@ -843,133 +1156,71 @@ class sync_nios4:
                         key =  field["tablename"].lower() + "|" + field["fieldname"].lower()
 
                         if key not in actualfields and str(field["fieldname"]).lower():
-                            reloadfields = True
+                            if str(field["tablename"]).lower() not in alteredtables:
+                                alteredtables.append(str(field["tablename"]).lower())
                             if self.viewmessage == True:
                                 print(self.stime() +  "     add field " +  field["fieldname"] + "(" + field["tablename"] + ")")
-                            #create the field inside the table
-                            sqlstring = ""
-                            sqlstring2 = ""
-                            #text field
-                            if fieldtype == 0 or fieldtype == 1 or fieldtype == 2 or fieldtype == 30 or fieldtype == 14 or fieldtype == 12 or fieldtype == 15 or fieldtype == 34:
-                                #special field
-                                sqlstring = "ALTER TABLE " + str(field["tablename"]).lower() + " ADD " + str(field["fieldname"]).lower() + " MEDIUMTEXT NOT NULL DEFAULT ''"
-                                sqlstring2 = "UPDATE " + str(field["tablename"]).lower()  + " SET " + str(field["fieldname"]).lower() + "=''"
-
-                            if fieldtype == 20 or fieldtype == 22 or fieldtype == 21 or fieldtype == 24 or fieldtype == 25 or fieldtype == 26 or fieldtype == 27  or fieldtype == 28  or fieldtype == 29  or fieldtype == 31  or fieldtype == 32:
-                                sqlstring = "ALTER TABLE " + str(field["tablename"]).lower() + " ADD " + str(field["fieldname"]).lower() + " MEDIUMTEXT NOT NULL DEFAULT ''"
-                                sqlstring2 = "UPDATE " + str(field["tablename"]).lower()  + " SET " + str(field["fieldname"]).lower() + "=''"
-                            #field double
-                            if fieldtype == 3 or fieldtype == 5 or fieldtype == 10 or fieldtype == 17:
-                                sqlstring = "ALTER TABLE " + str(field["tablename"]).lower() + " ADD " + str(field["fieldname"]).lower() + " DOUBLE NOT NULL DEFAULT 0"
-                                sqlstring2 = "UPDATE " + str(field["tablename"]).lower()  + " SET " + str(field["fieldname"]).lower() + "=0"
-                            #field date
-                            if fieldtype == 18:
-                                sqlstring = "ALTER TABLE " + str(field["tablename"]).lower() + " ADD " + str(field["fieldname"]).lower() + " DATETIME"
-                                sqlstring2 = "UPDATE " + str(field["tablename"]).lower()  + " SET " + str(field["fieldname"]).lower() + "=NULL"
-                            #field integer
-                            if fieldtype == 4 or fieldtype == 9 or fieldtype == 6:
-                                sqlstring = "ALTER TABLE " + str(field["tablename"]).lower() + " ADD " + str(field["fieldname"]).lower() + " INTEGER NOT NULL DEFAULT 0"
-                                sqlstring2 = "UPDATE " + str(field["tablename"]).lower()  + " SET " + str(field["fieldname"]).lower() + "=0"
-
-                            if fieldtype == "" and fieldtype !=11:
-                                self.err.errorcode = "E001"
-                                self.err.errormessage = "CAMPO " + str(fieldtype) + " NON GESTITO!"
-                                return False
-
-                            if sqlstring != "":
-                                if self.__db.setsql(sqlstring) == False:
-                                    return False
-
-                            if sqlstring2 != "":
-                                if self.__db.setsql(sqlstring2) == False:
-                                    return False
-                            #add special field
-                            if fieldtype == 20 or fieldtype == 22:
-                                if self.__db.setsql("ALTER TABLE " + str(field["tablename"]).lower() + " ADD gguid_" + str(field["fieldname"]).lower() + " TEXT") == False:
-                                    return False
-                                if self.__db.setsql("UPDATE " + str(field["tablename"]).lower()  + " SET gguid_" + str(field["fieldname"]).lower() + "=''") == False:
-                                    return False
-                            
-                            if fieldtype == 21 or fieldtype == 24:
-                                if self.__db.setsql("ALTER TABLE " + str(field["tablename"]).lower() + " ADD dat_" + str(field["fieldname"]).lower() + " TEXT") == False:
-                                    return False
-                                if self.__db.setsql("UPDATE " + str(field["tablename"]).lower()  + " SET dat_" + str(field["fieldname"]).lower() + "=''") == False:
-                                    return False
-
-                            if fieldtype == 28:
-                                if self.__db.setsql("ALTER TABLE " + str(field["tablename"]).lower() + " ADD file_" + str(field["fieldname"]).lower() + " TEXT") == False:
-                                    return False
-                                if self.__db.setsql("UPDATE " + str(field["tablename"]).lower()  + " SET file_" + str(field["fieldname"]).lower() + "=''") == False:
-                                    return False
-
-                            if fieldtype == 24:
-                                if self.__db.setsql("ALTER TABLE " + str(field["tablename"]).lower() + " ADD lat_" + str(field["fieldname"]).lower() + " DOUBLE NOT NULL DEFAULT 0") == False:
-                                    return False
-                                if self.__db.setsql("UPDATE " + str(field["tablename"]).lower()  + " SET lat_" + str(field["fieldname"]).lower() + "=0") == False:
-                                    return False
-                                if self.__db.setsql("ALTER TABLE " + str(field["tablename"]).lower() + " ADD lng_" + str(field["fieldname"]).lower() + " DOUBLE NOT NULL DEFAULT 0") == False:
-                                    return False
-                                if self.__db.setsql("UPDATE " + str(field["tablename"]).lower()  + " SET lng_" + str(field["fieldname"]).lower() + "=0") == False:
-                                    return False
-
-                            if self.__db.setsql("INSERT INTO so_fields (fieldlabel2,panel,style,expression,param,fieldlabel,ut,gguid,tablename,fieldname) VALUES ('','','','','','','','{0}','{1}','{2}')".format(str(field["gguid"]),str(field["tablename"]).lower(),str(field["fieldname"]).lower())) == False:
+                            if self.__db.setsql_params("INSERT INTO so_fields (fieldlabel2,panel,style,expression,param,fieldlabel,ut,gguid,tablename,fieldname) VALUES ('','','','','','','',%s,%s,%s)",(str(field["gguid"]),str(field["tablename"]).lower(),str(field["fieldname"]).lower())) == False:
                                 return False
                             
                             actualfields[key] =[0,fieldtype]
                             
                         if actualfields[key][0] < field["tid"]:
-                            reloadfields = True
                             if self.viewmessage == True:
                                 print(self.stime() +  "     update field " +  field["fieldname"] + "(" + field["tablename"] + ")")
 
-                            sqlstring = ""
                             if useNTID == False:
-                                sqlstring = "UPDATE so_fields SET tid=" + self.__utility.float_to_str(self,field["tid"]) + ","
+                                tidvalue = self.__utility.float_to_str(self,field["tid"])
                             else:
-                                sqlstring = "UPDATE so_fields SET tid=" + self.__utility.float_to_str(self,self.__utility.tid(self) + 10) + ","
-                            sqlstring = sqlstring + "eli=" + str(field["eli"]) + ","
-                            sqlstring = sqlstring + "arc=" + str(field["arc"]) + ","
-                            sqlstring = sqlstring + "ut='" + str(field["ut"]) + "',"
-                            sqlstring = sqlstring + "eliminable=" + str(field["eliminable"]) + ","
-                            sqlstring = sqlstring + "editable=" + str(field["editable"]) + ","
-                            sqlstring = sqlstring + "displayable='" + str(field["displayable"]) + "',"
-                            sqlstring = sqlstring + "obligatory=" + str(field["obligatory"]) + ","
-                            sqlstring = sqlstring + "viewcolumn=" + str(field["viewcolumn"]) + ","
-                            sqlstring = sqlstring + "ind=" + str(field["ind"]) + ","
-                            sqlstring = sqlstring + "columnindex=" + str(field["columnindex"]) + ","
-                            sqlstring = sqlstring + "fieldtype=" + str(field["fieldtype"]) + ","
-                            sqlstring = sqlstring + "columnwidth=" + str(field["columnwidth"]) + ","
-                            sqlstring = sqlstring + "ofsystem=" + str(field["ofsystem"]) + ","
-                            sqlstring = sqlstring + "panel='" + field["panel"] + "',"
-                            sqlstring = sqlstring + "panelindex=" + str(field["panelindex"]) + ","
-                            sqlstring = sqlstring + "tablename='" + field["tablename"] + "',"
-                            sqlstring = sqlstring + "fieldname='" + field["fieldname"] + "',"
-                            
-                            if field["style"].find("{") == -1:
-                                sqlstring = sqlstring + "style='',"
-                            else:
-                                sqlstring = sqlstring + "style='" + self.__utility.convap(self,field["style"]) + "',"
-                            
-                            if field["param"].find("{") == -1:
-                                sqlstring = sqlstring + "param='',"
-                            else:
-                                sqlstring = sqlstring + "param='" + self.__utility.convap(self,field["param"]) + "',"
-                            
-                            if field["expression"].find("{") == -1:
-                                sqlstring = sqlstring + "expression='',"
-                            else:
-                                sqlstring = sqlstring + "expression='" + self.__utility.convap(self,field["expression"]) + "',"
-                            
-                            sqlstring = sqlstring + "fieldlabel='" + self.__utility.convap(self,field["fieldlabel"]) + "',"
-                            sqlstring = sqlstring + "fieldlabel2='" + self.__utility.convap(self,field["fieldlabel2"]) + "'"
-                            sqlstring = sqlstring + " WHERE tablename='" + str(field["tablename"]) + "' AND fieldname='" + str(field["fieldname"]) + "'"
-
-                            if self.__db.setsql(sqlstring) == False:
+                                tidvalue = self.__utility.float_to_str(self,self.__utility.tid(self) + 10)
+
+                            style = ""
+                            if field["style"].find("{") != -1:
+                                style = field["style"]
+                            param = ""
+                            if field["param"].find("{") != -1:
+                                param = field["param"]
+                            expression = ""
+                            if field["expression"].find("{") != -1:
+                                expression = field["expression"]
+
+                            sqlstring = "UPDATE so_fields SET tid=%s,eli=%s,arc=%s,ut=%s,eliminable=%s,editable=%s,displayable=%s,obligatory=%s,viewcolumn=%s,"
+                            sqlstring = sqlstring + "ind=%s,columnindex=%s,fieldtype=%s,columnwidth=%s,ofsystem=%s,panel=%s,panelindex=%s,tablename=%s,fieldname=%s,"
+                            sqlstring = sqlstring + "style=%s,param=%s,expression=%s,fieldlabel=%s,fieldlabel2=%s WHERE tablename=%s AND fieldname=%s"
+                            params = (tidvalue,
+                                      field["eli"],
+                                      field["arc"],
+                                      str(field["ut"]),
+                                      field["eliminable"],
+                                      field["editable"],
+                                      str(field["displayable"]),
+                                      field["obligatory"],
+                                      field["viewcolumn"],
+                                      field["ind"],
+                                      field["columnindex"],
+                                      field["fieldtype"],
+                                      field["columnwidth"],
+                                      field["ofsystem"],
+                                      field["panel"],
+                                      field["panelindex"],
+                                      field["tablename"],
+                                      field["fieldname"],
+                                      style,
+                                      param,
+                                      expression,
+                                      self.__utility.tostr(self,field["fieldlabel"]),
+                                      self.__utility.tostr(self,field["fieldlabel2"]),
+                                      str(field["tablename"]),
+                                      str(field["fieldname"]))
+
+                            if self.__db.setsql_params(sqlstring,params) == False:
                                 return False
+                            actualfields[key] = (field["tid"],field["fieldtype"])
+                            session.invalidate(str(field["tablename"]))
         #--------------------------------------------
-        if reloadtables == True or reloadfields == True:
-            actualtables = self.__db.get_tablesname()
-            actualfields = self.__db.get_fieldsname()  
+        #register the helper columns created with the new fields
+        for t in alteredtables:
+            session.refresh_columns(t)
         #--------------------------------------------
         # Users
         #--------------------------------------------
@@ -977,200 +1228,386 @@ class sync_nios4:
             if type(datablock["users"]) is list:
                 for user in datablock["users"]:
                     if user["gguid"] not in actualusers:
-                        if self.__db.setsql("INSERT INTO so_users (GGUID,username,password_hash,param) VALUES ('{0}','','','')".format(str(user["gguid"]))) == False:
+                        if self.__db.setsql_params("INSERT INTO so_users (GGUID,username,password_hash,param) VALUES (%s,'','','')",(str(user["gguid"]),)) == False:
                             return False
                         actualusers[user["gguid"]] = 0
 
                     if actualusers[user["gguid"]] < user["tid"]:
                         
-                        sqlstring = ""
                         if useNTID == False:
-                            sqlstring = "UPDATE so_users SET tid=" + self.__utility.float_to_str(self,user["tid"]) + ","
+                            tidvalue = self.__utility.float_to_str(self,user["tid"])
                         else:
-                            sqlstring = "UPDATE so_users SET tid=" + self.__utility.float_to_str(self,self.__utility.tid(self) + 10) + ","                            
-
-                        sqlstring = sqlstring + "eli=" + str(user["eli"]) + ","
-                        sqlstring = sqlstring + "arc=" + str(user["arc"]) + ","
-                        sqlstring = sqlstring + "admin=" + str(user["admin"]) + ","
-                        sqlstring = sqlstring + "id=" + str(user["id"]) + ","
-                        sqlstring = sqlstring + "ut='" + str(user["ut"]) + "',"
-                        sqlstring = sqlstring + "username='" + str(user["username"]) + "',"
-                        sqlstring = sqlstring + "password_hash='" + str(user["password_hash"]) + "',"
-
-                        if str(user["param"]).find("{") == -1:
-                            sqlstring = sqlstring + "param='',"
-                        else:
-                            sqlstring = sqlstring + "param='" + self.__utility.convap(self,str(user["param"])) + "',"
-
-                        sqlstring = sqlstring + "categories=" + str(user["categories"])
-                        sqlstring = sqlstring + " WHERE gguid='" + str(user["gguid"]) + "'"
-                        
-                        if self.__db.setsql(sqlstring) == False:
+                            tidvalue = self.__utility.float_to_str(self,self.__utility.tid(self) + 10)
+
+                        param = ""
+                        if str(user["param"]).find("{") != -1:
+                            param = str(user["param"])
+
+                        sqlstring = "UPDATE so_users SET tid=%s,eli=%s,arc=%s,admin=%s,id=%s,ut=%s,username=%s,password_hash=%s,param=%s,categories=%s WHERE gguid=%s"
+                        params = (tidvalue,
+                                  user["eli"],
+                                  user["arc"],
+                                  user["admin"],
+                                  user["id"],
+                                  str(user["ut"]),
+                                  str(user["username"]),
+                                  str(user["password_hash"]),
+                                  param,
+                                  user["categories"],
+                                  str(user["gguid"]))
+
+                        if self.__db.setsql_params(sqlstring,params) == False:
                             return False
+                        actualusers[user["gguid"]] = user["tid"]
 
-                        records = self.__db.getsql("SELECT gguid FROM so_localusers where gguid='{0}'".format(str(user["gguid"])))
+                        records = self.__db.getsql_params("SELECT gguid FROM so_localusers where gguid=%s",(str(user["gguid"]),))
                         if records == None:
                             return False
                         if len(records) == 0:
 
-                            password_hash = ""
-                            if user["password_hash"] != None:
-                                password_hash =  self.__utility.convap(self,user["password_hash"])
-
                             sqlstring = "INSERT INTO so_localusers("
-                            sqlstring = sqlstring + "gguid," #0
-                            sqlstring = sqlstring + "tid," #1
-                            sqlstring = sqlstring + "eli," #2
-                            sqlstring = sqlstring + "arc," #3
-                            sqlstring = sqlstring + "ut," #4
-                            sqlstring = sqlstring + "uta," #5
-                            sqlstring = sqlstring + "exp," #6
-                            sqlstring = sqlstring + "gguidp," #7
-                            sqlstring = sqlstring + "ind," #8
-                            sqlstring = sqlstring + "username," #9
-                            sqlstring = sqlstring + "optionsbase," #10
-                            sqlstring = sqlstring + "optionsadmin," #11
-                            sqlstring = sqlstring + "param," #12
-                            sqlstring = sqlstring + "usermail," #13
-                            sqlstring = sqlstring + "color," #14
-                            sqlstring = sqlstring + "id," #15
-                            sqlstring = sqlstring + "tap," #16
-                            sqlstring = sqlstring + "dsp," #17
-                            sqlstring = sqlstring + "dsc," #18
-                            sqlstring = sqlstring + "dsq1," #19
-                            sqlstring = sqlstring + "dsq2," #20
-                            sqlstring = sqlstring + "utc," #21
-                            sqlstring = sqlstring + "tidc," #22
-                            sqlstring = sqlstring + "password_hash," #23
-                            sqlstring = sqlstring + "usercloud_b," #24
-                            sqlstring = sqlstring + "admin," #25
-                            sqlstring = sqlstring + "categories," #26
-                            #----------------------------------
-                            sqlstring = sqlstring[:-1] + ")"
-                            #----------------------------------
-                            sqlstring = sqlstring + " VALUES('" + str(user["gguid"]) + "'," #0
-                            sqlstring = sqlstring + "0" + "," #1
-                            sqlstring = sqlstring + "0," #2
-                            sqlstring = sqlstring + "0," #3
-                            sqlstring = sqlstring + "'" + self.__utility.convap(self,str(self.__username)) + "'," #4
-                            sqlstring = sqlstring + "''," #5
-                            sqlstring = sqlstring + "''," #6
-                            sqlstring = sqlstring + "''," #7
-                            sqlstring = sqlstring + "0," #8
-                            sqlstring = sqlstring + "'" + self.__utility.convap(self,str(user["username"])) + "'," #9
-                            sqlstring = sqlstring + "0," #10
-                            sqlstring = sqlstring + "0," #11
-                            sqlstring = sqlstring + "'{}'," #12
-                            sqlstring = sqlstring + "''," #13
-                            sqlstring = sqlstring + "-1," #14
-                            sqlstring = sqlstring + str(user["id"]) + "," #15
-                            sqlstring = sqlstring + "''," #16
-                            sqlstring = sqlstring + "''," #17
-                            sqlstring = sqlstring + "''," #18
-                            sqlstring = sqlstring + "0," #19
-                            sqlstring = sqlstring + "0," #20
-                            sqlstring = sqlstring + "'" + str(self.__username) + "'," #21
-                            sqlstring = sqlstring + str(self.__utility.tid(self)) + "," #22
-                            sqlstring = sqlstring + "'" + password_hash + "'," #23
-                            sqlstring = sqlstring + "1," #25
-                            sqlstring = sqlstring + str(user["admin"]) + ","  #25
-                            sqlstring = sqlstring + str(user["categories"]) + "," #26
-                            #----------------------------------
-                            sqlstring =  sqlstring[:-1] + ")"
-                            #----------------------------------
-                            if self.__db.setsql(sqlstring) == False:
+                            sqlstring = sqlstring + "gguid,tid,eli,arc,ut,uta,exp,gguidp,ind,username,optionsbase,optionsadmin,param,usermail,color,id,"
+                            sqlstring = sqlstring + "tap,dsp,dsc,dsq1,dsq2,utc,tidc,password_hash,usercloud_b,admin,categories)"
+                            sqlstring = sqlstring + " VALUES(%s,0,0,0,%s,'','','',0,%s,0,0,'{}','',-1,%s,'','','',0,0,%s,%s,%s,1,%s,%s)"
+                            params = (str(user["gguid"]),
+                                      str(self.__username),
+                                      str(user["username"]),
+                                      user["id"],
+                                      str(self.__username),
+                                      self.__utility.tid(self),
+                                      self.__utility.tostr(self,user["password_hash"]),
+                                      user["admin"],
+                                      user["categories"])
+
+                            if self.__db.setsql_params(sqlstring,params) == False:
                                 return False
 
         #--------------------------------------------
         # Syncbox rows
         #--------------------------------------------
         if "sync_box" in datablock:
+            maxind: Dict[str, int] = {}
             if type(datablock["sync_box"]) is list:
+                if self.__apply_rows(useNTID,datablock["sync_box"],session,fieldforbidden,maxind) == False:
+                    return False
+            elif datablock["sync_box"] != None:
+                #rows still being received: applied nrow_stream at a time, one
+                #commit each; the structure may also follow the rows
+                early = [k for k in STRUCTURE_KEYS if k in datablock]
+                deferred: List[Dict[str, Any]] = []
+                waiting: set = set()
+                try:
+                    for rows in self.__batches(datablock["sync_box"],max(self.nrow_stream, 1)):
+                        rows = self.__defer_rows(rows,session,fieldforbidden,"fields" not in early,deferred,waiting)
+                        if self.__apply_rows(useNTID,rows,session,fieldforbidden,maxind) == False:
+                            return False
+                except RuntimeError:
+                    #the transfer broke (error in err)
+                    return False
 
-                #extract tables to sync
-                tables = {}
-                for row in datablock["sync_box"]:
-                    vtable = True
-                    if len(self.enabled_getdata_tables) > 0:
-                        if row["tablename"] not in self.enabled_getdata_tables:
-                            vtable = False
-                    if vtable == True:
-                        if row["tablename"] not in tables:
-                            tables[row["tablename"]] = self.__db.get_gguid(row["tablename"])
-
-                for row in datablock["sync_box"]:
-                    if row["command"]  == "insert":
-                        if row["tablename"] in tables:
-
-                            tc = tables[row["tablename"]]
-                            if tc is not None:
-                                if row["gguid"] not in tc:
-
-                                    if self.viewmessage == True:
-                                        print(self.stime() +  "     add new row ("+row["tablename"]+")")
-
-                                    self.__db.newrow(row["tablename"],row["gguid"])
-                                    
-                                    tc[row["gguid"]] = 0
-
-                                if tc[row["gguid"]] < row["tid"]:
-
-                                    if self.viewmessage == True:
-                                        print(self.stime() +  "     update row ("+row["tablename"]+")")
-                                
-                                    sqlstring = "UPDATE " + row["tablename"] + " SET "
-                                    va = json.loads(row["cvalues"])
-                                    for key in va:
-                                        value = va[key]
-                                        if value != None:
-                                            nc = key.lower()
-                                            k = row["tablename"].lower() + "|" + nc
-
-                                            if nc in fieldforbidden:
-                                                nc = fieldforbidden[nc]
-
-                                            if k in actualfields and key != "gguid":
-                                                tca = actualfields[k][1]
-                                                if tca != 11:
-                                                    if nc == "gguid" or nc == "ut" or nc == "uta" or nc == "exp" or nc == "gguidp" or nc == "tap" or nc == "dsp" or nc == "dsc" or nc == "utc":
-                                                        sqlstring = sqlstring + nc + "='" + self.__utility.convap(self,value) + "',"
-                                                    elif nc == "eli" or nc == "arc" or nc == "ind" or nc == "dsq1" or nc == "dsq2" or nc == "tidc":
-                                                        sqlstring = sqlstring + nc + "='" + str(value).replace(",",".") + "',"
-                                                    elif nc == "tid":
-                                                        if useNTID == False:
-                                                            sqlstring = sqlstring + " tid=" + self.__utility.float_to_str(self,value) + ","
-                                                        else:
-                                                            sqlstring = sqlstring + " tid=" + self.__utility.float_to_str(self.__utility.tid(self) + 10) + ","
-                                                    else:
-                                                        if tca==0 or tca==1 or tca==2 or tca==30 or tca==14 or tca==12 or tca==11 or tca==15 or tca==20 or tca==21 or tca==22 or tca==24 or tca==25 or tca==26 or tca==27 or tca==28 or tca==29 or tca==31 or tca==32 or tca==34:
-                                                            sqlstring = sqlstring + nc + "='" + self.__utility.convap(self,value.replace("'","`")) + "',"
-                                                        if tca==3 or tca==5 or tca==10 or tca==9 or tca==17 or tca==6 or tca==4:
-                                                            sqlstring = sqlstring + nc + "='" + str(value).replace(",",".") + "',"
-                                                        if tca==18: #data
-                                                            if value == "null":
-                                                                value = 0
-                                                            if type(value) == str and value != None:
-                                                                value=float(value)                                                            
-                                                            if value != 0:
-                                                                try:
-                                                                    data_formato_mysql = datetime.strptime(str(round(value)), '%Y%m%d%H%M%S').strftime('%Y-%m-%d %H:%M:%S')
-                                                                    sqlstring = sqlstring + nc + "='" + data_formato_mysql + "',"
-                                                                except Exception as e:
-                                                                    print("errore formato data")
-                                    
-                                    sqlstring =  sqlstring[:-1] + " WHERE gguid='" + row["gguid"] + "'"
-
-                                    if self.__db.setsql(sqlstring) == False:
-                                        return False
-                                    
-                    if row["command"]  == "delete":
-                        if row["tablename"] in tables:
-                            sqlstring = "DELETE FROM " + row["tablename"] + " WHERE gguid='" + row["gguid"] + "'"
-                            if self.__db.setsql(sqlstring) == False:
-                                return False
+                #structure received after the rows, then the rows kept aside
+                late = {k: datablock[k] for k in STRUCTURE_KEYS if k in datablock and k not in early}
+                if len(late) > 0 or len(deferred) > 0:
+                    late["sync_box"] = deferred
+                    if self.install_data(useNTID,late,managefile,skipusers,reworkdata,session) == False:
+                        return False
+
+            #keep locally allocated ind values after the received ones
+            for tablename in maxind:
+                if self.__db.observe_ind(tablename,maxind[tablename]) == False:
+                    return False
+
+        return True
+    #----------------------------------------------------------------------------------------------
+    def __batches(self,rows:Iterable[Dict[str, Any]],size:int) -> Iterator[List[Dict[str, Any]]]:
+        """Lists of ``size`` rows (the last may be shorter)."""
+        iterator = iter(rows)
+        while True:
+            batch = list(itertools.islice(iterator,size))
+            if len(batch) == 0:
+                return
+            yield batch
+    #----------------------------------------------------------------------------------------------
+    def __defer_rows(self,rows:List[Dict[str, Any]],session:session_nios4,fieldforbidden:Dict[str, str],checkfields:bool,
+                     deferred:List[Dict[str, Any]],waiting:set) -> List[Dict[str, Any]]:
+        """
+        Rows of a streamed packet that can be applied now.
+
+        Rows of a table not in the session or (``checkfields``) with a
+        field not in it are appended to ``deferred``, their table or field
+        may follow ``sync_box``; later rows of the same GUID (``waiting``)
+        follow them to keep their order. Checked ``cvalues`` stay decoded.
+        """
+        ready = []
+        for row in rows:
+            tablename = row["tablename"]
+            key = (tablename, row["gguid"])
+            if key not in waiting:
+                known = tablename in session.tables
+                if len(self.enabled_getdata_tables) > 0 and tablename not in self.enabled_getdata_tables:
+                    known = True
+                elif known and checkfields and row["command"] == "insert":
+                    if type(row["cvalues"]) is str:
+                        row["cvalues"] = json_nios4.loads(row["cvalues"])
+                    prefix = tablename.lower() + "|"
+                    for name in row["cvalues"]:
+                        name = name.lower()
+                        if prefix + name not in session.fields and prefix + fieldforbidden.get(name,name) not in session.fields:
+                            known = False
+                            break
+                if known:
+                    ready.append(row)
+                    continue
+                waiting.add(key)
+            deferred.append(row)
+        return ready
+    #----------------------------------------------------------------------------------------------
+    def __apply_rows(self,useNTID:bool,rows:List[Dict[str, Any]],session:session_nios4,fieldforbidden:Dict[str, str],maxind:Dict[str, int]) -> bool:
+        """
+        Apply received ``sync_box`` rows, one transaction per
+        :attr:`nrow_transaction` rows (or for all of them).
+
+        Returns
+        -------
+        bool
+            ``True`` on success, ``False`` otherwise (the failing chunk is
+            rolled back).
+        """
+        #extract tables to sync (and the GUIDs of the rows for each)
+        packetgguids: Dict[str, List[str]] = {}
+        for row in rows:
+            vtable = True
+            if len(self.enabled_getdata_tables) > 0:
+                if row["tablename"] not in self.enabled_getdata_tables:
+                    vtable = False
+            if vtable == True:
+                packetgguids.setdefault(row["tablename"], []).append(row["gguid"])
+        #large tables are probed only for the GUIDs of the rows
+        tables = {}
+        for tablename in packetgguids:
+            tables[tablename] = self.__db.get_gguid(tablename,packetgguids[tablename])
+
+        step = self.nrow_transaction if self.nrow_transaction > 0 else max(len(rows), 1)
+        for first in range(0, len(rows), step):
+            with self.__db.transaction():
+                if self.__bulk_apply(useNTID,rows[first:first + step],tables,session,fieldforbidden,maxind) == False:
+                    return False
+        return True
+    #----------------------------------------------------------------------------------------------
+    def __field_columns(self,fieldname:str,fieldtype:Any) -> Optional[Tuple[List[str], List[str]]]:
+        """
+        DB columns needed by a new field.
+
+        Parameters
+        ----------
+        fieldname : str
+            Field name.
+        fieldtype : int
+            Nios4 field type.
+
+        Returns
+        -------
+        tuple or None
+            ``(definitions, backfill)``: the column definitions for
+            ``ALTER TABLE ... ADD`` and the columns without a DEFAULT that
+            must be set to ``''`` afterwards; ``None`` for an unhandled type.
+        """
+        name = str(fieldname).lower()
+        columns = []
+        backfill = []
+        #text field
+        if fieldtype == 0 or fieldtype == 1 or fieldtype == 2 or fieldtype == 30 or fieldtype == 14 or fieldtype == 12 or fieldtype == 15 or fieldtype == 34:
+            columns.append(name + " MEDIUMTEXT NOT NULL DEFAULT ''")
+        if fieldtype == 20 or fieldtype == 22 or fieldtype == 21 or fieldtype == 24 or fieldtype == 25 or fieldtype == 26 or fieldtype == 27  or fieldtype == 28  or fieldtype == 29  or fieldtype == 31  or fieldtype == 32:
+            columns.append(name + " MEDIUMTEXT NOT NULL DEFAULT ''")
+        #field double
+        if fieldtype == 3 or fieldtype == 5 or fieldtype == 10 or fieldtype == 17:
+            columns.append(name + " DOUBLE NOT NULL DEFAULT 0")
+        #field date (NULL by default)
+        if fieldtype == 18:
+            columns.append(name + " DATETIME")
+        #field integer
+        if fieldtype == 4 or fieldtype == 9 or fieldtype == 6:
+            columns.append(name + " INTEGER NOT NULL DEFAULT 0")
+
+        if fieldtype == "" and fieldtype !=11:
+            return None
+
+        #add special field
+        if fieldtype == 20 or fieldtype == 22:
+            columns.append("gguid_" + name + " TEXT")
+            backfill.append("gguid_" + name)
+        if fieldtype == 21 or fieldtype == 24:
+            columns.append("dat_" + name + " TEXT")
+            backfill.append("dat_" + name)
+        if fieldtype == 28:
+            columns.append("file_" + name + " TEXT")
+            backfill.append("file_" + name)
+        if fieldtype == 24:
+            columns.append("lat_" + name + " DOUBLE NOT NULL DEFAULT 0")
+            columns.append("lng_" + name + " DOUBLE NOT NULL DEFAULT 0")
+        return columns, backfill
+    #----------------------------------------------------------------------------------------------
+    def __bulk_apply(self,useNTID:bool,rows:List[Dict[str, Any]],tables:Dict[str, Any],session:session_nios4,fieldforbidden:Dict[str, str],maxind:Dict[str, int]) -> bool:
+        """
+        Apply ``sync_box`` commands with multi-row statements.
+
+        Parameters
+        ----------
+        useNTID : bool
+            If ``True``, bump local TIDs instead of using remote ones.
+        rows : list of dict
+            ``sync_box`` items, applied in order.
+        tables : dict
+            ``{tablename: {gguid: tid}}`` for the tables enabled for receive;
+            updated with the applied GUIDs.
+        session : session_nios4
+            Session providing the row codec of each table.
+        fieldforbidden : dict
+            Remote-to-local renames of reserved field names.
+        maxind : dict
+            ``{tablename: highest ind}`` of the applied rows, updated here.
+
+        Returns
+        -------
+        bool
+            ``True`` on success, ``False`` otherwise.
+
+        Notes
+        -----
+        - Rows are applied only when their ``tid`` is newer than the local one.
+        - ``cvalues`` are converted by the table codec (see
+          :class:`codec_nios4`) straight into parameter tuples.
+        - New rows are grouped by table and column set into multi-row
+          ``INSERT`` statements (defaults fill the missing columns); existing
+          rows, with the same full column set, into multi-row
+          ``INSERT ... ON DUPLICATE KEY UPDATE`` of the received columns only
+          (``UPDATE ... WHERE gguid=%s`` per row if ``gguid`` is not a unique
+          key); deletes into ``DELETE ... WHERE gguid IN (...)``.
+        - A GUID seen twice flushes the pending groups first, so commands
+          on the same row keep the packet order.
+        """
+        inserts: Dict[Tuple[str, Tuple[str, ...]], List[Tuple[Any, ...]]] = {}
+        updates: Dict[Tuple[str, Tuple[str, ...], Tuple[str, ...]], List[Tuple[Any, ...]]] = {}
+        deletes: Dict[str, List[str]] = {}
+        pending = set()
+        #tablename -> (default columns, column positions, default values)
+        layouts: Dict[str, Tuple[Tuple[str, ...], Dict[str, int], List[Any]]] = {}
+        tid = self.__tid_local if useNTID else self.__tid_remote
+
+        for row in rows:
+            tablename = row["tablename"]
+            if tablename not in tables:
+                continue
+            tc = tables[tablename]
+
+            key = (tablename, row["gguid"])
+            if key in pending:
+                if self.__flush_bulk(inserts,updates,deletes) == False:
+                    return False
+                pending.clear()
+
+            if row["command"]  == "insert":
+                if tc is None:
+                    continue
+                isnew = row["gguid"] not in tc
+                if isnew:
+                    tc[row["gguid"]] = 0
+
+                names: Tuple[str, ...] = ()
+                params: Tuple[Any, ...] = ()
+                if tc[row["gguid"]] < row["tid"]:
+                    cvalues = row["cvalues"]
+                    if type(cvalues) is str:
+                        cvalues = json_nios4.loads(cvalues)
+                    names, params = session.codec(tablename,fieldforbidden,tid).encode(cvalues,maxind)
+                elif not isnew:
+                    continue
+
+                if not isnew and len(names) == 0:
+                    continue
+                if tablename not in layouts:
+                    tdefaults = self.__db.newrow_defaults(tablename)
+                    if tdefaults is None:
+                        return False
+                    dcolumns = tuple(tdefaults.keys())
+                    layouts[tablename] = (dcolumns, {c: i for i, c in enumerate(dcolumns)}, list(tdefaults.values()))
+                dcolumns, positions, full = layouts[tablename]
+                full = list(full)
+                extra: List[str] = []
+                for c, v in zip(names, params):
+                    i = positions.get(c)
+                    if i is None:
+                        extra.append(c)
+                        full.append(v)
+                    else:
+                        full[i] = v
+                columns = ("gguid",) + dcolumns + tuple(extra)
+                if isnew:
+                    inserts.setdefault((tablename, columns), []).append((row["gguid"],) + tuple(full))
+                else:
+                    #defaults only matter if the row vanished: the received columns are updated
+                    updates.setdefault((tablename, columns, names), []).append((row["gguid"],) + tuple(full))
+                pending.add(key)
+
+            if row["command"]  == "delete":
+                deletes.setdefault(tablename, []).append(row["gguid"])
+                if tc is not None:
+                    tc.pop(row["gguid"], None)
+                pending.add(key)
+
+        return self.__flush_bulk(inserts,updates,deletes)
+    #----------------------------------------------------------------------------------------------
+    def __flush_bulk(self,inserts:Dict[Tuple[str, Tuple[str, ...]], List[Tuple[Any, ...]]],updates:Dict[Tuple[str, Tuple[str, ...], Tuple[str, ...]], List[Tuple[Any, ...]]],deletes:Dict[str, List[str]]) -> bool:
+        """
+        Write the groups collected by :meth:`__bulk_apply` and empty them.
+
+        Returns
+        -------
+        bool
+            ``True`` on success, ``False`` otherwise.
+        """
+        for tablename in deletes:
+            if self.viewmessage == True:
+                print(self.stime() +  "     delete " + str(len(deletes[tablename])) + " rows ("+tablename+")")
+            if self.__db.deletemany(tablename,deletes[tablename]) == False:
+                return False
+
+        for (tablename, columns) in inserts:
+            params = inserts[(tablename, columns)]
+            if self.viewmessage == True:
+                print(self.stime() +  "     add " + str(len(params)) + " new rows ("+tablename+")")
+            if self.__db.insertmany(tablename,columns,params) == False:
+                return False
 
+        for (tablename, columns, names) in updates:
+            params = updates[(tablename, columns, names)]
+            if self.viewmessage == True:
+                print(self.stime() +  "     update " + str(len(params)) + " rows ("+tablename+")")
+            gguidkey = self.__db.catalog().column(tablename,"gguid")
+            if gguidkey is not None and gguidkey[4] in ("PRI","UNI"):
+                if self.__db.insertmany(tablename,columns,params,update=names) == False:
+                    return False
+            else:
+                #no unique key on gguid: an upsert would duplicate rows
+                slots = [columns.index(c) for c in names]
+                sqlstring = "UPDATE " + tablename + " SET " + ",".join(c + "=%s" for c in names) + " WHERE gguid=%s"
+                if self.__db.executemany(sqlstring,[tuple(p[i] for i in slots) + (p[0],) for p in params]) == False:
+                    return False
+
+        inserts.clear()
+        updates.clear()
+        deletes.clear()
         return True
     #----------------------------------------------------------------------------------------------
+    def __tid_remote(self,value:Any) -> str:
+        """Stored ``tid`` of a received row: the remote one."""
+        return self.__utility.float_to_str(self,value)
+    #----------------------------------------------------------------------------------------------
+    def __tid_local(self,value:Any) -> str:
+        """Stored ``tid`` of a received row with ``useNTID``: a new local one."""
+        return self.__utility.float_to_str(self,self.__utility.tid(self) + 10)
+    #----------------------------------------------------------------------------------------------
     def stime(self) -> str:
         """
         Current local time as a formatted string.
@@ -1182,6 +1619,353 @@ class sync_nios4:
         """        
         return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     #----------------------------------------------------------------------------------------------
+    def __plan_syncbox(self) -> Optional[Dict[str, set]]:
+        """
+        Group the rows queued in ``lo_syncbox`` by table.
+
+        Returns
+        -------
+        dict or None
+            ``{tablename: {gguidrif, ...}}`` (duplicates collapsed), or
+            ``None`` on error.
+        """
+        records = self.__db.getsql("SELECT tablename,gguidrif FROM lo_syncbox")
+        if records == None:
+            self.err.errorcode = self.__db.err.errorcode
+            self.err.errormessage = self.__db.err.errormessage
+            return None
+        plan: Dict[str, set] = {}
+        for r in records:
+            plan.setdefault(r[0], set()).add(r[1])
+        return plan
+    #----------------------------------------------------------------------------------------------
+    def __packetizer(self) -> packet_nios4:
+        """Packet sizer configured from :attr:`nrow_sync` and the packet settings."""
+        return packet_nios4(self.nrow_sync,self.nrow_sync_min,self.nrow_sync_max,self.packet_maxbytes,self.packet_seconds,self.adaptive_packets)
+    #----------------------------------------------------------------------------------------------
+    def __upload_packet(self,rows:List[Dict[str, Any]],estimated:int,packer:packet_nios4,dbname:str,TID:Number) -> Optional[Dict[str, Any]]:
+        """
+        Upload one packet and adapt the packet size to the round-trip.
+
+        Returns
+        -------
+        dict or None
+            The JSON response, or ``None`` on error.
+        """
+        start = time.perf_counter()
+        values = self.upload_datablock({"sync_box": rows},dbname,TID,True)
+        if values == None:
+            return None
+        elapsed = time.perf_counter() - start
+        nrows = packer.observe(len(rows),self.__http.lastpacket.get("sent",estimated),elapsed)
+        if self.viewmessage == True:
+            print(self.stime() + "     sent packet " + str(len(rows)) + " rows in " + str(round(elapsed,2)) + "s, next " + str(nrows) + " rows")
+        return values
+    #----------------------------------------------------------------------------------------------
+    def __push_rows(self,dbname:str,TID:Number,cleanbox:List[Tuple[Any, ...]],tableswdata:List[str],syncbox:Dict[str, set],
+                    captured:Optional[Dict[str, set]],session:session_nios4) -> Optional[Tuple[List[Dict[str, Any]], Number]]:
+        """
+        Send the cleanbox deletes and the changed rows, except the first rows.
+
+        Three stages run concurrently, joined by bounded queues: a thread
+        reads the rows from the DB (pages of :attr:`extract_pagesize`
+        rows), a thread converts them to ``sync_box`` objects and cuts the
+        packets, and the calling thread uploads them on up to
+        :attr:`upload_workers` threads. At most :attr:`push_buffer` packets
+        wait for upload; a stage blocks when the next one is behind.
+        With more than one upload worker packets may reach the server out
+        of order.
+
+        Parameters
+        ----------
+        dbname : str
+            Remote database identifier.
+        TID : int or float
+            Lower bound for synchronization.
+        cleanbox : list of tuple
+            ``(gguidrif, tid, tablename)`` rows to delete.
+        tableswdata : list of str
+            Tables with rows to send.
+        syncbox : dict
+            ``{tablename: {gguid, ...}}`` rows queued in ``lo_syncbox``.
+        captured : dict or None
+            ``{tablename: {gguid, ...}}`` rows from the change log, or
+            ``None`` to select them by ``tid``.
+        session : session_nios4
+            Session providing the row serializers.
+
+        Returns
+        -------
+        tuple or None
+            ``(firstrows, tid_sync)``: the first rows, kept for the final
+            ``partial_send=0`` packet, and the highest ``tid_sync`` returned;
+            ``None`` on error (see :attr:`err`).
+        """
+        packer = self.__packetizer()
+        rowsqueue: "queue.Queue[Any]" = queue.Queue(maxsize=4)
+        packetqueue: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, self.push_buffer))
+        stop = threading.Event()
+        failed: List[str] = []
+        firstrows: List[Dict[str, Any]] = []
+
+        def put(q: "queue.Queue[Any]", item: Any) -> bool:
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def get(q: "queue.Queue[Any]") -> Any:
+            while not stop.is_set():
+                try:
+                    return q.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            return _END
+
+        def extract() -> None:
+            try:
+                for tablename in tableswdata:
+                    serializer = session.serializer(tablename)
+                    if serializer == None:
+                        failed.append("extract")
+                        return
+
+                    #rows queued in lo_syncbox are sent once, read by GUID after the changed rows
+                    queued = syncbox.get(tablename, set())
+                    lower = [c.lower() for c in serializer.columns]
+                    gguidpos = lower.index("gguid") if "gguid" in lower else 0
+
+                    if captured != None:
+                        #logged rows, read by GUID
+                        changes = self.__db.iter_gguids(tablename,sorted(captured.get(str(tablename).lower(), set()) - queued))
+                    else:
+                        #keyset pages: only a few pages and packets stay in memory
+                        changes = self.__db.iter_changes(tablename,TID,self.extract_pagesize)
+                    queuedrows = self.__db.iter_gguids(tablename,sorted(queued))
+                    if changes == None or queuedrows == None:
+                        failed.append("extract")
+                        return
+
+                    batch: List[Any] = []
+                    for r in itertools.chain((r for r in changes if r[gguidpos] not in queued), queuedrows):
+                        batch.append(r)
+                        if len(batch) >= self.extract_pagesize:
+                            if not put(rowsqueue, (serializer, batch)):
+                                return
+                            batch = []
+                    if len(batch) > 0 and not put(rowsqueue, (serializer, batch)):
+                        return
+            except RuntimeError:
+                #a later page could not be read (error in db.err)
+                failed.append("extract")
+            except Exception as e:
+                self.err.errorcode = "E002"
+                self.err.errormessage = "Row extraction failed: " + str(e)
+                failed.append("extract")
+            finally:
+                put(rowsqueue, _END)
+
+        def serialize() -> None:
+            try:
+                for r in cleanbox:
+                    o = {"gguid": r[0], "tid": r[1], "arc": 0, "ut": "", "uta": "", "client": "0", "tablename": r[2], "command": "delete"}
+                    if packer.add(o) and not put(packetqueue, (packer.size(), packer.take())):
+                        return
+                while True:
+                    item = get(rowsqueue)
+                    if item is _END:
+                        break
+                    serializer, batch = item
+                    for r in batch:
+                        o = serializer.row(r)
+                        if len(firstrows) < 10:
+                            firstrows.append(o)
+                        elif packer.add(o) and not put(packetqueue, (packer.size(), packer.take())):
+                            return
+                if len(packer) > 0:
+                    put(packetqueue, (packer.size(), packer.take()))
+            except Exception as e:
+                self.err.errorcode = "E023"
+                self.err.errormessage = "Row serialization failed: " + str(e)
+                failed.append("serialize")
+            finally:
+                put(packetqueue, _END)
+
+        stages = [threading.Thread(target=extract, name="nios4-extract", daemon=True),
+                  threading.Thread(target=serialize, name="nios4-serialize", daemon=True)]
+        for t in stages:
+            t.start()
+
+        TID_index: Number = 0
+        inflight: Deque[Future] = deque()
+        executor = ThreadPoolExecutor(max_workers=max(1, self.upload_workers), thread_name_prefix="nios4-upload")
+        try:
+            while True:
+                item = get(packetqueue)
+                if len(failed) > 0:
+                    return None
+                if item is _END:
+                    break
+                estimated, rows = item
+                while len(inflight) >= max(1, self.upload_workers) or (len(inflight) > 0 and inflight[0].done()):
+                    values = inflight.popleft().result()
+                    if values == None:
+                        return None
+                    if TID_index <= values["tid_sync"]:
+                        TID_index = values["tid_sync"]
+                inflight.append(executor.submit(self.__upload_packet, rows, estimated, packer, dbname, TID))
+            while len(inflight) > 0:
+                values = inflight.popleft().result()
+                if values == None:
+                    return None
+                if TID_index <= values["tid_sync"]:
+                    TID_index = values["tid_sync"]
+        finally:
+            stop.set()
+            for t in stages:
+                t.join()
+            executor.shutdown(wait=True)
+
+        if len(failed) > 0:
+            return None
+        return firstrows, TID_index
+    #----------------------------------------------------------------------------------------------
+    def __fetch_page(self,dbname:str,TID:Number,count:int,pagesize:int) -> Tuple[Optional[Dict[str, Any]], error_n4, Dict[str, float]]:
+        """
+        Download one partial page (worker thread).
+
+        Returns the payload, its error and its ``{"seconds", "bytes"}``;
+        with :attr:`download_stream` the rows go on being received in the
+        background (see :meth:`__prefetch_rows`) and the sizes are
+        completed once they are all received.
+        """
+        err = error_n4("","")
+        start = time.perf_counter()
+        values = self.download_datablock(dbname,TID,count,pagesize,err,self.download_stream)
+        measure = {"seconds": time.perf_counter() - start, "bytes": self.__http.lastpacket.get("received",0)}
+        if values != None:
+            self.__prefetch_rows(values,err,measure)
+        return values, err, measure
+    #----------------------------------------------------------------------------------------------
+    def __prefetch_rows(self,values:Dict[str, Any],err:error_n4,measure:Optional[Dict[str, float]]=None) -> None:
+        """
+        Keep receiving the rows of a streamed payload in the background.
+
+        ``values["sync_box"]`` is replaced by an iterator fed by a thread
+        that decodes up to two batches of :attr:`nrow_stream` rows ahead,
+        so the transfer goes on while the previous rows are applied and
+        memory stays bounded. Errors are copied to :attr:`err` when they
+        reach the consumer. Once the rows are received, the time spent
+        receiving them (not the waits for the consumer) is added to
+        ``measure["seconds"]`` and the received size is stored in
+        ``measure["bytes"]``. Nothing is done if the rows were already
+        received (``sync_box`` missing or a list).
+        """
+        rows = values.get("sync_box")
+        if rows == None or type(rows) is list:
+            return
+
+        def batches() -> Iterator[List[Dict[str, Any]]]:
+            elapsed = 0.0
+            start = time.perf_counter()
+            for batch in self.__batches(rows,max(self.nrow_stream, 1)):
+                elapsed += time.perf_counter() - start
+                #the queue may be full: waiting for the consumer is not counted
+                yield batch
+                start = time.perf_counter()
+            elapsed += time.perf_counter() - start
+            if measure is not None:
+                measure["seconds"] += elapsed
+                measure["bytes"] = self.__http.lastpacket.get("received",0)
+
+        received = _background(batches(),2)
+
+        def consume() -> Iterator[Dict[str, Any]]:
+            try:
+                for batch in received:
+                    yield from batch
+            except RuntimeError:
+                self.err.errorcode = err.errorcode
+                self.err.errormessage = err.errormessage
+                raise
+            finally:
+                received.close()
+
+        values["sync_box"] = consume()
+    #----------------------------------------------------------------------------------------------
+    def __download_pages(self,dbname:str,TID:Number,count:int,receiver:packet_nios4) -> Iterator[Optional[Dict[str, Any]]]:
+        """
+        Download the partial pages from an offset, in order.
+
+        Up to :attr:`download_buffer` pages are requested ahead on
+        :attr:`download_workers` threads, each at the offset following the
+        previous one by the size it asked for; a new page is requested only
+        when the caller takes one, so at most ``download_buffer`` pages are
+        held in memory (with :attr:`download_stream`, a few batches of rows
+        of each). Pages are yielded strictly in offset order up to the first
+        one without ``partial`` (streamed rows must be consumed first); once
+        a page ahead is received without ``partial`` (or fails) no page is
+        requested past it, and the ones already requested after it are
+        cancelled if not running yet, or dropped.
+
+        Parameters
+        ----------
+        dbname : str
+            Remote database identifier.
+        TID : int or float
+            Lower bound for synchronization.
+        count : int
+            Offset of the first page.
+        receiver : packet_nios4
+            Sizer of the pages (adapted to every page received).
+
+        Yields
+        ------
+        dict or None
+            Page payloads; ``None`` (then stops) on error, see :attr:`err`.
+        """
+        pending: Deque[Tuple[int, int, Future]] = deque()
+        executor = ThreadPoolExecutor(max_workers=max(1, self.download_workers), thread_name_prefix="nios4-download")
+        #True once a page requested is known to be the last one
+        last = False
+        try:
+            while True:
+                if not last:
+                    for i in range(len(pending)):
+                        if not pending[i][2].done():
+                            continue
+                        values = pending[i][2].result()[0]
+                        if values == None or ("partial" in values and values["partial"] != True):
+                            last = True
+                            while len(pending) > i + 1:
+                                pending.pop()[2].cancel()
+                            break
+                while not last and len(pending) < max(1, self.download_buffer):
+                    pagesize = receiver.rows
+                    pending.append((count, pagesize, executor.submit(self.__fetch_page, dbname, TID, count, pagesize)))
+                    count = count + pagesize
+
+                offset, pagesize, future = pending.popleft()
+                values, err, measure = future.result()
+                if values == None:
+                    self.err.errorcode = err.errorcode
+                    self.err.errormessage = err.errormessage
+                    yield None
+                    return
+                if self.viewmessage == True:
+                    print(self.stime() + "     received partial packet (" + str(offset) + " + " + str(pagesize) + " rows)")
+                yield values
+                receiver.observe(pagesize, measure["bytes"], measure["seconds"])
+                if values.get("partial") != True:
+                    return
+        finally:
+            for _, _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+    #----------------------------------------------------------------------------------------------
     def syncro(self, dbname: str, start_tid: Optional[int] = None) -> bool:
         """
         Perform a full synchronization round.
@@ -1208,7 +1992,7 @@ class sync_nios4:
         6. Receive and apply partials if requested.
         7. Clear local sync queues and persist the new ``tidsync``.
         """
-        if self.__token == "":
+        if not self.__ensure_login():
             self.err.errorcode = "E019"
             self.err.errormessage = "Please login first to synchronize"
             return False                
@@ -1230,6 +2014,9 @@ class sync_nios4:
 
         TID_start = self.__utility.tid(self)
 
+        #metadata shared by the upload and by every downloaded packet
+        session = session_nios4(self.__db)
+
         TID = TID_db
 
         if self.viewmessage == True:
@@ -1274,42 +2061,30 @@ class sync_nios4:
             return False
 
         finaldata.clear()
-        partialdata = []
-        TID_index =0
         #-----------------------------------------------------------------------------
-        #send cleanbox
+        #cleanbox
         #-----------------------------------------------------------------------------
-        if self.viewmessage == True:
-            print(self.stime() +  "     SEND CLEANBOX")
-
-        records = self.__db.getsql("SELECT gguidrif,tid,tablename FROM lo_cleanbox ORDER BY tid")
-        if records == None:
+        #one delete per (tablename, gguidrif), with the latest tid
+        cleanbox = self.__db.getsql("SELECT gguidrif,MAX(tid) AS tid,tablename FROM lo_cleanbox GROUP BY tablename,gguidrif ORDER BY tid")
+        if cleanbox == None:
             return False
-        for r in records:
-            o={}
-            o["gguid"] = r[0]
-            o["tid"] = r[1]
-            o["arc"] = 0
-            o["ut"] = ""
-            o["uta"] = ""
-            o["client"] = "0"
-            o["tablename"] = r[2]
-            o["command"] = "delete"
-            partialdata.append(o)
-            if len(partialdata) >= self.nrow_sync:
-                finaldata["sync_box"] = partialdata
-                values = self.upload_datablock(finaldata,dbname,TID,True)
-                if values == None:
-                    return False
-                if TID_index <= values["tid_sync"]:
-                    TID_index = values["tid_sync"]
-                partialdata = list()
-                finaldata.clear()
-
         #-----------------------------------------------------------------------------
         #extract data tables to send
         #-----------------------------------------------------------------------------
-        table_syncbox = self.__db.getsql("SELECT tablename,gguidrif FROM lo_syncbox")
+        syncbox = self.__plan_syncbox()
+        if syncbox == None:
+            return False
+
+        #with change capture the changed rows come from lo_changelog, not from table scans
+        captured = None
+        if self.__db.capture().enabled():
+            if self.__db.capture().ensure() == False:
+                self.err.errorcode = self.__db.err.errorcode
+                self.err.errormessage = self.__db.err.errormessage
+                return False
+            captured = self.__db.capture().changes(TID)
+            if captured == None:
+                return False
 
         tables = []
         records = self.__db.getsql("SELECT tablename FROM so_tables where eli=0  ORDER BY ind")
@@ -1327,97 +2102,28 @@ class sync_nios4:
                     vtable = False
 
             if vtable == True:
-                records = self.__db.getsql("SELECT COUNT(gguid) as conta FROM " + t + " WHERE tid >=" + self.__utility.float_to_str(self,TID))
-                if records == None:
+                if captured != None:
+                    changed = str(t).lower() in captured
+                else:
+                    changed = self.__db.has_changes(t,TID)
+                if changed == None:
                     return False
-                for r in records:
-                    if r[0] > 0 and not t in tableswdata:
-                        tableswdata.append(t)
+                if changed == True and not t in tableswdata:
+                    tableswdata.append(t)
 
-        for rsyncbox in table_syncbox:
-            if rsyncbox[0] not in tableswdata and rsyncbox[0] !="":
-                tableswdata.append(rsyncbox[0])
+        for t in syncbox:
+            if t not in tableswdata and t !="":
+                tableswdata.append(t)
         #-----------------------------------------------------------------------------
-        #send split data
+        #send cleanbox and split data
         #-----------------------------------------------------------------------------
-        firstrows = []
-        finaldata.clear()
-
-        for tablename in tableswdata:
-            records = self.__db.getsql("SELECT * FROM " + tablename + " where tid >=" + self.__utility.float_to_str(self,TID) + "  ORDER BY ind")
-            if records == None:
-                return False
-            
-            columns = self.__db.get_columnsname(tablename)
-            if columns == None:
-                return False
-            
-            for r in records:
-                votorecord = True
-                for rsyncbox in table_syncbox:
-                    if rsyncbox[0] == tablename and rsyncbox[1] == r[0]:
-                        votorecord = False
-                        break
-                if votorecord == True:
-                    o = self.extract_syncrow(tablename,r,columns)
-                    if o == None:
-                        return False
-                    if len(firstrows) < 10:
-                        firstrows.append(o)
-                    else:
-                        partialdata.append(o)
-
-                    if len(partialdata) >= self.nrow_sync:
-                        finaldata["sync_box"] = partialdata
-                        if self.viewmessage == True:
-                            print("send packet")
-                        values = self.upload_datablock(finaldata,dbname,TID,True)
-                        if values == None:
-                            return False
-                        if TID_index <= values["tid_sync"]:
-                            TID_index = values["tid_sync"]
-                        partialdata = list()
-                        finaldata.clear()
-
-            for rsyncbox in table_syncbox:
-                if rsyncbox[0] == tablename:
-                    records = self.__db.getsql(f"SELECT * FROM {tablename} where gguid='{rsyncbox[1]}'")
-                    for r in records:
-                        o = self.extract_syncrow(tablename,r,columns)
-                        if o == None:
-                            return False
-                        if len(firstrows) < 10:
-                            firstrows.append(o)
-                        else:
-                            partialdata.append(o)
+        if self.viewmessage == True:
+            print(self.stime() +  "     SEND CLEANBOX AND DATA")
 
-                        if len(partialdata) >= self.nrow_sync:
-                            finaldata["sync_box"] = partialdata
-                            if self.viewmessage == True:
-                                print("send packet")
-                            values = self.upload_datablock(finaldata,dbname,TID,True)
-                            if values == None:
-                                return False
-                            if TID_index <= values["tid_sync"]:
-                                TID_index = values["tid_sync"]
-                            partialdata = list()
-                            finaldata.clear()
-
-        #send last block
-        if len(partialdata) > 0:
-            finaldata.clear()
-            finaldata["sync_box"] = partialdata
-            
-            if self.viewmessage == True:
-                print(self.stime() +  "     send last packet")
-            
-            values = self.upload_datablock(finaldata,dbname,TID,True)
-            if values == None:
-                return False
-            if TID_index <= values["tid_sync"]:
-                TID_index = values["tid_sync"]
-            partialdata = list()
-            finaldata.clear()
+        pushed = self.__push_rows(dbname,TID,cleanbox,tableswdata,syncbox,captured,session)
+        if pushed == None:
+            return False
+        firstrows, TID_index = pushed
 
         #-----------------------------------------------------------------------------
         #Send first row
@@ -1425,55 +2131,54 @@ class sync_nios4:
         print(self.stime() +  "     START SYNCBOX")
         finaldata.clear()
         finaldata["sync_box"] = firstrows
-        values = self.upload_datablock(finaldata,dbname,TID,False)
+        #download packets: every page asks for the current size and the next
+        #partial_from moves by the size actually requested
+        receiver = self.__packetizer()
+        pagesize = receiver.rows
+        start = time.perf_counter()
+        values = self.upload_datablock(finaldata,dbname,TID,False,pagesize,self.download_stream)
         if values == None:
             return False
+        measure = {"seconds": time.perf_counter() - start, "bytes": self.__http.lastpacket.get("received",0)}
+        #rows decoded while they arrive; tid_sync and partial may follow them
+        self.__prefetch_rows(values,self.err,measure)
+
+        print(self.stime() +  "     install first packet")
+
+        if self.install_data(False,values,values.get("partial") != True,False,False,session) == False:
+            return False
+        receiver.observe(pagesize,measure["bytes"],measure["seconds"])
 
         if  TID_db <= values["tid_sync"]:
             TID_db = values["tid_sync"]
 
-        gfile = True
         ipartial = False
         if "partial" in values:
             if values["partial"] == True:
-                gfile = False
                 ipartial = True
 
-        print(self.stime() +  "     install first packet")
-
-        if self.install_data(False,values,gfile,False,False) == False:
-            return False
-
         if ipartial == True:
-            vcontinute = True
-            count = self.nrow_sync
-            while vcontinute == True:
-
-                print(self.stime() +  "     receive partial packet")
-                
-                values = self.download_datablock(dbname,TID,count)
+            #next pages are downloaded while the current one is installed
+            print(self.stime() +  "     receive partial packets")
+            for values in self.__download_pages(dbname,TID,pagesize,receiver):
                 if values == None:
                     return False
-                if TID_db <= values["tid_sync"]:
-                    TID_db = values["tid_sync"]
-                gfile = True
-                vcontinute = False
-                if "partial" in values:
-                    if values["partial"] == True:
-                        gfile = False
-                        vcontinute = True
-                        count = count + self.nrow_sync
 
                 if self.viewmessage == True:
                     print(self.stime() +  "     install partial packet")
 
-                if self.install_data(False,values,gfile,False,False) == False:
+                if self.install_data(False,values,values.get("partial") != True,False,False,session) == False:
                     return False
+                if TID_db <= values["tid_sync"]:
+                    TID_db = values["tid_sync"]
 
         self.__db.setsql("DELETE FROM lo_cleanbox")
         self.__db.setsql("DELETE FROM lo_syncbox")
 
         self.__db.setsql("UPDATE lo_setting SET tidsync=" + str(TID_db) + " WHERE gguid='0'")
+        if captured != None:
+            #entries below the new tidsync will never be read again
+            self.__db.capture().purge(TID_db)
 
         #-----------------------------------------------------------------------------
         #end
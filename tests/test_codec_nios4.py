@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#================================================================================
+#Copyright of Davide Sbreviglieri 2024
+#THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE
+#================================================================================
+#TEST CODEC NIOS4
+#================================================================================
+import unittest
+
+from codec_nios4 import codec_nios4
+
+FIELDS = {"items|gguid": (0, 0), "items|tid": (0, 3), "items|ind": (0, 4), "items|description": (0, 0),
+          "items|price": (0, 5), "items|date": (0, 18), "items|read_b": (0, 4), "items|sub": (0, 11),
+          "other|description": (0, 0)}
+FIELDFORBIDDEN = {"read": "read_b", "usercloud": "usercloud_b", "repeat": "repeat_b"}
+#================================================================================
+class test_codec_nios4(unittest.TestCase):
+
+    def setUp(self):
+        self.codec = codec_nios4("items", FIELDS, FIELDFORBIDDEN, lambda value: "T" + str(value))
+    #--------------------------------------------------------------------------------------
+    def test_columns_of_the_table_only(self):
+        self.assertEqual(sorted(self.codec.columns), ["date", "description", "ind", "price", "read_b", "tid"])
+    #--------------------------------------------------------------------------------------
+    def test_encode_converts_values(self):
+        names, params = self.codec.encode({"gguid": "g1", "tid": 20240102030405, "description": "l'articolo",
+                                           "price": "1,5", "date": 20240102030405, "ind": 7})
+        self.assertEqual(dict(zip(names, params)), {"tid": "T20240102030405", "description": "l`articolo",
+                                                    "price": "1.5", "date": "2024-01-02 03:04:05", "ind": "7"})
+        self.assertEqual(list(names), [c for c in self.codec.columns if c in names])
+    #--------------------------------------------------------------------------------------
+    def test_encode_skips_null_unknown_and_invalid(self):
+        names, params = self.codec.encode({"description": None, "missing": 1, "sub": "x", "date": 0, "price": 2})
+        self.assertEqual((names, params), (("price",), ("2",)))
+        names, _ = self.codec.encode({"date": "null"})
+        self.assertEqual(names, ())
+    #--------------------------------------------------------------------------------------
+    def test_encode_renamed_and_uppercase_fields(self):
+        codec = codec_nios4("items", {"items|read": (0, 4)}, FIELDFORBIDDEN, str)
+        self.assertEqual(codec.encode({"READ": 1}), (("read_b",), ("1",)))
+    #--------------------------------------------------------------------------------------
+    def test_encode_tracks_highest_ind(self):
+        maxind = {}
+        self.codec.encode({"ind": 4}, maxind)
+        self.codec.encode({"ind": "12"}, maxind)
+        self.codec.encode({"ind": 3}, maxind)
+        self.assertEqual(maxind, {"items": 12})
+#================================================================================
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#================================================================================
+#Copyright of Davide Sbreviglieri 2024
+#THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE
+#================================================================================
+#TEST DATABASE NIOS4
+#================================================================================
+import sys
+import threading
+import types
+import unittest
+from unittest import mock
+
+from database_nios4 import database_nios4
+from pool_nios4 import pool_nios4
+from utility_nios4 import error_n4
+#================================================================================
+class _error(Exception):
+    """``mysql.connector.Error`` of the fake connector."""
+    def __init__(self, errno, msg=""):
+        super().__init__(msg or "error %d" % errno)
+        self.errno = errno
+#================================================================================
+class _connection:
+    def __init__(self, log):
+        self.log = log
+
+    def cursor(self, *args, **kwargs):
+        return self
+
+    def execute(self, sql, *args):
+        self.log.append(sql)
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        pass
+#================================================================================
+def _connector(errno, log):
+    """Fake ``mysql.connector``: connections to the database fail with ``errno``."""
+    connector = types.ModuleType("mysql.connector")
+    connector.Error = _error
+
+    def connect(**kwargs):
+        if "database" in kwargs and errno is not None:
+            raise _error(errno)
+        return _connection(log)
+
+    connector.connect = connect
+    package = types.ModuleType("mysql")
+    package.connector = connector
+    return {"mysql": package, "mysql.connector": connector}
+#================================================================================
+class _database(database_nios4):
+    """Database whose bootstrap is only recorded."""
+    def initializedb(self):
+        self.initialized = True
+#================================================================================
+class test_database_nios4(unittest.TestCase):
+
+    def open(self, errno):
+        log = []
+        with mock.patch.dict(sys.modules, _connector(errno, log)), mock.patch("builtins.print"):
+            db = _database("user", "pwd", "nios4db", "localhost", "root", "secret")
+        return db, log
+    #--------------------------------------------------------------------------------------
+    def test_existing_database(self):
+        db, log = self.open(None)
+        self.assertFalse(db.err.error)
+        self.assertTrue(getattr(db, "initialized", False))
+        self.assertEqual(log, [])
+    #--------------------------------------------------------------------------------------
+    def test_missing_database_is_created(self):
+        db, log = self.open(1049)
+        self.assertFalse(db.err.error)
+        self.assertTrue(getattr(db, "initialized", False))
+        self.assertEqual(len(log), 1)
+        self.assertTrue(log[0].startswith("CREATE DATABASE IF NOT EXISTS nios4db"))
+    #--------------------------------------------------------------------------------------
+    def test_other_errors_are_reported(self):
+        for errno in (1045, 2003, 1040):
+            db, log = self.open(errno)
+            self.assertTrue(db.err.error)
+            self.assertEqual(db.err.errorcode, "E001")
+            self.assertIn(str(errno), db.err.errormessage)
+            self.assertFalse(getattr(db, "initialized", False))
+            self.assertEqual(log, [])
+#================================================================================
+class test_gguid_lookup(unittest.TestCase):
+
+    def setUp(self):
+        self.db = object.__new__(database_nios4)
+        self.db.gguid_lookup_chunk = 8
+        self.statements = []
+        self.db.getsql_params = self.getsql_params
+
+    def getsql_params(self, sql, params):
+        self.statements.append(sql)
+        return [(g, 1.0) for g in dict.fromkeys(params)]
+    #--------------------------------------------------------------------------------------
+    def test_statement_texts_are_reused(self):
+        for n in range(1, 20):
+            gguids = ["g%d" % i for i in range(n)]
+            self.assertEqual(self.db._database_nios4__lookup_gguid("items", gguids), dict.fromkeys(gguids, 1.0))
+        sizes = set(sql.count("%s") for sql in self.statements)
+        self.assertEqual(sizes, {1, 2, 4, 8})
+    #--------------------------------------------------------------------------------------
+    def test_iter_gguids_uses_the_same_sizes(self):
+        rows = list(self.db.iter_gguids("items", ["g%d" % i for i in range(11)], chunk=8))
+        self.assertEqual(len(rows), 11)
+        self.assertEqual([sql.count("%s") for sql in self.statements], [8, 4])
+#================================================================================
+class _alterconnection:
+    """Connection failing each ``ALTER TABLE`` with the next errno of ``errors`` (``None`` = success)."""
+    def __init__(self, errors, log):
+        self.errors = errors
+        self.log = log
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql):
+        self.log.append(sql)
+        errno = self.errors.pop(0) if self.errors else None
+        if errno is not None:
+            raise _error(errno)
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        pass
+#================================================================================
+class _catalog:
+    def invalidate(self, *args):
+        pass
+#================================================================================
+class test_add_columns(unittest.TestCase):
+
+    def add(self, errors):
+        log = []
+        db = object.__new__(database_nios4)
+        db.err = error_n4("", "")
+        db._database_nios4__local = threading.local()
+        db._database_nios4__catalog = _catalog()
+        db._database_nios4__pool = pool_nios4(lambda: _alterconnection(errors, log))
+        with mock.patch("builtins.print"):
+            result = db.add_columns("items", ["a INTEGER", "b TEXT"])
+        return result, db.err, [sql.rpartition("ALGORITHM=")[2] if "ALGORITHM" in sql else "" for sql in log]
+    #--------------------------------------------------------------------------------------
+    def test_instant(self):
+        result, err, algorithms = self.add([])
+        self.assertTrue(result)
+        self.assertEqual(algorithms, ["INSTANT"])
+    #--------------------------------------------------------------------------------------
+    def test_falls_back_when_the_algorithm_is_refused(self):
+        self.assertEqual(self.add([1845])[2], ["INSTANT", "INPLACE"])
+        self.assertEqual(self.add([1800, 1846])[2], ["INSTANT", "INPLACE", ""])
+        self.assertEqual(self.add([1064])[2], ["INSTANT", "INPLACE"])
+    #--------------------------------------------------------------------------------------
+    def test_other_errors_are_reported_at_once(self):
+        for errors in ([1060], [1845, 1205], [1845, 1064]):
+            result, err, algorithms = self.add(list(errors))
+            self.assertFalse(result)
+            self.assertEqual(len(algorithms), len(errors))
+            self.assertEqual(err.errorcode, "E004")
+            self.assertIn(str(errors[-1]), err.errormessage)
+#================================================================================
+if __name__ == "__main__":
+    unittest.main()
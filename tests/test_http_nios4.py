@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#================================================================================
+#Copyright of Davide Sbreviglieri 2024
+#THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE
+#================================================================================
+#TEST HTTP NIOS4
+#================================================================================
+import gzip
+import json
+import threading
+import unittest
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from http_nios4 import http_nios4, iterjson, iterobject
+
+try:
+    import requests
+except ImportError:
+    requests = None
+#================================================================================
+def _split(data, size):
+    """``data`` in chunks of ``size`` bytes (multi-byte characters cut in two)."""
+    return [data[i:i + size] for i in range(0, len(data), size)]
+#================================================================================
+class test_iterjson(unittest.TestCase):
+
+    def test_same_text_as_json(self):
+        value = {"sync_box": [{"cvalues": json.dumps({"a": "è"}, ensure_ascii=False), "tid": i} for i in range(200)],
+                 "empty": [], "tid_sync": 1.5, "nested": {"a": [1, 2]}, "text": "perché"}
+        for chunksize in (1, 100, 65536):
+            chunks = list(iterjson(value, chunksize))
+            self.assertEqual(b"".join(chunks), json.dumps(value).encode("utf-8"))
+        self.assertGreater(len(list(iterjson(value, 100))), 10)
+    #--------------------------------------------------------------------------------------
+    def test_empty_object_and_nan(self):
+        self.assertEqual(b"".join(iterjson({})), b"{}")
+        with self.assertRaises(ValueError):
+            b"".join(iterjson({"a": [float("nan")]}))
+#================================================================================
+class test_iterobject(unittest.TestCase):
+
+    def setUp(self):
+        self.value = {"result": "OK", "tables": [{"tablename": "t"}],
+                      "sync_box": [{"gguid": "g%d" % i, "cvalues": json.dumps({"d": "è" * i}, ensure_ascii=False)} for i in range(50)],
+                      "tid_sync": 20240101120000, "partial": False, "big": 12345678901234567890123}
+        self.data = json.dumps(self.value, ensure_ascii=False, indent=1).encode("utf-8")
+    #--------------------------------------------------------------------------------------
+    def test_members_in_order_with_streamed_rows(self):
+        for size in (1, 7, 4096, len(self.data)):
+            events = list(iterobject(_split(self.data, size), "sync_box"))
+            self.assertEqual([k for k, _ in events if k != "sync_box"], ["result", "tables", "tid_sync", "partial", "big"])
+            self.assertEqual([v for k, v in events if k == "sync_box"], self.value["sync_box"])
+            self.assertEqual({k: v for k, v in events if k != "sync_box"},
+                             {k: v for k, v in self.value.items() if k != "sync_box"})
+    #--------------------------------------------------------------------------------------
+    def test_empty_and_missing_list(self):
+        self.assertEqual(list(iterobject([b"{}"], "sync_box")), [])
+        self.assertEqual(list(iterobject([b'{"sync_box": [], "a": 1}'], "sync_box")), [("a", 1)])
+        self.assertEqual(list(iterobject([b'{"sync_box": null}'], "sync_box")), [("sync_box", None)])
+    #--------------------------------------------------------------------------------------
+    def test_truncated_or_invalid(self):
+        with self.assertRaises(ValueError):
+            list(iterobject(_split(self.data[:-40], 100), "sync_box"))
+        with self.assertRaises(ValueError):
+            list(iterobject([b"[1, 2]"], "sync_box"))
+        with self.assertRaises(ValueError):
+            list(iterobject([b'{"a": 1 "b": 2}'], "sync_box"))
+#================================================================================
+class _handler(BaseHTTPRequestHandler):
+    """Mock sync endpoint: echoes what it received, as configured by the server attributes."""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def __body(self):
+        if self.headers.get("Transfer-Encoding") == "chunked":
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().strip(), 16)
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+                if size == 0:
+                    return b"".join(chunks)
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def __reply(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        chunked = self.headers.get("Transfer-Encoding") == "chunked"
+        body = self.__body()
+        coding = self.headers.get("Content-Encoding")
+        server.received.append((coding, chunked, self.headers.get("Accept-Encoding")))
+        if chunked and server.reject_chunked:
+            return self.__reply(411)
+        if coding is not None and server.reject_coding:
+            return self.__reply(415)
+        if coding == "gzip":
+            body = gzip.decompress(body)
+        elif coding == "deflate":
+            body = zlib.decompress(body)
+        server.bodies.append(body)
+        self.__reply(200, json.dumps({"result": "OK"}).encode("utf-8"), {"Content-Type": "application/json"})
+#================================================================================
+@unittest.skipIf(requests is None, "requests is not installed")
+class test_http_nios4(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _handler)
+        self.server.received = []
+        self.server.bodies = []
+        self.server.reject_coding = False
+        self.server.reject_chunked = False
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = "http://127.0.0.1:%d/_sync/?action=sync_all" % self.server.server_port
+        self.value = {"sync_box": [{"command": "insert", "tablename": "t", "cvalues": json.dumps({"c%d" % i: "è valore %d" % j for i in range(10)}, ensure_ascii=False)} for j in range(500)]}
+        self.expected = json.dumps(self.value, allow_nan=False).encode("utf-8")
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+    #--------------------------------------------------------------------------------------
+    def test_uncompressed_by_default(self):
+        http = http_nios4()
+        for _ in range(2):
+            http.post_json(self.url, self.value).close()
+        self.assertEqual([r[0] for r in self.server.received], [None, None])
+        self.assertEqual(self.server.received[-1][2], "gzip, deflate")
+        self.assertIsNone(http.coding())
+        self.assertEqual(self.server.bodies, [self.expected] * 2)
+        http.close()
+    #--------------------------------------------------------------------------------------
+    def test_compressed_when_set(self):
+        http = http_nios4(compress="gzip")
+        http.post_json(self.url, self.value).close()
+        self.assertEqual(self.server.received, [("gzip", False, "gzip, deflate")])
+        self.assertEqual(self.server.bodies, [self.expected])
+        http.close()
+    #--------------------------------------------------------------------------------------
+    def test_refused_coding_falls_back(self):
+        http = http_nios4(compress="deflate")
+        self.server.reject_coding = True
+        response = http.post_json(self.url, self.value)
+        self.assertEqual(response.status_code, 200)
+        http.post_json(self.url, self.value).close()
+        self.assertEqual([r[0] for r in self.server.received], ["deflate", None, None])
+        self.assertEqual(self.server.bodies, [self.expected] * 2)
+        http.close()
+    #--------------------------------------------------------------------------------------
+    def test_stream_is_chunked_and_compressed(self):
+        http = http_nios4(compress="gzip")
+        http.streamchunk = 4096
+        http.post_json_stream(self.url, self.value).close()
+        self.assertEqual(self.server.received, [("gzip", True, "gzip, deflate")])
+        self.assertEqual(self.server.bodies, [self.expected])
+        self.assertEqual(http.lastpacket["sent"], len(self.expected))
+        http.close()
+    #--------------------------------------------------------------------------------------
+    def test_stream_length_required(self):
+        http = http_nios4(compress=None)
+        self.server.reject_chunked = True
+        http.post_json_stream(self.url, self.value).close()
+        http.post_json_stream(self.url, self.value).close()
+        self.assertEqual([r[1] for r in self.server.received], [True, False, False])
+        self.assertEqual(self.server.bodies, [self.expected] * 2)
+        http.close()
+#================================================================================
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#================================================================================
+#Copyright of Davide Sbreviglieri 2024
+#THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE
+#================================================================================
+#TEST JSON NIOS4
+#================================================================================
+import json
+import math
+import unittest
+
+import json_nios4
+
+VALUES = [{"gguid": "5f0c1a52-000000000001", "tid": 20240101120000, "description": "perché è più \"economico\"\n",
+           "price": 1.25, "big": 1e16, "small": 1e-7, "quantity": -3, "note": None, "ok": True, "emoji": "\U0001f600"},
+          {"long": 9223372036854775807, "neg": -9223372036854775808, "list": [1, "a", {"b": []}]},
+          {}, [], " \x7f\x00", 0.1]
+#================================================================================
+class test_json_nios4(unittest.TestCase):
+
+    def setUp(self):
+        self.selected = json_nios4.backend()
+
+    def tearDown(self):
+        json_nios4.use(self.selected)
+    #--------------------------------------------------------------------------------------
+    def test_dumps_is_the_stdlib_text(self):
+        for name in json_nios4.backends():
+            json_nios4.use(name)
+            for value in VALUES:
+                self.assertEqual(json_nios4.dumps(value), json.dumps(value, ensure_ascii=False), name)
+    #--------------------------------------------------------------------------------------
+    def test_loads_is_the_stdlib_value(self):
+        for name in json_nios4.backends():
+            json_nios4.use(name)
+            for value in VALUES:
+                text = json.dumps(value)
+                self.assertEqual(json_nios4.loads(text), json.loads(text), name)
+                self.assertEqual(json_nios4.loads(text.encode("utf-8")), json.loads(text), name)
+            self.assertTrue(math.isnan(json_nios4.loads('{"a": NaN}')["a"]))
+            with self.assertRaises(ValueError):
+                json_nios4.loads("{")
+    #--------------------------------------------------------------------------------------
+    def test_default_backend(self):
+        self.assertEqual(json_nios4.use(), "json")
+        self.assertEqual(json_nios4.backends()[0], "json")
+        self.assertEqual(json_nios4.loads("[12345678901234567890123]"), [12345678901234567890123])
+    #--------------------------------------------------------------------------------------
+    def test_use_and_register(self):
+        with self.assertRaises(ValueError):
+            json_nios4.use("missing")
+        decoded = []
+        def loads(data):
+            decoded.append(data)
+            return json.loads(data)
+        json_nios4.register("test", loads, select=True)
+        try:
+            self.assertEqual(json_nios4.backend(), "test")
+            self.assertEqual(json_nios4.loads("[1]"), [1])
+            self.assertEqual(decoded, ["[1]"])
+            self.assertEqual(json_nios4.dumps({"a": "è"}), '{"a": "è"}')
+        finally:
+            del json_nios4._BACKENDS["test"]
+    #--------------------------------------------------------------------------------------
+    def test_benchmark(self):
+        result = json_nios4.benchmark(rows=50, repeat=1)
+        self.assertEqual(list(result), json_nios4.backends())
+        for values in result.values():
+            self.assertEqual(values["same"], 1.0)
+#================================================================================
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#================================================================================
+#Copyright of Davide Sbreviglieri 2024
+#THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE
+#================================================================================
+#TEST PACKET NIOS4
+#================================================================================
+import unittest
+
+from packet_nios4 import ROW_OVERHEAD, packet_nios4, rowsize
+#================================================================================
+class test_packet_nios4(unittest.TestCase):
+
+    def test_full_by_rows_and_bytes(self):
+        packer = packet_nios4(rows=3, minrows=1, maxbytes=0)
+        self.assertEqual([packer.add({"cvalues": "{}"}) for _ in range(3)], [False, False, True])
+        self.assertEqual(len(packer.take()), 3)
+        self.assertEqual((len(packer), packer.size(), packer.packets), (0, 0, 1))
+
+        packer = packet_nios4(rows=100, minrows=1, maxbytes=2 * ROW_OVERHEAD + 20)
+        row = {"cvalues": "x" * 10}
+        self.assertEqual(rowsize(row), ROW_OVERHEAD + 10)
+        self.assertEqual([packer.add(row) for _ in range(2)], [False, True])
+    #--------------------------------------------------------------------------------------
+    def test_observe_grows_on_fast_full_packets(self):
+        packer = packet_nios4(rows=1000, minrows=500, maxrows=3000, maxbytes=1000000, seconds=5.0)
+        self.assertEqual(packer.observe(1000, 1000, 0.1), 2000)
+        self.assertEqual(packer.observe(2000, 1000, 0.1), 3000)
+        self.assertEqual(packer.observe(3000, 1000, 0.1), 3000)
+        #a packet below the current size says nothing about a larger one
+        packer.rows = 1000
+        self.assertEqual(packer.observe(400, 1000, 0.1), 1000)
+    #--------------------------------------------------------------------------------------
+    def test_observe_shrinks_on_slow_or_large_packets(self):
+        packer = packet_nios4(rows=4000, minrows=500, maxrows=20000, maxbytes=1000000, seconds=5.0)
+        self.assertEqual(packer.observe(4000, 1000, 8.0), 2500)
+        self.assertEqual(packer.observe(2500, 4000000, 1.0), 1250)
+        self.assertEqual(packer.observe(1250, 100000000, 100.0), 625)
+        self.assertEqual(packer.observe(625, 100000000, 100.0), 500)
+    #--------------------------------------------------------------------------------------
+    def test_observe_never_grows_on_a_slow_packet(self):
+        packer = packet_nios4(rows=1000, minrows=500, maxrows=20000, seconds=5.0)
+        self.assertEqual(packer.observe(5000, 1000, 6.0), 1000)
+    #--------------------------------------------------------------------------------------
+    def test_observe_keeps_fixed_rows(self):
+        packer = packet_nios4(rows=1000, adaptive=False)
+        self.assertEqual(packer.observe(1000, 1000, 60.0), 1000)
+        self.assertEqual(packer.observe(1000, 1000, 0.01), 1000)
+#================================================================================
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#================================================================================
+#Copyright of Davide Sbreviglieri 2024
+#THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE
+#================================================================================
+#TEST POOL NIOS4
+#================================================================================
+import threading
+import time
+import unittest
+
+from pool_nios4 import pool_nios4
+#================================================================================
+class _conn:
+    def __init__(self, n):
+        self.n = n
+        self.alive = True
+        self.closed = False
+        self.in_transaction = False
+        self.rollbacks = 0
+
+    def is_connected(self):
+        return self.alive
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.in_transaction = False
+
+    def close(self):
+        self.closed = True
+#================================================================================
+class test_pool_nios4(unittest.TestCase):
+
+    def setUp(self):
+        self.opened = []
+
+    def connect(self):
+        conn = _conn(len(self.opened))
+        self.opened.append(conn)
+        return conn
+    #--------------------------------------------------------------------------------------
+    def test_nested_checkout_shares_connection(self):
+        pool = pool_nios4(self.connect, poolsize=2)
+        conn = pool.acquire()
+        self.assertIs(pool.acquire(), conn)
+        private = pool.acquire(private=True)
+        self.assertIsNot(private, conn)
+        pool.release(private, private=True)
+        pool.release(conn)
+        self.assertEqual(pool.stats()["idle"], 1)
+        pool.release(conn)
+        self.assertEqual((pool.stats()["idle"], pool.stats()["opened"]), (2, 2))
+        with pool.connection() as again:
+            self.assertIn(again, self.opened)
+        self.assertEqual(len(self.opened), 2)
+    #--------------------------------------------------------------------------------------
+    def test_pending_transaction_rolled_back(self):
+        pool = pool_nios4(self.connect)
+        with pool.connection() as conn:
+            conn.in_transaction = True
+        self.assertEqual(conn.rollbacks, 1)
+    #--------------------------------------------------------------------------------------
+    def test_dead_connection_discarded_after_error(self):
+        pool = pool_nios4(self.connect)
+        with self.assertRaises(ValueError):
+            with pool.connection() as conn:
+                conn.alive = False
+                raise ValueError("query failed")
+        self.assertTrue(conn.closed)
+        with pool.connection() as fresh:
+            self.assertIsNot(fresh, conn)
+        self.assertEqual(pool.stats()["discarded"], 1)
+    #--------------------------------------------------------------------------------------
+    def test_idle_connections_evicted_and_pinged(self):
+        pool = pool_nios4(self.connect, maxidle=0.05)
+        with pool.connection() as old:
+            pass
+        time.sleep(0.1)
+        with pool.connection() as conn:
+            self.assertIsNot(conn, old)
+        self.assertTrue(old.closed)
+        self.assertEqual(pool.stats()["evicted"], 1)
+
+        pool = pool_nios4(self.connect, pinginterval=0)
+        with pool.connection() as conn:
+            pass
+        conn.alive = False
+        with pool.connection() as fresh:
+            self.assertIsNot(fresh, conn)
+    #--------------------------------------------------------------------------------------
+    def test_waits_for_release_and_times_out(self):
+        pool = pool_nios4(self.connect, poolsize=1, timeout=2)
+        conn = pool.acquire()
+        threading.Timer(0.1, pool.release, (conn,)).start()
+        taken = pool.acquire(private=True)
+        self.assertEqual(pool.stats()["waits"], 1)
+        pool.timeout = 0.05
+        with self.assertRaises(RuntimeError):
+            pool.acquire(private=True)
+        pool.release(taken, private=True)
+#================================================================================
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#================================================================================
+#Copyright of Davide Sbreviglieri 2024
+#THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE
+#================================================================================
+#TEST SEQUENCE NIOS4
+#================================================================================
+import threading
+import unittest
+
+from sequence_nios4 import sequence_nios4
+#================================================================================
+class _cursor:
+    """Runs the statements of the allocator on an in-memory ``lo_sequences``."""
+    def __init__(self, db):
+        self.db = db
+        self.rowcount = 0
+
+    def execute(self, sql, params=None):
+        db = self.db
+        db.statements.append(sql.split()[0])
+        if sql.startswith("UPDATE lo_sequences SET nextind=LAST_INSERT_ID"):
+            count, key = params
+            self.rowcount = 0
+            if key in db.sequences:
+                db.sequences[key] += count
+                db.last = db.sequences[key]
+                self.rowcount = 1
+        elif sql.startswith("INSERT IGNORE"):
+            db.sequences.setdefault(params[0], db.maxind.get(params[0], 0) + 1)
+        elif sql.startswith("UPDATE lo_sequences SET nextind=GREATEST"):
+            value, key = params
+            if key in db.sequences:
+                db.sequences[key] = max(db.sequences[key], value)
+
+    def fetchone(self):
+        return (self.db.last,)
+
+    def close(self):
+        pass
+#================================================================================
+class _pool:
+    def __init__(self, maxind=None):
+        self.sequences = {}
+        self.maxind = maxind or {}
+        self.last = 0
+        self.statements = []
+        self.commits = 0
+        self.released = []
+        self.lock = threading.Lock()
+
+    def acquire(self, private=False):
+        self.lock.acquire()
+        return self
+
+    def cursor(self):
+        return _cursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def release(self, conn, checkhealth=False, private=False):
+        self.released.append((private, checkhealth))
+        self.lock.release()
+#================================================================================
+class test_sequence_nios4(unittest.TestCase):
+
+    def test_first_use_seeds_from_max_ind(self):
+        pool = _pool({"items": 7})
+        sequence = sequence_nios4(pool, blocksize=2)
+        self.assertEqual([sequence.next("Items") for _ in range(3)], [8, 9, 10])
+        self.assertEqual(pool.statements.count("INSERT"), 1)
+        self.assertEqual(pool.commits, 2)
+        self.assertEqual(pool.released, [(True, False)] * 2)
+    #--------------------------------------------------------------------------------------
+    def test_values_from_a_block_without_round_trips(self):
+        pool = _pool()
+        sequence = sequence_nios4(pool, blocksize=100)
+        self.assertEqual([sequence.next("items") for _ in range(50)], list(range(1, 51)))
+        self.assertEqual(pool.commits, 1)
+    #--------------------------------------------------------------------------------------
+    def test_observe_drops_colliding_block(self):
+        pool = _pool()
+        sequence = sequence_nios4(pool, blocksize=100)
+        self.assertEqual(sequence.next("items"), 1)
+        sequence.observe("items", 20)
+        self.assertEqual(sequence.next("items"), 101)
+        sequence.observe("items", 50)
+        self.assertEqual(sequence.next("items"), 102)
+    #--------------------------------------------------------------------------------------
+    def test_unique_across_threads(self):
+        sequence = sequence_nios4(_pool(), blocksize=7)
+        values = []
+        def allocate():
+            values.extend(sequence.next("items") for _ in range(100))
+        threads = [threading.Thread(target=allocate) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(sorted(values), list(range(1, 401)))
+    #--------------------------------------------------------------------------------------
+    def test_failed_reservation_releases_connection(self):
+        pool = _pool()
+        def broken():
+            raise RuntimeError("gone")
+        pool.cursor = broken
+        with self.assertRaises(RuntimeError):
+            sequence_nios4(pool).next("items")
+        self.assertEqual(pool.released, [(True, True)])
+#================================================================================
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#================================================================================
+#Copyright of Davide Sbreviglieri 2024
+#THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE
+#================================================================================
+#TEST SERIALIZER NIOS4
+#================================================================================
+import json
+import unittest
+from datetime import datetime
+
+from serializer_nios4 import serializer_nios4
+
+COLUMNS = ["gguid", "tid", "eli", "arc", "ut", "uta", "read_b", "description", "date"]
+RECORD = ("g1", 20240102030405, 0, 0, "admin", "", 1, "perché è più", datetime(2024, 1, 2, 3, 4, 5))
+#================================================================================
+class test_serializer_nios4(unittest.TestCase):
+
+    def test_row(self):
+        o = serializer_nios4("items", COLUMNS, ["date"]).row(RECORD)
+        self.assertEqual(o, {"command": "insert", "tablename": "items", "client": 0, "gguid": "g1",
+                             "tid": 20240102030405, "arc": 0, "ut": "admin", "uta": "",
+                             "cvalues": o["cvalues"]})
+        self.assertEqual(json.loads(o["cvalues"])["read"], 1)
+        self.assertEqual(json.loads(o["cvalues"])["date"], 20240102030405)
+    #--------------------------------------------------------------------------------------
+    def test_cvalues_text_is_the_stdlib_one(self):
+        o = serializer_nios4("items", COLUMNS, ["date"]).row(RECORD)
+        cvalue = dict(zip(["gguid", "tid", "eli", "arc", "ut", "uta", "read", "description", "date"], RECORD))
+        cvalue["date"] = 20240102030405
+        self.assertEqual(o["cvalues"], json.dumps(cvalue, ensure_ascii=False))
+    #--------------------------------------------------------------------------------------
+    def test_unknown_column_types(self):
+        known = serializer_nios4("items", COLUMNS, ["date"])
+        unknown = serializer_nios4("items", COLUMNS)
+        self.assertEqual(unknown.row(RECORD), known.row(RECORD))
+    #--------------------------------------------------------------------------------------
+    def test_null_dates(self):
+        record = RECORD[:-1] + (None,)
+        o = serializer_nios4("items", COLUMNS, ["date"]).row(record)
+        self.assertIsNone(json.loads(o["cvalues"])["date"])
+    #--------------------------------------------------------------------------------------
+    def test_rows(self):
+        serializer = serializer_nios4("items", COLUMNS, ["date"])
+        records = [RECORD, ("g2",) + RECORD[1:]]
+        self.assertEqual(serializer.rows(records), [serializer.row(r) for r in records])
+#================================================================================
+if __name__ == "__main__":
+    unittest.main()
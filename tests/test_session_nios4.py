@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#================================================================================
+#Copyright of Davide Sbreviglieri 2024
+#THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE
+#================================================================================
+#TEST SESSION NIOS4
+#================================================================================
+import json
+import unittest
+from datetime import datetime
+
+from session_nios4 import session_nios4
+#================================================================================
+class _db:
+    """Metadata of one table, counting the reads."""
+    def __init__(self):
+        self.reads = []
+        self.columns = ["gguid", "tid", "description", "price", "day"]
+
+    def get_tablesname(self):
+        self.reads.append("tables")
+        return {"items": 1}
+
+    def get_fieldsname(self):
+        self.reads.append("fields")
+        return {"items|description": (1, 0), "items|price": (1, 5)}
+
+    def get_gguid(self, tablename):
+        self.reads.append("users")
+        return {"u1": 1}
+
+    def get_columnsname(self, tablename):
+        self.reads.append("columns")
+        return list(self.columns)
+
+    def get_fieldstype(self, tablename):
+        self.reads.append("types")
+        return {"gguid": "varchar", "tid": "double", "description": "text", "price": "double", "day": "datetime"}
+
+    def fill_fieldsname(self, fields, tablename):
+        self.reads.append("fill")
+        for c in self.columns:
+            fields.setdefault(tablename.lower() + "|" + c, [0, 0])
+#================================================================================
+def _tid(value):
+    return str(value)
+#================================================================================
+class test_session_nios4(unittest.TestCase):
+
+    def setUp(self):
+        self.db = _db()
+        self.session = session_nios4(self.db)
+        self.assertTrue(self.session.load())
+    #--------------------------------------------------------------------------------------
+    def test_load_reads_once(self):
+        self.assertTrue(self.session.load())
+        self.assertEqual(self.db.reads, ["tables", "fields", "users"])
+        self.assertEqual((self.session.tables, self.session.users, self.session.loads), ({"items": 1}, {"u1": 1}, 1))
+    #--------------------------------------------------------------------------------------
+    def test_reload_reads_again(self):
+        self.session.columns("items")
+        self.assertTrue(self.session.reload())
+        self.session.columns("items")
+        self.assertEqual(self.db.reads.count("fields"), 2)
+        self.assertEqual(self.db.reads.count("columns"), 2)
+        self.assertEqual(self.session.loads, 2)
+    #--------------------------------------------------------------------------------------
+    def test_columns_and_serializer_cached(self):
+        self.assertIs(self.session.columns("Items"), self.session.columns("items"))
+        serializer = self.session.serializer("items")
+        self.assertIs(self.session.serializer("ITEMS"), serializer)
+        self.assertEqual(self.db.reads.count("columns"), 1)
+        self.assertEqual(self.db.reads.count("types"), 1)
+        row = serializer.row(("g", 1, "x", 2.5, datetime(2024, 1, 2, 3, 4, 5)))
+        self.assertEqual(json.loads(row["cvalues"])["day"], 20240102030405)
+    #--------------------------------------------------------------------------------------
+    def test_codec_cached_until_invalidated(self):
+        codec = self.session.codec("items", {}, _tid)
+        self.assertIs(self.session.codec("items", {}, _tid), codec)
+        self.assertIsNot(self.session.codec("items", {}, str), codec)
+        self.session.invalidate("ITEMS")
+        self.assertIsNot(self.session.codec("items", {}, _tid), codec)
+    #--------------------------------------------------------------------------------------
+    def test_drop_field_and_table(self):
+        codec = self.session.codec("items", {}, _tid)
+        self.session.drop_field("Items", "Price")
+        self.assertNotIn("items|price", self.session.fields)
+        self.assertEqual(self.session.codec("items", {}, _tid).encode({"price": 3, "description": "d"}), (("description",), ("d",)))
+        self.assertIsNot(self.session.codec("items", {}, _tid), codec)
+        self.session.drop_table("items")
+        self.assertEqual((self.session.tables, self.session.fields), ({}, {}))
+    #--------------------------------------------------------------------------------------
+    def test_refresh_columns(self):
+        self.session.columns("items")
+        self.db.columns.append("price_b")
+        self.session.refresh_columns("items")
+        self.assertIn("items|price_b", self.session.fields)
+        self.assertIn("price_b", self.session.columns("items"))
+        self.assertEqual(self.db.reads.count("columns"), 2)
+#================================================================================
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#================================================================================
+#Copyright of Davide Sbreviglieri 2024
+#THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE
+#================================================================================
+#TEST SYNC NIOS4
+#================================================================================
+import json
+import threading
+import time
+import unittest
+
+import sync_nios4 as module
+from codec_nios4 import codec_nios4
+from packet_nios4 import packet_nios4
+from utility_nios4 import error_n4, utility_n4
+
+FIELDS = {"items|tid": (0, 3), "items|description": (0, 0), "items|price": (0, 5)}
+#================================================================================
+class _catalog:
+    def __init__(self, key):
+        self.key = key
+
+    def column(self, tablename, column):
+        return ("gguid", "varchar(40)", "NO", "", self.key)
+#================================================================================
+class _db:
+    """Records the bulk statements of the apply engine."""
+    def __init__(self, key="PRI"):
+        self.calls = []
+        self.__catalog = _catalog(key)
+
+    def catalog(self):
+        return self.__catalog
+
+    def newrow_defaults(self, tablename):
+        return {"tid": 0, "eli": 0, "description": "", "price": 0}
+
+    def insertmany(self, tablename, columns, rows, update=None):
+        self.calls.append(("insertmany", tablename, tuple(columns), list(rows), tuple(update or ())))
+        return True
+
+    def executemany(self, sql, rows):
+        self.calls.append(("executemany", sql, list(rows)))
+        return True
+
+    def deletemany(self, tablename, gguids):
+        self.calls.append(("deletemany", tablename, list(gguids)))
+        return True
+#================================================================================
+class _session:
+    def codec(self, tablename, fieldforbidden, tid):
+        return codec_nios4(tablename, FIELDS, fieldforbidden, tid)
+#================================================================================
+def _sync(db=None):
+    """``sync_nios4`` without login or database, for the internal engines."""
+    sync = object.__new__(module.sync_nios4)
+    sync.err = error_n4("", "")
+    sync.viewmessage = False
+    sync._sync_nios4__utility = utility_n4
+    sync._sync_nios4__db = db
+    return sync
+#================================================================================
+def _row(gguid, tid, command="insert", **cvalues):
+    cvalues["tid"] = tid
+    return {"command": command, "tablename": "items", "gguid": gguid, "tid": tid, "cvalues": json.dumps(cvalues)}
+#================================================================================
+class test_bulk_apply(unittest.TestCase):
+
+    def apply(self, db, rows, tables):
+        sync = _sync(db)
+        return sync._sync_nios4__bulk_apply(False, rows, tables, _session(), {}, {})
+    #--------------------------------------------------------------------------------------
+    def test_new_and_existing_rows(self):
+        db = _db()
+        tables = {"items": {"old": 1, "same": 5}}
+        rows = [_row("new", 2, description="n"), _row("old", 3, price=2), _row("same", 5, price=9)]
+        self.assertTrue(self.apply(db, rows, tables))
+        columns = ("gguid", "tid", "eli", "description", "price")
+        self.assertEqual(db.calls, [
+            ("insertmany", "items", columns, [("new", "2", 0, "n", 0)], ()),
+            ("insertmany", "items", columns, [("old", "3", 0, "", "2")], ("tid", "price"))])
+        self.assertEqual(tables["items"]["new"], 0)
+    #--------------------------------------------------------------------------------------
+    def test_existing_rows_grouped_by_received_columns(self):
+        db = _db()
+        rows = [_row("a", 3, price=1), _row("b", 3, price=2), _row("c", 3, description="x")]
+        self.assertTrue(self.apply(db, rows, {"items": {"a": 1, "b": 1, "c": 1}}))
+        self.assertEqual([(c[3], c[4]) for c in db.calls], [
+            ([("a", "3", 0, "", "1"), ("b", "3", 0, "", "2")], ("tid", "price")),
+            ([("c", "3", 0, "x", 0)], ("tid", "description"))])
+    #--------------------------------------------------------------------------------------
+    def test_update_without_unique_gguid(self):
+        db = _db(key="")
+        self.assertTrue(self.apply(db, [_row("a", 3, price=1)], {"items": {"a": 1}}))
+        self.assertEqual(db.calls, [("executemany", "UPDATE items SET tid=%s,price=%s WHERE gguid=%s", [("3", "1", "a")])])
+    #--------------------------------------------------------------------------------------
+    def test_repeated_gguid_keeps_packet_order(self):
+        db = _db()
+        tables = {"items": {"a": 1}}
+        rows = [_row("a", 2, price=1), _row("a", 0, command="delete"), _row("a", 4, price=3)]
+        self.assertTrue(self.apply(db, rows, tables))
+        self.assertEqual([c[0] for c in db.calls], ["insertmany", "deletemany", "insertmany"])
+        self.assertEqual(db.calls[2][4], ())
+        self.assertEqual(tables["items"]["a"], 0)
+#================================================================================
+class test_background(unittest.TestCase):
+
+    def test_yields_in_order(self):
+        self.assertEqual(list(module._background(iter(range(50)), 2)), list(range(50)))
+    #--------------------------------------------------------------------------------------
+    def test_raises_producer_error(self):
+        def produce():
+            yield 1
+            raise RuntimeError("broken")
+        items = module._background(produce(), 2)
+        self.assertEqual(next(items), 1)
+        with self.assertRaises(RuntimeError):
+            next(items)
+        self.assertEqual(list(items), [])
+    #--------------------------------------------------------------------------------------
+    def test_close_stops_producer(self):
+        produced = []
+        def produce():
+            for i in range(1000):
+                produced.append(i)
+                yield i
+        items = module._background(produce(), 2)
+        self.assertEqual(next(items), 0)
+        items.close()
+        time.sleep(0.3)
+        self.assertLess(len(produced), 10)
+        self.assertEqual(list(items), [])
+#================================================================================
+class _http:
+    def __init__(self, events=()):
+        self.events = events
+        self.lastpacket = {"received": 123}
+
+    def read_json_stream(self, resp, key):
+        return iter(self.events)
+#================================================================================
+class _streamsession:
+    def __init__(self):
+        self.tables = {"items": 0}
+        self.fields = dict(FIELDS)
+        self.users = {}
+
+    def load(self):
+        return True
+#================================================================================
+class test_streamed_rows(unittest.TestCase):
+
+    def sync(self, http=None):
+        sync = _sync()
+        sync._sync_nios4__http = http or _http()
+        sync.enabled_create_tables = []
+        sync.enabled_getdata_tables = []
+        sync.enabled_setdata_tables = []
+        sync.nrow_stream = 2
+        return sync
+    #--------------------------------------------------------------------------------------
+    def test_late_members_after_rows(self):
+        events = [("result", "OK"), ("sync_box", _row("a", 1)), ("sync_box", _row("b", 1)),
+                  ("fields", []), ("tid_sync", 5), ("partial", False)]
+        err = error_n4("", "")
+        values = self.sync(_http(events))._sync_nios4__stream_datablock(None, err)
+        self.assertEqual([r["gguid"] for r in values["sync_box"]], ["a", "b"])
+        self.assertEqual((values["fields"], values["tid_sync"], values["partial"]), ([], 5, False))
+        self.assertEqual(err.errorcode, "")
+    #--------------------------------------------------------------------------------------
+    def test_defer_rows(self):
+        rows = [_row("a", 1, price=1), _row("b", 1, color="red"), _row("b", 0, command="delete"),
+                _row("c", 1, price=2), dict(_row("d", 1), tablename="news")]
+        deferred = []
+        ready = self.sync()._sync_nios4__defer_rows(rows, _streamsession(), {}, True, deferred, set())
+        self.assertEqual([r["gguid"] for r in ready], ["a", "c"])
+        self.assertEqual([(r["gguid"], r["command"]) for r in deferred], [("b", "insert"), ("b", "delete"), ("d", "insert")])
+        self.assertEqual(ready[0]["cvalues"], {"price": 1, "tid": 1})
+        deferred = []
+        ready = self.sync()._sync_nios4__defer_rows(rows, _streamsession(), {}, False, deferred, set())
+        self.assertEqual([r["gguid"] for r in ready], ["a", "b", "b", "c"])
+    #--------------------------------------------------------------------------------------
+    def test_deferred_rows_applied_after_late_structure(self):
+        applied = []
+        datablock = {}
+        def received():
+            yield _row("a", 1, price=1)
+            yield _row("b", 1, color="red")
+            yield _row("c", 1, price=2)
+            datablock["tables"] = []
+            datablock["tid_sync"] = 5
+        def apply(useNTID, rows, session, fieldforbidden, maxind):
+            applied.append(("tables" in datablock, [r["gguid"] for r in rows]))
+            return True
+        datablock["sync_box"] = received()
+        sync = self.sync()
+        sync._sync_nios4__apply_rows = apply
+        self.assertTrue(sync.install_data(False, datablock, True, False, False, _streamsession()))
+        self.assertEqual(applied, [(False, ["a"]), (True, ["c"]), (True, ["b"])])
+    #--------------------------------------------------------------------------------------
+    def test_transfer_time_excludes_consumer(self):
+        def received():
+            for i in range(4):
+                time.sleep(0.05)
+                yield _row(str(i), 1)
+        values = {"sync_box": received()}
+        measure = {"seconds": 0.0, "bytes": 0}
+        sync = self.sync()
+        sync._sync_nios4__prefetch_rows(values, sync.err, measure)
+        for _ in values["sync_box"]:
+            time.sleep(0.1)
+        self.assertGreater(measure["seconds"], 0.15)
+        self.assertLess(measure["seconds"], 0.35)
+        self.assertEqual(measure["bytes"], 123)
+#================================================================================
+class test_download_pages(unittest.TestCase):
+    """Pages of 10 rows; the one at ``last`` is received without ``partial``."""
+
+    def pages(self, last, workers, buffer, delay=None, block=None):
+        self.calls = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+        def fetch(dbname, TID, count, pagesize):
+            self.calls.append(count)
+            if count == block:
+                self.started.set()
+                self.release.wait(2)
+            time.sleep((delay or {}).get(count, 0))
+            return {"offset": count, "partial": count != last}, error_n4("", ""), {"seconds": 0.1, "bytes": 100}
+
+        sync = _sync()
+        sync.download_workers = workers
+        sync.download_buffer = buffer
+        sync._sync_nios4__fetch_page = fetch
+        return sync._sync_nios4__download_pages("db", 0, 0, packet_nios4(10, 10, 10, adaptive=False))
+    #--------------------------------------------------------------------------------------
+    def test_yields_in_offset_order(self):
+        pages = self.pages(20, 3, 3, delay={0: 0.2, 10: 0.1})
+        self.assertEqual([p["offset"] for p in pages], [0, 10, 20])
+        self.assertEqual(sorted(self.calls), [0, 10, 20])
+    #--------------------------------------------------------------------------------------
+    def test_stops_requesting_after_last_page(self):
+        pages = self.pages(10, 4, 4)
+        self.assertEqual(next(pages)["offset"], 0)
+        time.sleep(0.2)
+        self.assertEqual(next(pages)["offset"], 10)
+        time.sleep(0.1)
+        self.assertEqual(sorted(self.calls), [0, 10, 20, 30])
+        self.assertEqual(list(pages), [])
+    #--------------------------------------------------------------------------------------
+    def test_cancels_pages_not_running(self):
+        pages = self.pages(10, 1, 4, block=20)
+        self.assertEqual(next(pages)["offset"], 0)
+        self.assertTrue(self.started.wait(2))
+        self.assertEqual([p["offset"] for p in pages], [10])
+        self.release.set()
+        self.assertEqual(self.calls, [0, 10, 20])
+#================================================================================
+if __name__ == "__main__":
+    unittest.main()
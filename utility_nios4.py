@@ -213,6 +213,25 @@ class utility_n4:
         valore =str(value).replace("'", "''")
         return valore
     #-------------------------------------------------------
+    def tostr(self, value: Optional[Any]) -> str:
+        """
+        Convert a Python value to a string for a bound SQL parameter.
+
+        Parameters
+        ----------
+        value : Any or None
+            Value to convert.
+
+        Returns
+        -------
+        str
+            Empty string for ``None``; otherwise ``str(value)`` (no escaping,
+            unlike :meth:`convap`).
+        """
+        if value is None:
+            return ""
+        return str(value)
+    #-------------------------------------------------------
     def float_to_str(self, f: Number) -> str:
         """
         Convert a numeric value to a non-scientific string representation.